@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import os
 
-from psycare import create_app
+from psycare import create_app, migrations
 
 
 if __name__ == "__main__":
     app = create_app()
+    # Workers never touch the schema; the dev server brings a local DB up to date itself.
+    with app.app_context():
+        migrations.ensure_schema()
     app.run(host="127.0.0.1", port=int(os.environ.get("PORT", "5000")), debug=True)
@@ -0,0 +1,109 @@
+"""Concurrent read/write throughput per DATABASE_PROFILE.
+
+    python benchmarks/bench_db_profiles.py --threads 8 --seconds 5
+    python benchmarks/bench_db_profiles.py --url postgresql://localhost/psycare_bench
+
+Each thread logs in as its own patient and loops over a mix of mood
+check-ins (writes) and mood-history page loads (reads) through the test
+client. By default a fresh SQLite file is measured once with the plain
+driver defaults ("none") and once with the tuned "sqlite" profile; --url
+measures the given database with the "server" profile instead.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from psycare import create_app  # noqa: E402
+from psycare.extensions import db  # noqa: E402
+from psycare.models import User  # noqa: E402
+
+
+def run(url: str, profile: str, threads: int, seconds: float, write_ratio: float) -> dict:
+    app = create_app(
+        {
+            "TESTING": True,
+            "WTF_CSRF_ENABLED": False,
+            "SECRET_KEY": "bench",
+            "SQLALCHEMY_DATABASE_URI": url,
+            "DATABASE_PROFILE": profile,
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+            "LOGIN_RATE_LIMIT_IP": "",
+            "LOGIN_RATE_LIMIT_EMAIL": "",
+        }
+    )
+    with app.app_context():
+        for i in range(threads):
+            email = f"bench{i}@example.com"
+            if not User.query.filter_by(email=email).first():
+                user = User(email=email, display_name=f"Bench {i}", role="patient")
+                user.set_password("Password123!")
+                db.session.add(user)
+        db.session.commit()
+
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    start = threading.Barrier(threads + 1)
+
+    def worker(i: int) -> None:
+        client = app.test_client()
+        client.post("/auth/login", data={"email": f"bench{i}@example.com", "password": "Password123!"})
+        rng = random.Random(i)
+        local = {"reads": 0, "writes": 0, "errors": 0}
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            try:
+                if rng.random() < write_ratio:
+                    resp = client.post("/patient/mood", data={"rating": rng.randint(1, 10)})
+                    kind = "writes"
+                else:
+                    resp = client.get("/patient/mood")
+                    kind = "reads"
+                local[kind if resp.status_code < 500 else "errors"] += 1
+            except Exception:  # "database is locked" surfaces as an exception in TESTING mode
+                local["errors"] += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    start.wait()
+    for t in pool:
+        t.join()
+    with app.app_context():
+        db.engine.dispose()
+    return {key: value / seconds for key, value in counts.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--url", help="server database URL; measured with the 'server' profile")
+    args = parser.parse_args()
+
+    if args.url:
+        runs = [("server", args.url)]
+    else:
+        tmp = Path(tempfile.mkdtemp(prefix="psycare-bench-"))
+        runs = [("none", f"sqlite:///{tmp / 'none.db'}"), ("sqlite", f"sqlite:///{tmp / 'sqlite.db'}")]
+
+    print(f"{'profile':<8} {'reads/s':>9} {'writes/s':>9} {'errors/s':>9}")
+    for profile, url in runs:
+        result = run(url, profile, args.threads, args.seconds, args.write_ratio)
+        print(f"{profile:<8} {result['reads']:>9.1f} {result['writes']:>9.1f} {result['errors']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
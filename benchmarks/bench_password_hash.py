@@ -0,0 +1,81 @@
+"""Login throughput with the bounded hash pool.
+
+    python benchmarks/bench_password_hash.py --logins 200 --threads 8
+
+Reports logins/second overall and per available core for the configured
+PASSWORD_HASH_METHOD, driving ``auth.login_post`` through the test client.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from psycare import create_app  # noqa: E402
+from psycare.extensions import db  # noqa: E402
+from psycare.models import User  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    parser.add_argument("--workers", type=int, default=None, help="PASSWORD_HASH_WORKERS (default: cores)")
+    args = parser.parse_args()
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    config = {
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "SECRET_KEY": "bench",
+        "PASSWORD_HASH_METHOD": args.method,
+        "PASSWORD_HASH_QUEUE": args.threads,
+        "LOGIN_RATE_LIMIT_IP": "",
+        "LOGIN_RATE_LIMIT_EMAIL": "",
+    }
+    if args.workers:
+        config["PASSWORD_HASH_WORKERS"] = args.workers
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        user = User(email="bench@example.com", display_name="Bench", role="patient")
+        user.set_password("Password123!")
+        db.session.add(user)
+        db.session.commit()
+
+    per_thread = max(1, args.logins // args.threads)
+    statuses: list[int] = []
+    lock = threading.Lock()
+
+    def run() -> None:
+        client = app.test_client()
+        for _ in range(per_thread):
+            r = client.post("/auth/login", data={"email": "bench@example.com", "password": "Password123!"})
+            client.post("/auth/logout")
+            with lock:
+                statuses.append(r.status_code)
+
+    threads = [threading.Thread(target=run) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    ok = sum(1 for s in statuses if s in (302, 303))
+    rate = ok / elapsed
+    print(f"method={args.method} threads={args.threads} hash_workers={app.config['PASSWORD_HASH_WORKERS']} cores={cores}")
+    print(f"logins={len(statuses)} ok={ok} shed={statuses.count(503)} elapsed={elapsed:.2f}s")
+    print(f"logins/s={rate:.1f} logins/s/core={rate / cores:.1f}")
+
+
+if __name__ == "__main__":
+    main()
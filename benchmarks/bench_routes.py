@@ -0,0 +1,399 @@
+"""Per-route SQL statement budgets and latency baselines over a large seeded dataset.
+
+    python benchmarks/bench_routes.py                          # large scale, compare to baseline
+    python benchmarks/bench_routes.py --save-baseline          # record latencies for this machine
+    python benchmarks/bench_routes.py --scale small --repeat 5
+
+Every route of the patient and therapist blueprints is exercised through the
+test client as one patient with a long history and as a therapist with a big
+caseload. A run fails (exit 1) when
+
+* a route issues more SQL statements than its budget below. Budgets do not
+  depend on the data volume, so an N+1 query or a per-row lookup trips them;
+* a route's median latency is more than ``--tolerance`` slower than the
+  baseline file (and at least ``--min-delta-ms`` slower in absolute terms);
+* a patient/therapist route has no entry in ``CASES``, so new routes must
+  come with a budget.
+
+Latency baselines are machine specific; keep them next to the CI runner that
+produces them rather than comparing numbers across hosts.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+from sqlalchemy import event, func, insert, select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from psycare import create_app, migrations, seed  # noqa: E402
+from psycare.export import BATCH_SIZE  # noqa: E402
+from psycare.extensions import db  # noqa: E402
+from psycare.models import Alert, JournalEntry, MoodDaily, PatientSummary, PatientTherapist, Resource, User  # noqa: E402
+from psycare.timeseries import MAX_PATIENTS  # noqa: E402
+from psycare.seed import PASSWORD, SeedConfig  # noqa: E402
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# Fixed distributions, so the measured patient's row counts are known exactly.
+SCALES = {
+    "tiny": SeedConfig(therapists=3, patients_per_therapist=10, journals_per_patient=6, moods_per_patient=8,
+                       alerts_per_patient=1, resources_per_therapist=6, distribution="fixed"),
+    "small": SeedConfig(therapists=4, patients_per_therapist=150, journals_per_patient=20, moods_per_patient=40,
+                        alerts_per_patient=1, resources_per_therapist=50, distribution="fixed"),
+    "large": SeedConfig(therapists=5, patients_per_therapist=1000, journals_per_patient=40, moods_per_patient=60,
+                        alerts_per_patient=2, resources_per_therapist=200, distribution="fixed"),
+}
+SPARE_PATIENTS = 500
+
+
+@dataclass
+class Dataset:
+    therapist_id: int
+    therapist_email: str
+    patient_id: int
+    patient_email: str
+    entry_id: int
+    shared_entry_id: int
+    resource_id: int
+    rows: dict[str, int]  # rows owned by the measured patient, per export source
+    _spare: int = 0
+
+    def spare_email(self) -> str:
+        self._spare += 1
+        return f"spare{self._spare}@example.com"
+
+
+def prepare(config: SeedConfig) -> Dataset:
+    """Seed ``config`` plus unlinked patients for the link routes. Needs an app context."""
+    result = seed.seed(config)
+    therapist_id, patient_id = result.therapist_ids[0], result.patient_ids[0]
+    with db.engine.begin() as conn:
+        pwhash = conn.scalar(select(User.password_hash).where(User.id == patient_id))
+        conn.execute(insert(User.__table__), [
+            {"email": f"spare{i}@example.com", "password_hash": pwhash, "role": "patient",
+             "display_name": f"Spare {i}", "created_at": datetime.now(timezone.utc)}
+            for i in range(1, SPARE_PATIENTS + 1)
+        ])
+        entry_id = conn.scalar(select(JournalEntry.id).where(JournalEntry.patient_id == patient_id).limit(1))
+        shared_entry_id = conn.scalar(
+            select(JournalEntry.id).where(JournalEntry.patient_id == patient_id, JournalEntry.shared_with_therapist)
+            .limit(1)
+        )
+        if shared_entry_id is None:
+            shared_entry_id = entry_id
+            conn.execute(JournalEntry.__table__.update().where(JournalEntry.id == entry_id)
+                         .values(shared_with_therapist=True))
+        resource_id = conn.scalar(select(Resource.id).where(Resource.therapist_id == therapist_id).limit(1))
+        mood_days = conn.scalar(select(func.count()).select_from(MoodDaily).where(MoodDaily.patient_id == patient_id))
+    return Dataset(
+        therapist_id=therapist_id,
+        therapist_email=seed.therapist_email(config, 0),
+        patient_id=patient_id,
+        patient_email=seed.patient_email(config, 0),
+        entry_id=entry_id,
+        shared_entry_id=shared_entry_id,
+        resource_id=resource_id,
+        rows={
+            "link": 1,
+            "journal": int(config.journals_per_patient),
+            "journal_archive": 0,
+            "mood": int(config.moods_per_patient),
+            "mood_day": mood_days,
+            "mood_week": 0,
+            "alert": int(config.alerts_per_patient),
+        },
+    )
+
+
+def _insert_one(model, **values) -> int:
+    with db.engine.begin() as conn:
+        return conn.execute(insert(model.__table__).values(**values)).inserted_primary_key[0]
+
+
+def _fresh_entry(data: Dataset) -> dict:
+    now = datetime.now(timezone.utc)
+    return {"entry_id": _insert_one(JournalEntry, patient_id=data.patient_id, title="Scratch", body="to delete",
+                                    shared_with_therapist=False, flagged_risk=False, created_at=now, updated_at=now)}
+
+
+def _fresh_alert(data: Dataset) -> dict:
+    alert_id = _insert_one(Alert, patient_id=data.patient_id, therapist_id=data.therapist_id, kind="panic",
+                           message="bench", resolved=False, created_at=datetime.now(timezone.utc))
+    with db.engine.begin() as conn:
+        summary_table = PatientSummary.__table__
+        conn.execute(
+            summary_table.update()
+            .where(summary_table.c.therapist_id == data.therapist_id, summary_table.c.patient_id == data.patient_id)
+            .values(unresolved_alert_count=summary_table.c.unresolved_alert_count + 1)
+        )
+    return {"alert_id": alert_id}
+
+
+def _fresh_resource(data: Dataset) -> dict:
+    return {"resource_id": _insert_one(Resource, therapist_id=data.therapist_id, title="Scratch",
+                                       url="https://example.org/x", description="", created_at=datetime.now(timezone.utc))}
+
+
+def _cold_fragments(data: Dataset) -> dict:
+    from flask import current_app
+
+    current_app.extensions["fragment_cache"].clear()
+    return {}
+
+
+def _caseload(data: Dataset) -> dict:
+    ids = db.session.scalars(
+        select(PatientTherapist.patient_id)
+        .where(PatientTherapist.therapist_id == data.therapist_id)
+        .order_by(PatientTherapist.patient_id)
+        .limit(MAX_PATIENTS)
+    ).all()
+    return {"caseload": "&".join(f"patient_id={i}" for i in ids)}
+
+
+def _export_budget(data: Dataset) -> int:
+    # the size check, the user row, then keyset batches per source: full batches plus the final short (or empty) one
+    return 2 + sum(n // BATCH_SIZE + 1 for n in data.rows.values())
+
+
+@dataclass
+class Case:
+    role: str
+    endpoint: str
+    path: str
+    budget: int | Callable[[Dataset], int]
+    method: str = "GET"
+    form: Callable[[Dataset], dict] | None = None
+    prepare: Callable[[Dataset], dict] | None = None
+    label: str = ""
+    stream: bool = False
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.endpoint}{f' ({self.label})' if self.label else ''}"
+
+    def limit(self, data: Dataset) -> int:
+        return self.budget(data) if callable(self.budget) else self.budget
+
+
+# Budgets count every statement of the request, including the session user
+# lookup and cache-version checks. Keep them tight: raise one only together
+# with the change that justifies it.
+CASES = [
+    Case("patient", "patient.dashboard", "/patient/dashboard", 1, label="cached cards"),
+    Case("patient", "patient.dashboard", "/patient/dashboard", 6, prepare=_cold_fragments, label="cold"),
+    Case("patient", "patient.journal_list", "/patient/journal", 1),
+    Case("patient", "patient.journal_archive", "/patient/journal/archive", 1),
+    Case("patient", "patient.journal_search", "/patient/journal/search?q=sleep", 1),
+    Case("patient", "patient.journal_new", "/patient/journal/new", 0),
+    Case("patient", "patient.journal_new", "/patient/journal/new", 4, method="POST",
+         form=lambda d: {"title": "Bench", "body": "sleep and calm", "shared_with_therapist": "y"}),
+    Case("patient", "patient.journal_edit", "/patient/journal/{entry_id}/edit", 1),
+    Case("patient", "patient.journal_edit", "/patient/journal/{entry_id}/edit", 4, method="POST",
+         form=lambda d: {"title": "Edited", "body": "walk and music", "shared_with_therapist": "y"}),
+    Case("patient", "patient.journal_delete", "/patient/journal/{entry_id}/delete", 5, method="POST",
+         prepare=_fresh_entry),
+    Case("patient", "patient.mood_checkin", "/patient/mood", 1),
+    Case("patient", "patient.mood_checkin", "/patient/mood", 8, method="POST", form=lambda d: {"rating": 6}),
+    Case("patient", "patient.mood_stats_json", "/patient/mood/stats", 2),
+    Case("patient", "patient.mood_history_json", "/patient/mood/history?days=365", 2),
+    Case("patient", "patient.mood_series_json", "/patient/mood/series?start=2000-01-01&points=50", 1),
+    Case("patient", "patient.resources", "/patient/resources", 2),
+    Case("patient", "patient.crisis", "/patient/crisis", 1),
+    Case("patient", "patient.crisis", "/patient/crisis", 6, method="POST"),
+    Case("patient", "patient.export_record", "/patient/export", _export_budget),
+    Case("therapist", "therapist.dashboard", "/therapist/dashboard", 1, label="cached cards"),
+    Case("therapist", "therapist.dashboard", "/therapist/dashboard", 3, prepare=_cold_fragments, label="cold"),
+    Case("therapist", "therapist.patients", "/therapist/patients", 2),
+    Case("therapist", "therapist.patients", "/therapist/patients", 6, method="POST",
+         form=lambda d: {"patient_email": d.spare_email()}),
+    Case("therapist", "therapist.patients_bulk", "/therapist/patients/bulk", 0),
+    Case("therapist", "therapist.patients_bulk", "/therapist/patients/bulk", 6, method="POST",
+         form=lambda d: {"emails": "\n".join(d.spare_email() for _ in range(20))}),
+    Case("therapist", "therapist.patient_journal", "/therapist/patients/{patient_id}/journal", 3),
+    Case("therapist", "therapist.patient_journal_entry",
+         "/therapist/patients/{patient_id}/journal/{shared_entry_id}", 3),
+    Case("therapist", "therapist.patient_journal_archive", "/therapist/patients/{patient_id}/journal/archive", 3),
+    Case("therapist", "therapist.patient_journal_search",
+         "/therapist/patients/{patient_id}/journal/search?q=sleep", 3),
+    # +1 on the last page, which continues into the daily/weekly rollups.
+    Case("therapist", "therapist.patient_mood", "/therapist/patients/{patient_id}/mood", 6),
+    Case("therapist", "therapist.patient_mood_stats", "/therapist/patients/{patient_id}/mood/stats", 3),
+    Case("therapist", "therapist.patient_mood_history", "/therapist/patients/{patient_id}/mood/history?days=365", 3),
+    Case("therapist", "therapist.mood_series", "/therapist/mood/series?{caseload}&start=2000-01-01&points=50", 2,
+         prepare=_caseload, label="caseload"),
+    Case("therapist", "therapist.alert_resolve", "/therapist/alerts/{alert_id}/resolve", 4, method="POST",
+         prepare=_fresh_alert),
+    Case("therapist", "therapist.alerts_stream", "/therapist/alerts/stream", 0, stream=True),
+    Case("therapist", "therapist.resources_list", "/therapist/resources", 1),
+    Case("therapist", "therapist.resources_new", "/therapist/resources/new", 0),
+    Case("therapist", "therapist.resources_new", "/therapist/resources/new", 1, method="POST",
+         form=lambda d: {"title": "Bench", "url": "https://example.org/b", "description": ""}),
+    Case("therapist", "therapist.resources_edit", "/therapist/resources/{resource_id}/edit", 1),
+    Case("therapist", "therapist.resources_edit", "/therapist/resources/{resource_id}/edit", 1, method="POST",
+         form=lambda d: {"title": "Edited", "url": "https://example.org/e", "description": ""}),
+    Case("therapist", "therapist.resources_delete", "/therapist/resources/{resource_id}/delete", 2,
+         method="POST", prepare=_fresh_resource),
+]
+
+
+@dataclass
+class Result:
+    name: str
+    statements: int
+    budget: int
+    status: int
+    latencies_ms: list[float] = field(default_factory=list)
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.latencies_ms)
+
+    @property
+    def p95_ms(self) -> float:
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def uncovered(app) -> list[str]:
+    """patient/therapist routes (endpoint + method) that have no case."""
+    covered = {(c.endpoint, c.method) for c in CASES}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint.split(".")[0] not in ("patient", "therapist"):
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if (rule.endpoint, method) not in covered:
+                missing.append(f"{method} {rule.endpoint}")
+    return missing
+
+
+def make_app(url: str):
+    return create_app(
+        {
+            "TESTING": True,
+            "WTF_CSRF_ENABLED": False,
+            "SECRET_KEY": "bench",
+            "SQLALCHEMY_DATABASE_URI": url,
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+            "LOGIN_RATE_LIMIT_IP": "",
+            "LOGIN_RATE_LIMIT_EMAIL": "",
+            "JINJA_CACHE_DIR": "",
+        }
+    )
+
+
+def run_cases(app, data: Dataset, repeat: int) -> list[Result]:
+    statements: list[str] = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    clients = {}
+    for role, email in (("patient", data.patient_email), ("therapist", data.therapist_email)):
+        clients[role] = app.test_client()
+        resp = clients[role].post("/auth/login", data={"email": email, "password": PASSWORD})
+        assert resp.status_code == 302, f"{role} login failed"
+
+    results = []
+    for case in CASES:
+        client = clients[case.role]
+        result = None
+        # The first request warms the per-process caches and is not timed.
+        for i in range(repeat + 1):
+            with app.app_context():
+                params = {"patient_id": data.patient_id, "entry_id": data.entry_id,
+                          "shared_entry_id": data.shared_entry_id, "resource_id": data.resource_id}
+                if case.prepare:
+                    params.update(case.prepare(data))
+            path = case.path.format(**params)
+            kwargs = {"data": case.form(data)} if case.form else {}
+            statements.clear()
+            started = time.perf_counter()
+            resp = client.open(path, method=case.method, buffered=not case.stream, **kwargs)
+            if case.stream:
+                resp.close()
+            elapsed = (time.perf_counter() - started) * 1000
+            if i == 0:
+                continue
+            if result is None:
+                result = Result(case.name, len(statements), case.limit(data), resp.status_code)
+            result.statements = max(result.statements, len(statements))
+            result.status = resp.status_code if resp.status_code >= 400 else result.status
+            result.latencies_ms.append(elapsed)
+        results.append(result)
+    return results
+
+
+def check(results: list[Result], baseline: dict | None, tolerance: float, min_delta_ms: float) -> list[str]:
+    failures = []
+    for r in results:
+        if r.status >= 400:
+            failures.append(f"{r.name}: HTTP {r.status}")
+        if r.statements > r.budget:
+            failures.append(f"{r.name}: {r.statements} SQL statements, budget {r.budget}")
+        before = (baseline or {}).get(r.name)
+        if before is not None:
+            limit = max(before * (1 + tolerance), before + min_delta_ms)
+            if r.median_ms > limit:
+                failures.append(f"{r.name}: median {r.median_ms:.1f} ms, baseline {before:.1f} ms")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="large")
+    parser.add_argument("--repeat", type=int, default=10, help="timed requests per route")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed median slowdown, 0.5 = 50%%")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--baseline", type=Path, help="default: benchmarks/baselines/routes-<scale>.json")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's medians as the baseline")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or BASELINE_DIR / f"routes-{args.scale}.json"
+    tmp = Path(tempfile.mkdtemp(prefix="psycare-routes-"))
+    app = make_app(f"sqlite:///{tmp / 'bench.db'}")
+
+    missing = uncovered(app)
+    if missing:
+        sys.exit("routes without a budget in CASES: " + ", ".join(missing))
+
+    started = time.perf_counter()
+    with app.app_context():
+        migrations.ensure_schema()
+        data = prepare(SCALES[args.scale])
+    print(f"seeded {args.scale} dataset in {time.perf_counter() - started:.1f} s")
+
+    results = run_cases(app, data, args.repeat)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() and not args.save_baseline else None
+
+    print(f"{'route':<58} {'sql':>4} {'budget':>6} {'median ms':>10} {'p95 ms':>8} {'baseline':>9}")
+    for r in results:
+        before = (baseline or {}).get(r.name)
+        print(
+            f"{r.name:<58} {r.statements:>4} {r.budget:>6} {r.median_ms:>10.2f} {r.p95_ms:>8.2f} "
+            f"{'-' if before is None else f'{before:.2f}':>9}"
+        )
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps({r.name: round(r.median_ms, 3) for r in results}, indent=2) + "\n")
+        print(f"baseline written to {baseline_path}")
+
+    failures = check(results, baseline, args.tolerance, args.min_delta_ms)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
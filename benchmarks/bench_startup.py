@@ -0,0 +1,103 @@
+"""Worker cold-start cost: import time and time to first request.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1500   # exit 1 if slower
+
+Every run is a fresh interpreter, as a new gunicorn worker would be. The
+first run starts with an empty Jinja bytecode cache, the rest reuse it.
+``-X importtime`` output is summarised to the slowest modules so an
+import-time regression points at its cause.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+from psycare import create_app
+t1 = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1], "JINJA_CACHE_DIR": sys.argv[2]})
+t2 = time.perf_counter()
+resp = app.test_client().get("/auth/login")
+t3 = time.perf_counter()
+assert resp.status_code == 200, resp.status_code
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "first_request": t3 - t2, "total": t3 - t0}))
+"""
+
+
+def _env() -> dict:
+    return {**os.environ, "PYTHONPATH": str(ROOT) + os.pathsep + os.environ.get("PYTHONPATH", "")}
+
+
+def import_profile(top: int) -> tuple[float, list[tuple[float, str]]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import psycare"],
+        capture_output=True, text=True, check=True, env=_env(),
+    )
+    rows = []
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        head, cumulative_us, name = line.split("|")
+        self_us, name = head.split(":", 1)[1], name.strip()
+        rows.append((int(self_us) / 1000, name))
+        if name == "psycare":
+            total = int(cumulative_us) / 1000
+    return total, sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if median time to first request exceeds this")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="psycare-startup-"))
+    db_url = f"sqlite:///{tmp / 'app.db'}"
+    cache_dir = tmp / "jinja-cache"
+    subprocess.run(
+        [sys.executable, "-m", "flask", "--app", "psycare:create_app", "db", "upgrade"],
+        check=True, capture_output=True, env={**_env(), "DATABASE_URL": db_url, "JINJA_CACHE_DIR": ""},
+    )
+
+    total, slowest = import_profile(args.top)
+    print(f"import psycare: {total:.1f} ms cumulative; slowest modules by self time:")
+    for ms, name in slowest:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    samples = []
+    for i in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE, db_url, str(cache_dir)],
+            capture_output=True, text=True, check=True, env=_env(),
+        ).stdout
+        sample = json.loads(out)
+        samples.append(sample)
+        label = "cold cache" if i == 0 else "warm cache"
+        print(
+            f"run {i + 1} ({label}): import {sample['import'] * 1000:.0f} ms, "
+            f"create_app {sample['create_app'] * 1000:.0f} ms, "
+            f"first request {sample['first_request'] * 1000:.0f} ms, total {sample['total'] * 1000:.0f} ms"
+        )
+
+    median = statistics.median(s["total"] for s in samples) * 1000
+    print(f"median time to first response: {median:.0f} ms")
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"over budget ({args.budget_ms:.0f} ms)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""Load driver: synthetic patients and therapists replaying a realistic mix over HTTP.
+
+    python benchmarks/loadgen.py --users 40 --duration 30
+    python benchmarks/loadgen.py --users 40 --json run.json        # keep results to compare releases
+    python benchmarks/loadgen.py --url http://127.0.0.1:8000 --seed 1 --therapists 100 --patients 100
+
+Without --url the app is seeded into a temporary SQLite database (``flask
+seed`` data, fixed distribution) and served by werkzeug's threaded WSGI
+server in a child process. To size workers, point --url at the production
+server (e.g. gunicorn with different -w/--threads) seeded the same way. With --url the target must already hold ``flask seed
+--seed N`` data with at least the given counts, and its login rate limits
+must allow one login per virtual user from this host.
+
+Each virtual user is a thread with its own keep-alive connection and cookie
+jar. It signs in through the real login form (CSRF token included), then
+loops over weighted actions with optional think time. Dashboards are fetched
+with If-None-Match like a browser would, so 304s count as successes.
+Reported per action: requests, req/s, p50/p95/p99 latency and error rate.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from psycare.seed import PASSWORD, SeedConfig, patient_email, therapist_email  # noqa: E402
+
+_CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+_PATIENT_LINK_RE = re.compile(r"/therapist/patients/(\d+)/")
+_RESOLVE_RE = re.compile(r"/therapist/alerts/(\d+)/resolve")
+
+
+class Session:
+    """One browser: a keep-alive connection, a cookie jar and the last CSRF token seen."""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.cookies: dict[str, str] = {}
+        self.etags: dict[str, str] = {}
+        self.csrf = ""
+        self._conn: http.client.HTTPConnection | None = None
+
+    def request(self, method: str, path: str, form: dict | None = None, revalidate: bool = False):
+        headers = {"Connection": "keep-alive"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if revalidate and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        body = None
+        if form is not None:
+            body = urlencode({"csrf_token": self.csrf, **form})
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        for attempt in (0, 1):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                resp = self._conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # the server closed an idle keep-alive connection; retry once on a fresh one
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+        for header in resp.headers.get_all("Set-Cookie") or ():
+            name, _, value = header.split(";", 1)[0].partition("=")
+            self.cookies[name.strip()] = value
+        if resp.status == 200 and resp.headers.get("ETag"):
+            self.etags[path] = resp.headers["ETag"]
+        text = data.decode("utf-8", "replace")
+        match = _CSRF_RE.search(text)
+        if match:
+            self.csrf = match.group(1)
+        return resp.status, text
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+
+@dataclass
+class VirtualUser:
+    role: str
+    email: str
+    session: Session
+    rng: random.Random
+    patient_ids: list[int] = field(default_factory=list)  # therapists: caseload seen on the dashboard
+    alert_ids: list[int] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Action:
+    name: str
+    weight: float
+    run: Callable[[VirtualUser], int]
+
+
+def _ok(status: int) -> bool:
+    return status < 400
+
+
+def _get(path: str, revalidate: bool = False) -> Callable[[VirtualUser], int]:
+    return lambda u: u.session.request("GET", path, revalidate=revalidate)[0]
+
+
+def _post(path: str, form: Callable[[VirtualUser], dict]) -> Callable[[VirtualUser], int]:
+    return lambda u: u.session.request("POST", path, form(u))[0]
+
+
+def _therapist_dashboard(u: VirtualUser) -> int:
+    status, text = u.session.request("GET", "/therapist/dashboard", revalidate=True)
+    if status == 200:
+        u.patient_ids = sorted({int(pid) for pid in _PATIENT_LINK_RE.findall(text)}) or u.patient_ids
+        u.alert_ids = [int(aid) for aid in _RESOLVE_RE.findall(text)]
+    return status
+
+
+def _patient_page(suffix: str) -> Callable[[VirtualUser], int]:
+    def run(u: VirtualUser) -> int:
+        if not u.patient_ids:
+            return _therapist_dashboard(u)
+        return u.session.request("GET", f"/therapist/patients/{u.rng.choice(u.patient_ids)}/{suffix}")[0]
+
+    return run
+
+
+def _resolve_alert(u: VirtualUser) -> int:
+    if not u.alert_ids:
+        return _therapist_dashboard(u)
+    return u.session.request("POST", f"/therapist/alerts/{u.alert_ids.pop()}/resolve", {})[0]
+
+
+PATIENT_MIX = [
+    Action("patient dashboard", 30, _get("/patient/dashboard", revalidate=True)),
+    Action("mood form", 8, _get("/patient/mood")),
+    Action("mood check-in", 15, _post("/patient/mood", lambda u: {"rating": u.rng.randint(1, 10), "note": "loadgen"})),
+    Action("mood stats", 5, _get("/patient/mood/stats")),
+    Action("journal list", 10, _get("/patient/journal")),
+    Action("journal write", 8, _post("/patient/journal/new", lambda u: {
+        "title": "Load test entry", "body": "Slept badly, walked in the park, felt calmer.",
+        "shared_with_therapist": "y",
+    })),
+    Action("journal search", 4, _get("/patient/journal/search?q=sleep")),
+    Action("resources", 4, _get("/patient/resources")),
+    Action("crisis alert", 1, _post("/patient/crisis", lambda u: {})),
+]
+
+THERAPIST_MIX = [
+    Action("therapist dashboard", 30, _therapist_dashboard),
+    Action("patients list", 8, _get("/therapist/patients")),
+    Action("review journal", 20, _patient_page("journal")),
+    Action("review moods", 20, _patient_page("mood")),
+    Action("mood stats (therapist)", 8, _patient_page("mood/stats")),
+    Action("resolve alert", 4, _resolve_alert),
+    Action("resources (therapist)", 4, _get("/therapist/resources")),
+]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def add(self, name: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(recorder: Recorder, seconds: float) -> dict:
+    rows = {}
+    for name, values in sorted(recorder.latencies.items()):
+        ordered = sorted(values)
+        rows[name] = {
+            "requests": len(values),
+            "rps": len(values) / seconds,
+            "p50_ms": statistics.median(ordered) * 1000,
+            "p95_ms": _percentile(ordered, 0.95) * 1000,
+            "p99_ms": _percentile(ordered, 0.99) * 1000,
+            "error_rate": recorder.errors.get(name, 0) / len(values),
+        }
+    total = sum(r["requests"] for r in rows.values())
+    errors = sum(recorder.errors.values())
+    return {
+        "seconds": seconds,
+        "requests": total,
+        "rps": total / seconds,
+        "error_rate": errors / total if total else 0.0,
+        "actions": rows,
+    }
+
+
+def _login(user: VirtualUser) -> bool:
+    user.session.request("GET", "/auth/login")
+    status, _ = user.session.request("POST", "/auth/login", {"email": user.email, "password": PASSWORD})
+    return status == 302 and "session" in user.session.cookies
+
+
+def run_load(users: list[VirtualUser], duration: float, think: float, recorder: Recorder, logins: Recorder) -> float:
+    ready = threading.Barrier(len(users) + 1)
+    stop = threading.Event()
+    failed_logins = []
+
+    def worker(user: VirtualUser) -> None:
+        started = time.perf_counter()
+        try:
+            ok = _login(user)
+        except OSError:
+            ok = False
+        logins.add("login", time.perf_counter() - started, ok)
+        if not ok:
+            failed_logins.append(user.email)
+        ready.wait()
+        if not ok:
+            return
+        mix = PATIENT_MIX if user.role == "patient" else THERAPIST_MIX
+        weights = [a.weight for a in mix]
+        while not stop.is_set():
+            action = user.rng.choices(mix, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = _ok(action.run(user))
+            except OSError:
+                ok = False
+            recorder.add(action.name, time.perf_counter() - started, ok)
+            if think:
+                stop.wait(user.rng.expovariate(1 / think))
+        user.session.close()
+
+    threads = [threading.Thread(target=worker, args=(u,), daemon=True) for u in users]
+    for t in threads:
+        t.start()
+    ready.wait()
+    if failed_logins:
+        print(f"{len(failed_logins)} logins failed, e.g. {failed_logins[0]}", file=sys.stderr)
+    started = time.perf_counter()
+    stop.wait(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started
+
+
+def _app_config(db_url: str) -> dict:
+    return {
+        "SECRET_KEY": "loadgen",
+        "SQLALCHEMY_DATABASE_URI": db_url,
+        # every virtual user logs in from 127.0.0.1
+        "LOGIN_RATE_LIMIT_IP": "",
+        "LOGIN_RATE_LIMIT_EMAIL": "",
+    }
+
+
+def _serve(db_url: str) -> None:
+    """Child process: serve the app and announce the port on stdout."""
+    import logging
+
+    from werkzeug.serving import make_server
+
+    from psycare import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app = create_app(_app_config(db_url))
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    print(server.server_port, flush=True)
+    server.serve_forever()
+
+
+def serve_seeded_app(config: SeedConfig) -> tuple[subprocess.Popen, str]:
+    """Seed a temporary database, then serve it from a separate process so the
+    driver's threads do not share a GIL with the server."""
+    from psycare import create_app, migrations
+    from psycare.seed import seed
+
+    tmp = Path(tempfile.mkdtemp(prefix="psycare-load-"))
+    db_url = f"sqlite:///{tmp / 'load.db'}"
+    app = create_app({**_app_config(db_url), "JINJA_CACHE_DIR": ""})
+    with app.app_context():
+        migrations.ensure_schema()
+        seed(config)
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--serve", db_url],
+        stdout=subprocess.PIPE, text=True, env={**os.environ, "JINJA_CACHE_DIR": str(tmp / "jinja-cache")},
+    )
+    port = proc.stdout.readline().strip()
+    if not port:
+        proc.kill()
+        sys.exit("server failed to start")
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target an already running server instead of an in-process one")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--therapist-share", type=float, default=0.2, help="fraction of users that are therapists")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load after login")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's requests")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1, help="flask seed --seed value of the accounts")
+    parser.add_argument("--therapists", type=int, default=20, help="seeded therapists to draw users from")
+    parser.add_argument("--patients", type=int, default=50, help="seeded patients per therapist")
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        _serve(args.serve)
+        return
+
+    config = SeedConfig(
+        therapists=args.therapists, patients_per_therapist=args.patients, distribution="fixed", seed=args.seed
+    )
+    server = None
+    base_url = args.url
+    if base_url is None:
+        started = time.perf_counter()
+        server, base_url = serve_seeded_app(config)
+        print(f"seeded and serving {base_url} in {time.perf_counter() - started:.1f} s")
+
+    rng = random.Random(args.seed)
+    n_therapists = min(args.therapists, max(1, round(args.users * args.therapist_share)))
+    n_patients = min(args.therapists * args.patients, args.users - n_therapists)
+    users = [
+        VirtualUser("therapist", therapist_email(config, i), Session(base_url, args.timeout), random.Random(rng.random()))
+        for i in rng.sample(range(args.therapists), n_therapists)
+    ] + [
+        VirtualUser("patient", patient_email(config, i), Session(base_url, args.timeout), random.Random(rng.random()))
+        for i in rng.sample(range(args.therapists * args.patients), n_patients)
+    ]
+
+    recorder, logins = Recorder(), Recorder()
+    elapsed = run_load(users, args.duration, args.think_ms / 1000, recorder, logins)
+    if server is not None:
+        server.terminate()
+        server.wait()
+
+    result = report(recorder, elapsed)
+    result["login"] = report(logins, elapsed)["actions"].get("login")
+    result["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+    print(f"{len(users)} users ({n_therapists} therapists), {elapsed:.1f} s: "
+          f"{result['requests']} requests, {result['rps']:.1f} req/s, errors {result['error_rate']:.2%}")
+    print(f"{'action':<24} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, row in result["actions"].items():
+        print(f"{name:<24} {row['requests']:>9} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['error_rate']:>7.1%}")
+    if result["login"]:
+        login = result["login"]
+        print(f"(logins before the run: p50 {login['p50_ms']:.0f} ms, p99 {login['p99_ms']:.0f} ms, "
+              f"errors {login['error_rate']:.1%})")
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, default=str) + "\n")
+
+
+if __name__ == "__main__":
+    main()
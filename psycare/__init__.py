@@ -4,9 +4,20 @@ import os
 from pathlib import Path
 
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-from .extensions import csrf, db, login_manager
-from .models import User
+from .assets import assets
+from .assignments import assignments
+from .dbprofile import database_profile
+from .extensions import csrf, db, event_hub, login_manager
+from .freshness import freshness
+from .identity import identity
+from .invalidation import bus
+from .jobs import jobs
+from .metrics import metrics
+from .passwords import hasher
+from .ratelimit import login_limiter
 
 
 def create_app(test_config: dict | None = None) -> Flask:
@@ -26,7 +37,28 @@ def create_app(test_config: dict | None = None) -> Flask:
             f"sqlite:///{Path(app.instance_path) / 'app.db'}",
         ),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        MAX_CONTENT_LENGTH=int(os.environ.get("MAX_CONTENT_LENGTH", str(16 * 1024 * 1024))),
         ALLOW_THERAPIST_REGISTER=os.environ.get("ALLOW_THERAPIST_REGISTER", "0") == "1",
+        PAGE_SIZE=int(os.environ.get("PAGE_SIZE", "20")),
+        EVENTS_BACKEND=os.environ.get("EVENTS_BACKEND", "memory"),
+        EVENTS_MAX_STREAMS=int(os.environ.get("EVENTS_MAX_STREAMS", "32")),
+        DATABASE_PROFILE=os.environ.get("DATABASE_PROFILE", "auto"),
+        JINJA_CACHE_DIR=os.environ.get("JINJA_CACHE_DIR", str(Path(app.instance_path) / "jinja-cache")),
+        ALERT_WEBHOOK_URL=os.environ.get("ALERT_WEBHOOK_URL", ""),
+        ALERT_EMAIL_FROM=os.environ.get("ALERT_EMAIL_FROM", ""),
+        SMTP_HOST=os.environ.get("SMTP_HOST", ""),
+        SMTP_PORT=int(os.environ.get("SMTP_PORT", "25")),
+        DELIVERY_TIMEOUT=float(os.environ.get("DELIVERY_TIMEOUT", "10")),
+        RETENTION_MOOD_DAYS=int(os.environ.get("RETENTION_MOOD_DAYS", "180")),
+        RETENTION_MOOD_DAILY_DAYS=int(os.environ.get("RETENTION_MOOD_DAILY_DAYS", "730")),
+        RETENTION_JOURNAL_DAYS=int(os.environ.get("RETENTION_JOURNAL_DAYS", "365")),
+        RETENTION_KEEP_RECENT=int(os.environ.get("RETENTION_KEEP_RECENT", "30")),
+        RETENTION_BATCH_SIZE=int(os.environ.get("RETENTION_BATCH_SIZE", "1000")),
+        EXPORT_SYNC_MAX_ROWS=int(os.environ.get("EXPORT_SYNC_MAX_ROWS", "20000")),
+        EXPORT_DIR=os.environ.get("EXPORT_DIR", str(Path(app.instance_path) / "exports")),
+        EXPORT_FILE_MAX_AGE=int(os.environ.get("EXPORT_FILE_MAX_AGE", "3600")),
+        INVALIDATION_TRANSPORT=os.environ.get("INVALIDATION_TRANSPORT", "none"),
+        TRUSTED_PROXIES=int(os.environ.get("TRUSTED_PROXIES", "0")),
     )
 
     if test_config:
@@ -34,24 +66,61 @@ def create_app(test_config: dict | None = None) -> Flask:
 
     Path(app.instance_path).mkdir(parents=True, exist_ok=True)
 
+    # Without this, request.remote_addr is the proxy's address and every client shares one login bucket.
+    if app.config["TRUSTED_PROXIES"]:
+        hops = app.config["TRUSTED_PROXIES"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    # Must be set before anything touches app.jinja_env (csrf.init_app does).
+    if app.config["JINJA_CACHE_DIR"]:
+        Path(app.config["JINJA_CACHE_DIR"]).mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(app.config["JINJA_CACHE_DIR"])
+        app.jinja_options = {**app.jinja_options, "bytecode_cache": bytecode_cache}
+
+    database_profile.init_app(app)
     db.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)
+    event_hub.init_app(app)
+    bus.init_app(app)
+    identity.init_app(app)
+    assignments.init_app(app)
+    hasher.init_app(app)
+    login_limiter.init_app(app)
+    freshness.init_app(app)
+    assets.init_app(app)
+    metrics.init_app(app)
+    jobs.init_app(app)
+
+    with app.app_context():
+        database_profile.install(app, db.engine)
+        metrics.install(db.engine)
 
     login_manager.login_view = "auth.login"
 
     @login_manager.user_loader
     def load_user(user_id: str):
-        return db.session.get(User, int(user_id))
+        return identity.load(int(user_id))
 
-    with app.app_context():
-        db.create_all()
+    from . import export, migrations, onboarding, retention, seed
+    from .assets import cli as assets_cli
+    from .jobs import cli as jobs_cli
+
+    app.cli.add_command(migrations.cli)
+    app.cli.add_command(export.cli)
+    app.cli.add_command(onboarding.cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(seed.cli)
+    app.cli.add_command(retention.cli)
+    app.cli.add_command(jobs_cli)
 
+    from .routes.api import bp as api_bp
     from .routes.auth import bp as auth_bp
     from .routes.main import bp as main_bp
     from .routes.patient import bp as patient_bp
     from .routes.therapist import bp as therapist_bp
 
+    app.register_blueprint(api_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(patient_bp)
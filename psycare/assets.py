@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import posixpath
+import re
+import shutil
+from pathlib import Path
+
+import click
+from flask import Flask, current_app, request, send_from_directory
+from flask.cli import AppGroup
+from werkzeug.exceptions import NotFound
+
+try:  # optional: only used to write .br siblings at build time
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".map", ".ttf", ".eot", ".txt"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_TEMPLATE_REF = re.compile(r"""url_for\(\s*['"]static['"]\s*,\s*filename\s*=\s*['"]([^'"]+)['"]""")
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)(.*?)\1\s*\)""")
+
+
+def _is_local(ref: str) -> bool:
+    return bool(ref) and not ref.startswith(("data:", "http:", "https:", "//", "#", "/"))
+
+
+class _Builder:
+    def __init__(self, source: Path, dest: Path):
+        self.source = source
+        self.dest = dest
+        self.manifest: dict[str, str] = {}
+        self.missing: set[str] = set()
+
+    def add(self, name: str) -> str | None:
+        """Copy ``name`` (a path relative to the static root) under its hashed name."""
+        name = posixpath.normpath(name)
+        if name in self.manifest:
+            return self.manifest[name]
+        path = self.source / name
+        if name.startswith("..") or not path.is_file():
+            self.missing.add(name)
+            return None
+        data = path.read_bytes()
+        if path.suffix == ".css":
+            data = self._rewrite_css(name, data.decode("utf-8")).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = posixpath.splitext(name)
+        hashed = f"{stem}.{digest}{ext}"
+        target = self.dest / hashed
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        if path.suffix in COMPRESSIBLE:
+            self._compress(target, data)
+        self.manifest[name] = hashed
+        return hashed
+
+    def _rewrite_css(self, name: str, css: str) -> str:
+        base = posixpath.dirname(name)
+
+        def replace(match: re.Match) -> str:
+            quote, ref = match.groups()
+            if not _is_local(ref):
+                return match.group(0)
+            path = re.split(r"[?#]", ref, maxsplit=1)[0]
+            hashed = self.add(posixpath.join(base, path))
+            if hashed is None:
+                return match.group(0)
+            rel = posixpath.relpath(hashed, base or ".")
+            return f"url({quote}{rel}{ref[len(path):]}{quote})"
+
+        return _CSS_URL.sub(replace, css)
+
+    @staticmethod
+    def _compress(target: Path, data: bytes) -> None:
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data, quality=11)
+        for suffix, packed in variants.items():
+            if len(packed) < len(data) * 0.9:
+                target.with_name(target.name + suffix).write_bytes(packed)
+
+
+def template_references(template_dir: Path) -> list[str]:
+    refs = set()
+    for path in template_dir.rglob("*.html"):
+        refs.update(_TEMPLATE_REF.findall(path.read_text(encoding="utf-8")))
+    return sorted(refs)
+
+
+def build(source: Path, dest: Path, template_dir: Path) -> tuple[dict[str, str], set[str]]:
+    """Write hashed, precompressed copies of every asset the templates use into ``dest``."""
+    if (dest / "manifest.json").is_file():
+        shutil.rmtree(dest)
+    elif dest.exists() and any(dest.iterdir()):
+        raise ValueError(f"{dest} is not empty and holds no previous build")
+    dest.mkdir(parents=True, exist_ok=True)
+    builder = _Builder(source, dest)
+    for ref in template_references(template_dir):
+        builder.add(ref)
+    (dest / "manifest.json").write_text(json.dumps(builder.manifest, indent=2, sort_keys=True) + "\n")
+    return builder.manifest, builder.missing
+
+
+class Assets:
+    """Resolves ``url_for('static', ...)`` through the build manifest when one exists."""
+
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("ASSETS_DIST", str(Path(app.static_folder) / "dist"))
+        manifest_path = Path(app.config["ASSETS_DIST"]) / "manifest.json"
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.is_file() else None
+        app.extensions["assets"] = {"manifest": manifest, "hashed": set((manifest or {}).values())}
+        if manifest is None:
+            return
+        app.url_defaults(self._hashed_filename)
+        app.view_functions["static"] = self.send_asset
+
+    @staticmethod
+    def _hashed_filename(endpoint: str, values: dict) -> None:
+        if endpoint == "static" and "filename" in values:
+            manifest = current_app.extensions["assets"]["manifest"]
+            values["filename"] = manifest.get(values["filename"], values["filename"])
+
+    @staticmethod
+    def send_asset(filename: str):
+        """Serve only built files, preferring a precompressed sibling the client accepts."""
+        state = current_app.extensions["assets"]
+        if filename not in state["hashed"]:
+            raise NotFound()
+        dist = current_app.config["ASSETS_DIST"]
+        for encoding, suffix in ENCODINGS:
+            if encoding in request.accept_encodings and (Path(dist) / (filename + suffix)).is_file():
+                response = send_from_directory(dist, filename + suffix, max_age=31536000)
+                response.mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(dist, filename, max_age=31536000)
+        response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+
+assets = Assets()
+
+cli = AppGroup("assets", help="Static asset pipeline.")
+
+
+@cli.command("build")
+def build_command() -> None:
+    """Fingerprint and precompress the assets referenced by the templates."""
+    dest = Path(current_app.config["ASSETS_DIST"])
+    try:
+        manifest, missing = build(Path(current_app.static_folder), dest, Path(current_app.template_folder))
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from exc
+    for name in sorted(missing):
+        click.echo(f"warning: {name} is referenced but does not exist", err=True)
+    encoders = "gzip" + (", brotli" if brotli is not None else "")
+    click.echo(f"Built {len(manifest)} assets into {dest} ({encoders}); restart the app to serve them.")
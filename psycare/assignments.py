@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+
+from flask import Flask, current_app
+
+from . import versions
+from .cache import TTLCache
+from .extensions import db
+from .models import PatientTherapist
+
+
+VERSION_KEY = "assignments"
+
+
+class _State:
+    def __init__(self, maxsize: int, ttl: float):
+        self.lock = threading.Lock()
+        self.version = -1
+        self.patients_of = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.therapist_of = TTLCache(maxsize=maxsize, ttl=ttl)
+
+
+class AssignmentIndex:
+    """Per-process view of patient/therapist links.
+
+    Every lookup first compares the shared ``assignments`` version (one primary
+    key read per request) with the one this process last saw, so a link made in
+    any worker empties every other worker's index on its next request.
+    """
+
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("ASSIGNMENT_CACHE_SIZE", 4096)
+        app.config.setdefault("ASSIGNMENT_CACHE_TTL", 300.0)
+        app.extensions["assignment_index"] = _State(
+            app.config["ASSIGNMENT_CACHE_SIZE"],
+            app.config["ASSIGNMENT_CACHE_TTL"],
+        )
+
+    def _state(self) -> _State:
+        state: _State = current_app.extensions["assignment_index"]
+        version = versions.get(VERSION_KEY)
+        if version != state.version:
+            with state.lock:
+                if version != state.version:
+                    state.patients_of.clear()
+                    state.therapist_of.clear()
+                    state.version = version
+        return state
+
+    def patients_of(self, therapist_id: int) -> frozenset[int]:
+        state = self._state()
+        ids = state.patients_of.get(therapist_id)
+        if ids is None:
+            ids = frozenset(
+                db.session.scalars(
+                    db.select(PatientTherapist.patient_id).where(PatientTherapist.therapist_id == therapist_id)
+                )
+            )
+            state.patients_of.set(therapist_id, ids)
+        return ids
+
+    def is_assigned(self, therapist_id: int, patient_id: int) -> bool:
+        return patient_id in self.patients_of(therapist_id)
+
+    def therapist_of(self, patient_id: int) -> int | None:
+        state = self._state()
+        therapist_id = state.therapist_of.get(patient_id, default=0)
+        if therapist_id == 0:
+            therapist_id = db.session.scalar(
+                db.select(PatientTherapist.therapist_id)
+                .where(PatientTherapist.patient_id == patient_id)
+                .order_by(PatientTherapist.id)
+                .limit(1)
+            )
+            state.therapist_of.set(patient_id, therapist_id)
+        return therapist_id
+
+    def links_changed(self) -> None:
+        """Call in the same transaction as any PatientTherapist insert or delete."""
+        versions.bump(VERSION_KEY)
+
+
+assignments = AssignmentIndex()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+
+# Applied on every new SQLite connection. WAL lets readers run alongside the
+# single writer, and busy_timeout makes writers queue instead of failing with
+# "database is locked". NORMAL is durable across application crashes in WAL mode.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -32000,  # KiB, i.e. 32 MiB of page cache per connection
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+# QueuePool settings for PostgreSQL/MySQL: enough connections for a threaded
+# worker, pre-ping to survive server-side idle disconnects, recycle below
+# typical proxy/firewall idle limits, and a short wait so overload fails fast.
+SERVER_ENGINE_OPTIONS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 10,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+}
+
+PROFILES = ("auto", "sqlite", "server", "none")
+
+
+def resolve(app: Flask) -> str:
+    name = app.config.get("DATABASE_PROFILE") or "auto"
+    if name not in PROFILES:
+        raise ValueError(f"DATABASE_PROFILE must be one of {', '.join(PROFILES)}, not {name!r}")
+    if name != "auto":
+        return name
+    backend = make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_backend_name()
+    return "sqlite" if backend == "sqlite" else "server"
+
+
+class DatabaseProfile:
+    """Engine tuning selected by ``DATABASE_PROFILE``; explicit engine options always win.
+
+    ``init_app`` must run before ``db.init_app`` (it feeds
+    ``SQLALCHEMY_ENGINE_OPTIONS``); ``install`` runs after it, once the engine exists.
+    """
+
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        profile = resolve(app)
+        app.extensions["database_profile"] = profile
+        if profile == "server":
+            options = dict(SERVER_ENGINE_OPTIONS)
+            options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+        elif profile == "sqlite":
+            app.config.setdefault("SQLITE_PRAGMAS", SQLITE_PRAGMAS)
+
+    def install(self, app: Flask, engine: Engine) -> None:
+        if app.extensions["database_profile"] != "sqlite" or engine.dialect.name != "sqlite":
+            return
+        pragmas = dict(app.config["SQLITE_PRAGMAS"])
+        if engine.url.database in (None, "", ":memory:"):
+            pragmas.pop("journal_mode", None)  # in-memory databases cannot use WAL
+
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+
+database_profile = DatabaseProfile()
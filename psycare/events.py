@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple, Protocol
+
+from flask import Flask, current_app
+
+
+class Event(NamedTuple):
+    id: int
+    channel: str
+    kind: str
+    data: dict
+
+
+class Backend(Protocol):
+    def publish(self, channel: str, kind: str, data: dict) -> int: ...
+
+    def read(self, after_id: int, timeout: float) -> list[Event]: ...
+
+    def last_id(self) -> int: ...
+
+
+class MemoryBackend:
+    """Single-process backend: a bounded log of recent events and one shared condition.
+
+    Idle subscribers cost a blocked thread and nothing else; there is no
+    per-subscriber queue to fill up when nobody is reading.
+    """
+
+    def __init__(self, history: int = 1000):
+        self._events: deque[Event] = deque(maxlen=history)
+        self._next_id = 1
+        self._cond = threading.Condition()
+
+    def publish(self, channel: str, kind: str, data: dict) -> int:
+        with self._cond:
+            event = Event(self._next_id, channel, kind, data)
+            self._next_id += 1
+            self._events.append(event)
+            self._cond.notify_all()
+        return event.id
+
+    def last_id(self) -> int:
+        with self._cond:
+            return self._next_id - 1
+
+    def read(self, after_id: int, timeout: float) -> list[Event]:
+        with self._cond:
+            self._cond.wait_for(lambda: self._next_id - 1 > after_id, timeout=timeout)
+            return [e for e in self._events if e.id > after_id]
+
+
+# Offsets within one log file stay below 1 TiB; the bits above count rotations.
+_GENERATION_SHIFT = 40
+_OFFSET_MASK = (1 << _GENERATION_SHIFT) - 1
+
+
+class FileBackend:
+    """Append-only NDJSON log shared by every worker process on one host.
+
+    An event's id packs the log's generation with the byte offset just past its
+    line, so resuming from a ``Last-Event-ID`` is a single seek. Once the file
+    passes ``max_bytes`` it is rotated to ``.1`` and the next writer starts a new
+    generation with a header line; a reader one generation behind finishes the
+    rotated file before moving on, so rotation neither repeats nor drops events.
+    """
+
+    def __init__(self, path: str | Path, poll_interval: float = 0.5, max_bytes: int = 16 * 1024 * 1024):
+        self.path = Path(path)
+        self.rotated = self.path.with_name(self.path.name + ".1")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        self.poll_interval = poll_interval
+        self.max_bytes = max_bytes
+
+    def publish(self, channel: str, kind: str, data: dict) -> int:
+        line = json.dumps({"channel": channel, "kind": kind, "data": data}, separators=(",", ":")) + "\n"
+        while True:
+            with open(self.path, "ab") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                if not self._is_current(fh):
+                    continue  # another process rotated the log while we waited for the lock
+                size = fh.seek(0, os.SEEK_END)
+                if size > self.max_bytes:
+                    os.replace(self.path, self.rotated)
+                    continue
+                generation = self._generation(self.path)
+                if size == 0:
+                    fh.write(json.dumps({"generation": generation}).encode() + b"\n")
+                fh.write(line.encode())
+                fh.flush()
+                return generation << _GENERATION_SHIFT | fh.tell()
+
+    def _is_current(self, fh) -> bool:
+        try:
+            return os.fstat(fh.fileno()).st_ino == self.path.stat().st_ino
+        except FileNotFoundError:
+            return False
+
+    def _generation(self, path: Path) -> int:
+        """The generation written in ``path``'s header; an empty log follows the rotated one."""
+        try:
+            with open(path, "rb") as fh:
+                first = fh.readline()
+        except FileNotFoundError:
+            first = b""
+        if first.endswith(b"\n"):
+            try:
+                header = json.loads(first)
+            except ValueError:
+                header = None
+            # A log written before headers existed is generation 0.
+            return header["generation"] if isinstance(header, dict) and "generation" in header else 0
+        if path == self.path and self.rotated.exists():
+            return self._generation(self.rotated) + 1
+        return 0
+
+    def _position(self) -> tuple[int, int]:
+        """(generation, size) of the current log, re-read if a rotation slips in between."""
+        while True:
+            try:
+                before = self.path.stat()
+            except FileNotFoundError:
+                before = None
+            generation = self._generation(self.path)
+            try:
+                after = self.path.stat()
+            except FileNotFoundError:
+                after = None
+            if before is None and after is None:
+                return generation, 0
+            if before is not None and after is not None and before.st_ino == after.st_ino:
+                return generation, after.st_size
+
+    def last_id(self) -> int:
+        generation, size = self._position()
+        return generation << _GENERATION_SHIFT | size
+
+    def read(self, after_id: int, timeout: float) -> list[Event]:
+        deadline = time.monotonic() + timeout
+        while True:
+            generation, size = self._position()
+            after_generation, offset = after_id >> _GENERATION_SHIFT, after_id & _OFFSET_MASK
+            if after_generation == generation - 1:
+                events, after_id = self._read_from(self.rotated, generation - 1, offset)
+                more, after_id = self._read_from(self.path, generation, 0)
+                events += more
+            elif after_generation != generation or offset > size:
+                # Older than the rotated file, or an id this log never issued: replay what is kept.
+                events, after_id = self._read_from(self.rotated, generation - 1, 0) if generation else ([], 0)
+                more, after_id = self._read_from(self.path, generation, 0)
+                events += more
+            elif offset < size:
+                events, after_id = self._read_from(self.path, generation, offset)
+            else:
+                events = []
+            if events:
+                return events
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(self.poll_interval, remaining))
+
+    def _read_from(self, path: Path, generation: int, offset: int) -> tuple[list[Event], int]:
+        """Complete events in ``path`` after ``offset``, and the id to resume from."""
+        events = []
+        base = generation << _GENERATION_SHIFT
+        try:
+            fh = open(path, "rb")
+        except FileNotFoundError:
+            return events, base | offset
+        with fh:
+            if offset:
+                # Resync to a line start when the offset does not sit on a record boundary.
+                fh.seek(offset - 1)
+                if fh.read(1) != b"\n":
+                    partial = fh.readline()
+                    if not partial.endswith(b"\n"):
+                        return events, base | offset
+                    offset += len(partial)
+            for raw in fh:
+                if not raw.endswith(b"\n"):
+                    break  # a writer is mid-line; pick it up on the next read
+                offset += len(raw)
+                try:
+                    record = json.loads(raw)
+                    event = Event(base | offset, record["channel"], record["kind"], record["data"])
+                except (ValueError, TypeError, KeyError):
+                    continue  # the generation header, or a line that is not an event
+                events.append(event)
+        return events, base | offset
+
+
+class StreamLimitReached(RuntimeError):
+    """Raised when this worker already serves ``EVENTS_MAX_STREAMS`` subscribers."""
+
+
+class _Subscription:
+    """An SSE body that hands its stream slot back when the server closes it, started or not."""
+
+    def __init__(self, body: Iterator[str], release: Callable[[], None]):
+        self._body = body
+        self._release: Callable[[], None] | None = release
+
+    def __iter__(self) -> _Subscription:
+        return self
+
+    def __next__(self) -> str:
+        return next(self._body)
+
+    def close(self) -> None:
+        self._body.close()
+        if self._release is not None:
+            self._release()
+            self._release = None
+
+
+def format_sse(event: Event) -> str:
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.data)}\n\n"
+
+
+class EventHub:
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("EVENTS_BACKEND", "memory")
+        app.config.setdefault("EVENTS_FILE", str(Path(app.instance_path) / "events.log"))
+        app.config.setdefault("EVENTS_HEARTBEAT_SECONDS", 15.0)
+        # Each open stream holds a worker thread; 0 lifts the cap (gevent/eventlet workers).
+        app.config.setdefault("EVENTS_MAX_STREAMS", 32)
+
+        if app.config["EVENTS_BACKEND"] == "file":
+            backend: Backend = FileBackend(app.config["EVENTS_FILE"])
+        elif app.config["EVENTS_BACKEND"] == "memory":
+            backend = MemoryBackend()
+        else:
+            raise ValueError(f"Unknown EVENTS_BACKEND {app.config['EVENTS_BACKEND']!r}")
+        app.extensions["event_hub"] = backend
+        limit = int(app.config["EVENTS_MAX_STREAMS"])
+        app.extensions["event_streams"] = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+    @property
+    def backend(self) -> Backend:
+        return current_app.extensions["event_hub"]
+
+    def publish(self, channel: str, kind: str, data: dict) -> int:
+        return self.backend.publish(channel, kind, data)
+
+    def stream(self, channel: str, last_event_id: int | None = None) -> Iterator[str]:
+        """SSE body for one subscriber; resolved eagerly so it can outlive the app context.
+
+        Raises StreamLimitReached when the worker has no stream slot left.
+        """
+        backend = self.backend
+        slots: threading.BoundedSemaphore | None = current_app.extensions["event_streams"]
+        if slots is not None and not slots.acquire(blocking=False):
+            raise StreamLimitReached("too many open event streams")
+        heartbeat = float(current_app.config["EVENTS_HEARTBEAT_SECONDS"])
+        newest = backend.last_id()
+        cursor = newest if last_event_id is None else min(last_event_id, newest)
+
+        def generate() -> Iterator[str]:
+            nonlocal cursor
+            yield "retry: 3000\n\n"
+            while True:
+                events = backend.read(cursor, timeout=heartbeat)
+                if not events:
+                    yield ": heartbeat\n\n"
+                    continue
+                for event in events:
+                    cursor = event.id
+                    if event.channel == channel:
+                        yield format_sse(event)
+
+        if slots is None:
+            return generate()
+        return _Subscription(generate(), slots.release)
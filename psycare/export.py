@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import time
+import zlib
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
+
+from .extensions import db
+from .jobs import ClaimedJob, jobs
+from .models import Alert, JournalArchive, JournalEntry, MoodDaily, MoodEntry, MoodWeekly, PatientTherapist, User
+
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+BATCH_SIZE = 500
+WRITE_FILE = "export.write_file"
+EXPIRE_FILE = "export.expire_file"
+
+CSV_FIELDS = [
+    "record", "id", "created_at", "updated_at", "email", "display_name", "role", "therapist_id",
+    "title", "body", "shared_with_therapist", "flagged_risk", "rating", "note", "kind", "message", "resolved",
+    "day", "week", "count", "total", "min_rating", "max_rating",
+]
+
+# (record name, columns, owner column) in export order; each is read in keyset batches on its first column.
+_SOURCES = [
+    ("link", (PatientTherapist.id, PatientTherapist.therapist_id, PatientTherapist.created_at),
+     PatientTherapist.patient_id),
+    ("journal", (JournalEntry.id, JournalEntry.title, JournalEntry.body, JournalEntry.body_z,
+                 JournalEntry.shared_with_therapist, JournalEntry.flagged_risk, JournalEntry.created_at,
+                 JournalEntry.updated_at),
+     JournalEntry.patient_id),
+    ("journal", (JournalArchive.id, JournalArchive.title, JournalArchive.body_z.label("body"),
+                 JournalArchive.shared_with_therapist, JournalArchive.flagged_risk, JournalArchive.created_at,
+                 JournalArchive.updated_at),
+     JournalArchive.patient_id),
+    ("mood", (MoodEntry.id, MoodEntry.rating, MoodEntry.note, MoodEntry.created_at), MoodEntry.patient_id),
+    ("mood_day", (MoodDaily.day, MoodDaily.count, MoodDaily.total, MoodDaily.min_rating, MoodDaily.max_rating),
+     MoodDaily.patient_id),
+    ("mood_week", (MoodWeekly.week, MoodWeekly.count, MoodWeekly.total, MoodWeekly.min_rating,
+                   MoodWeekly.max_rating),
+     MoodWeekly.patient_id),
+    ("alert", (Alert.id, Alert.therapist_id, Alert.kind, Alert.message, Alert.resolved, Alert.created_at),
+     Alert.patient_id),
+]
+
+
+def _batches(stmt: Select, key_col, batch_size: int) -> Iterator[list[dict]]:
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(key_col > last)
+        rows = db.session.execute(page.order_by(key_col).limit(batch_size)).mappings().all()
+        # Hand the connection back between batches so a slow client never pins it.
+        db.session.close()
+        if not rows:
+            return
+        yield [dict(row) for row in rows]
+        last = rows[-1][key_col.name]
+        if len(rows) < batch_size:
+            return
+
+
+def _decoded(row: dict) -> dict:
+    # Archived journal bodies are stored zlib-compressed, and so are very large live ones (in body_z).
+    compressed = row.pop("body_z", None)
+    if compressed is not None:
+        row["body"] = compressed
+    if isinstance(row.get("body"), bytes):
+        row["body"] = zlib.decompress(row["body"]).decode()
+    return row
+
+
+def iter_records(patient_id: int, batch_size: int = BATCH_SIZE) -> Iterator[list[dict]]:
+    """Yield the patient's data as batches of flat dicts, each tagged with ``record``."""
+    user = db.session.execute(
+        select(User.id, User.email, User.display_name, User.role, User.created_at).where(User.id == patient_id)
+    ).mappings().first()
+    if user is None:
+        return
+    yield [{"record": "user", **user}]
+    for name, columns, owner_col in _SOURCES:
+        stmt = select(*columns).where(owner_col == patient_id)
+        for batch in _batches(stmt, columns[0], batch_size):
+            yield [{"record": name, **_decoded(row)} for row in batch]
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _ndjson(batches: Iterable[list[dict]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps({k: _plain(v) for k, v in row.items()}, ensure_ascii=False) + "\n" for row in batch
+        ).encode()
+
+
+def _csv(batches: Iterable[list[dict]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS, restval="", lineterminator="\n")
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows({k: _plain(v) for k, v in row.items()} for row in batch)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def _gzip(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def render(patient_id: int, fmt: str = "ndjson", compress: bool = False, batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    chunks = (_csv if fmt == "csv" else _ndjson)(iter_records(patient_id, batch_size))
+    return _gzip(chunks) if compress else chunks
+
+
+def filename(patient_id: int, fmt: str, compress: bool) -> str:
+    return f"psycare-patient-{patient_id}.{fmt}" + (".gz" if compress else "")
+
+
+def row_count(patient_id: int) -> int:
+    """How many rows an export of the patient would hold; decides whether it may be streamed in-request."""
+    counts = [select(func.count()).where(owner_col == patient_id).scalar_subquery() for _, _, owner_col in _SOURCES]
+    return 1 + db.session.scalar(select(sum(counts[1:], counts[0])))
+
+
+def file_path(patient_id: int, fmt: str, compress: bool) -> Path:
+    return Path(current_app.config["EXPORT_DIR"]) / filename(patient_id, fmt, compress)
+
+
+def ready_file(patient_id: int, fmt: str, compress: bool) -> Path | None:
+    """A file written by the export job within ``EXPORT_FILE_MAX_AGE`` seconds, if there is one."""
+    path = file_path(patient_id, fmt, compress)
+    try:
+        age = time.time() - path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    return path if age < current_app.config["EXPORT_FILE_MAX_AGE"] else None
+
+
+def request_file(patient_id: int, fmt: str, compress: bool) -> None:
+    """Stage a job that writes the export to disk; repeated requests within one max-age window share it."""
+    window = int(time.time() // current_app.config["EXPORT_FILE_MAX_AGE"])
+    payload = {"patient_id": patient_id, "format": fmt, "gzip": compress}
+    jobs.enqueue(WRITE_FILE, payload, key=f"{WRITE_FILE}:{patient_id}:{fmt}:{int(compress)}:{window}")
+
+
+@jobs.handler(WRITE_FILE)
+def write_file(job: ClaimedJob) -> None:
+    payload = job.payload
+    path = file_path(payload["patient_id"], payload["format"], payload["gzip"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{job.id}.part")
+    with partial.open("wb") as out:
+        for chunk in render(payload["patient_id"], payload["format"], payload["gzip"]):
+            out.write(chunk)
+    os.replace(partial, path)
+    # Exports are personal health records; do not leave them on disk past their use.
+    jobs.enqueue(EXPIRE_FILE, {"path": str(path)}, delay=current_app.config["EXPORT_FILE_MAX_AGE"])
+    db.session.commit()
+
+
+@jobs.handler(EXPIRE_FILE)
+def expire_file(job: ClaimedJob) -> None:
+    path = Path(job.payload["path"])
+    try:
+        # A newer export may have replaced the file since this job was queued.
+        if time.time() - path.stat().st_mtime >= current_app.config["EXPORT_FILE_MAX_AGE"]:
+            path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+@click.command("export")
+@click.argument("patient")
+@click.option("--format", "fmt", type=click.Choice(sorted(FORMATS)), default="ndjson", show_default=True)
+@click.option("--gzip", "compress", is_flag=True, help="Gzip the output.")
+@click.option("--output", "-o", type=click.File("wb"), default="-", help="Defaults to stdout.")
+@click.option("--batch-size", type=int, default=BATCH_SIZE, show_default=True)
+@with_appcontext
+def cli(patient: str, fmt: str, compress: bool, output, batch_size: int) -> None:
+    """Stream a patient's full record (by id or email)."""
+    lookup = User.id == int(patient) if patient.isdigit() else User.email == patient.lower()
+    patient_id = db.session.execute(select(User.id).where(lookup, User.role == "patient")).scalar()
+    if patient_id is None:
+        raise click.ClickException(f"No patient {patient!r}.")
+    for chunk in render(patient_id, fmt, compress, batch_size):
+        output.write(chunk)
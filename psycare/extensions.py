@@ -4,7 +4,10 @@ from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import CSRFProtect
 
+from .events import EventHub
+
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 csrf = CSRFProtect()
+event_hub = EventHub()
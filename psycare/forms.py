@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField
 from wtforms import BooleanField, IntegerField, PasswordField, StringField, TextAreaField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional, URL
 
@@ -40,3 +41,8 @@ class ResourceForm(FlaskForm):
 
 class AssignPatientForm(FlaskForm):
     patient_email = StringField("Patient Email", validators=[DataRequired(), Email(), Length(max=255)])
+
+
+class BulkAssignForm(FlaskForm):
+    emails = TextAreaField("Patient Emails", validators=[Optional(), Length(max=100_000)])
+    csv_file = FileField("CSV File", validators=[FileAllowed(["csv", "txt"], "CSV or text files only")])
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from functools import wraps
+from typing import Callable, TypeVar
+
+from flask import Flask, current_app, g, make_response, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from sqlalchemy import select
+
+from . import versions
+from .cache import TTLCache
+from .extensions import db
+from .models import PatientTherapist
+
+
+F = TypeVar("F", bound=Callable)
+
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def touch(*user_ids: int | None) -> None:
+    """Stage a bump of each user's data version; call in the transaction of the write."""
+    keys = sorted({user_key(uid) for uid in user_ids if uid})
+    if keys:
+        versions.bump(*keys)
+
+
+def touch_patient(patient_id: int) -> None:
+    """A patient's own write also changes what every linked therapist's dashboard shows."""
+    therapist_ids = db.session.scalars(
+        select(PatientTherapist.therapist_id).where(PatientTherapist.patient_id == patient_id)
+    )
+    touch(patient_id, *therapist_ids)
+
+
+class Freshness:
+    """Version-derived ETags and a rendered-fragment cache for per-user pages."""
+
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("FRAGMENT_CACHE_SIZE", 2048)
+        app.config.setdefault("FRAGMENT_CACHE_TTL", 300.0)
+        # Pages embed CSRF tokens and date-windowed stats, so validators also roll
+        # over on a clock bucket well inside WTF_CSRF_TIME_LIMIT (3600s by default).
+        app.config.setdefault("ETAG_BUCKET_SECONDS", 1800)
+        app.config.setdefault("BUILD_ID", os.environ.get("BUILD_ID", ""))
+        app.extensions["fragment_cache"] = TTLCache(
+            maxsize=app.config["FRAGMENT_CACHE_SIZE"],
+            ttl=app.config["FRAGMENT_CACHE_TTL"],
+        )
+
+    def fingerprint(self) -> str:
+        """Digest of everything the current user's dashboard depends on; once per request."""
+        if "freshness_fingerprint" not in g:
+            bucket = int(time.time() // current_app.config["ETAG_BUCKET_SECONDS"])
+            generate_csrf()  # make sure the session's raw token exists before it is hashed in
+            parts = (
+                current_app.config["BUILD_ID"],
+                request.endpoint,
+                current_user.id,
+                versions.get(user_key(current_user.id)),
+                session.get(current_app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token"), ""),
+                bucket,
+            )
+            g.freshness_fingerprint = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+        return g.freshness_fingerprint
+
+    def fragment(self, name: str, render: Callable[[], str]) -> Markup:
+        cache = current_app.extensions["fragment_cache"]
+        key = (name, self.fingerprint())
+        html = cache.get(key)
+        if html is None:
+            html = Markup(render())
+            cache.set(key, html)
+        return html
+
+    def conditional(self, view: F) -> F:
+        """Answer If-None-Match with 304 while the user's data version is unchanged."""
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flashes are rendered into the page but are not part of the ETag.
+            if session.get("_flashes"):
+                return view(*args, **kwargs)
+            etag = self.fingerprint()
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.add("Cookie")
+            return response
+
+        return wrapper  # type: ignore[return-value]
+
+    def stats(self) -> dict:
+        return current_app.extensions["fragment_cache"].stats()
+
+
+freshness = Freshness()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+from dataclasses import dataclass, field
+
+from flask import Flask, current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .extensions import db
+from .invalidation import bus
+from .models import User
+
+
+@dataclass(frozen=True, eq=False)
+class CachedUser(UserMixin):
+    """Slim, immutable stand-in for ``User`` used as ``current_user`` on every request."""
+
+    id: int
+    role: str
+    display_name: str
+    email: str
+    token_key: str = field(repr=False)  # see fingerprint(); API tokens carry it and die with the password
+
+
+def fingerprint(password_hash: str) -> str:
+    """Short keyed digest of a password hash: it changes whenever the password does."""
+    key = str(current_app.config["SECRET_KEY"]).encode()
+    return hmac.new(key, password_hash.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+class IdentityCache:
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("USER_CACHE_SIZE", 4096)
+        app.config.setdefault("USER_CACHE_TTL", 60.0)
+        cache = app.extensions["identity_cache"] = TTLCache(
+            maxsize=app.config["USER_CACHE_SIZE"],
+            ttl=app.config["USER_CACHE_TTL"],
+        )
+        bus.subscribe(app, "identity:", lambda key: cache.invalidate(int(key.partition(":")[2])))
+
+    @property
+    def cache(self) -> TTLCache:
+        return current_app.extensions["identity_cache"]
+
+    def load(self, user_id: int) -> CachedUser | None:
+        record = self.cache.get(user_id)
+        if record is not None:
+            return record
+        row = db.session.execute(
+            select(User.id, User.role, User.display_name, User.email, User.password_hash).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        record = CachedUser(*row[:-1], token_key=fingerprint(row.password_hash))
+        self.cache.set(user_id, record)
+        return record
+
+    def invalidate(self, user_id: int) -> None:
+        self.cache.invalidate(user_id)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+identity = IdentityCache()
+
+
+# Evict at flush so this worker never serves its own stale copy, and again after
+# commit in case a concurrent request re-cached the pre-commit row in between.
+# Other workers evict when the bus delivers the committed key.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target: User) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("identity_dirty", set()).add(target.id)
+        bus.stage(session, {f"identity:{target.id}": None})
+    if has_app_context():
+        identity.invalidate(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed(session: Session) -> None:
+    dirty = session.info.pop("identity_dirty", None)
+    if dirty and has_app_context():
+        for user_id in dirty:
+            identity.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session) -> None:
+    session.info.pop("identity_dirty", None)
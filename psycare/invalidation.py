@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, NamedTuple, Protocol
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+log = logging.getLogger(__name__)
+
+TRANSPORTS = ("none", "sqlite", "socket")
+# Datagrams stay well under the default Unix socket buffer.
+_SOCKET_BATCH = 100
+
+
+class Message(NamedTuple):
+    key: str
+    version: int | None  # None: changed, new version unknown
+    published_at: float  # publisher's time.time()
+    origin: str
+
+
+class Transport(Protocol):
+    def publish(self, messages: list[Message]) -> None: ...
+
+    def receive(self, timeout: float) -> list[Message]: ...
+
+    def close(self) -> None: ...
+
+
+class SQLiteTransport:
+    """A shared log table in a SQLite file next to the workers; subscribers poll it by id.
+
+    Rows older than ``retain_seconds`` are pruned by publishers, so a worker
+    that stalls longer than that misses messages and relies on its resync.
+    """
+
+    def __init__(self, path: str | Path, poll_interval: float = 0.05, retain_seconds: float = 300.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.poll_interval = poll_interval
+        self.retain_seconds = retain_seconds
+        self._writer = self._connect()
+        self._writer.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS invalidations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                version INTEGER,
+                published_at REAL NOT NULL,
+                origin TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_invalidations_published_at ON invalidations (published_at);
+            """
+        )
+        self._lock = threading.Lock()
+        self._reader = self._connect()
+        self._cursor = self._reader.execute("SELECT coalesce(max(id), 0) FROM invalidations").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def publish(self, messages: list[Message]) -> None:
+        with self._lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                self._writer.executemany(
+                    "INSERT INTO invalidations (key, version, published_at, origin) VALUES (?, ?, ?, ?)", messages
+                )
+                self._writer.execute(
+                    "DELETE FROM invalidations WHERE published_at < ?", (time.time() - self.retain_seconds,)
+                )
+                self._writer.execute("COMMIT")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+
+    def receive(self, timeout: float) -> list[Message]:
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self._reader.execute(
+                "SELECT id, key, version, published_at, origin FROM invalidations WHERE id > ? ORDER BY id",
+                (self._cursor,),
+            ).fetchall()
+            if rows:
+                self._cursor = rows[-1][0]
+                return [Message(*row[1:]) for row in rows]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(self.poll_interval, remaining))
+
+    def close(self) -> None:
+        self._writer.close()
+        self._reader.close()
+
+
+class UnixSocketTransport:
+    """One datagram socket per worker in a shared directory; publishers send to every peer.
+
+    A socket whose owner is gone refuses the send and is removed. A peer whose
+    queue is full misses the datagram and relies on its resync.
+    """
+
+    def __init__(self, directory: str | Path, name: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{name}.sock"
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(str(self.path))
+        self._out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._out.setblocking(False)
+        self.dropped = 0
+
+    def publish(self, messages: list[Message]) -> None:
+        datagrams = [
+            json.dumps(messages[i:i + _SOCKET_BATCH], separators=(",", ":")).encode()
+            for i in range(0, len(messages), _SOCKET_BATCH)
+        ]
+        for peer in self.directory.glob("*.sock"):
+            if peer == self.path:
+                continue
+            for datagram in datagrams:
+                try:
+                    self._out.sendto(datagram, str(peer))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    peer.unlink(missing_ok=True)
+                    break
+                except BlockingIOError:
+                    self.dropped += 1
+
+    def receive(self, timeout: float) -> list[Message]:
+        self._sock.settimeout(timeout)
+        try:
+            datagram = self._sock.recv(65536)
+        except TimeoutError:
+            return []
+        return [Message(*item) for item in json.loads(datagram)]
+
+    def close(self) -> None:
+        self._sock.close()
+        self._out.close()
+        self.path.unlink(missing_ok=True)
+
+
+Handler = Callable[[str], None]
+
+
+class _State:
+    """One app's bus in one process; rebuilt lazily after a fork."""
+
+    def __init__(self, app: Flask):
+        self.app = app
+        self.kind = app.config["INVALIDATION_TRANSPORT"]
+        self.origin = uuid.uuid4().hex[:12]
+        self.handlers: list[tuple[str, Handler]] = []
+        self.lock = threading.Lock()
+        self.versions: dict[str, int] = {}
+        self.synced_at = time.monotonic()
+        self.pid: int | None = None
+        self.transport: Transport | None = None
+        self.thread: threading.Thread | None = None
+        self.stopping = threading.Event()
+
+    def make_transport(self) -> Transport:
+        config = self.app.config
+        if self.kind == "sqlite":
+            return SQLiteTransport(config["INVALIDATION_SQLITE_PATH"], config["INVALIDATION_POLL_INTERVAL"])
+        return UnixSocketTransport(config["INVALIDATION_SOCKET_DIR"], f"{os.getpid()}-{self.origin}")
+
+    def running(self) -> bool:
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    # Forked: the parent's transport and listener do not belong to this process.
+                    self.pid = os.getpid()
+                    self.versions.clear()
+                    self.thread = None
+                    try:
+                        self.transport = self.make_transport()
+                    except Exception:
+                        # Without a listener every version read goes to the database, as with "none".
+                        log.exception("invalidation bus transport %s unavailable", self.kind)
+                        self.app.extensions["metrics"].invalidation_errors.inc(self.kind, "connect")
+                    else:
+                        self.thread = threading.Thread(target=self.listen, name="invalidation-bus", daemon=True)
+                        self.thread.start()
+        return self.thread is not None and self.thread.is_alive()
+
+    def listen(self) -> None:
+        registry = self.app.extensions["metrics"]
+        resync = self.app.config["INVALIDATION_RESYNC_SECONDS"]
+        while not self.stopping.is_set():
+            try:
+                messages = self.transport.receive(timeout=1.0)
+            except Exception:
+                log.exception("invalidation bus receive failed")
+                registry.invalidation_errors.inc(self.kind, "receive")
+                self.forget()
+                self.stopping.wait(1.0)
+                continue
+            if time.monotonic() - self.synced_at > resync:
+                # Bounds the damage of a missed message: versions are re-read from the database.
+                self.forget()
+            now = time.time()
+            for message in messages:
+                if message.origin == self.origin:
+                    continue
+                self.apply(message.key, message.version)
+                registry.invalidations_received.inc(self.kind)
+                registry.invalidation_lag.observe(max(now - message.published_at, 0.0), self.kind)
+
+    def apply(self, key: str, version: int | None) -> None:
+        with self.lock:
+            if version is None:
+                self.versions.pop(key, None)
+            else:
+                self.versions[key] = max(self.versions.get(key, version), version)
+        for prefix, handler in self.handlers:
+            if key.startswith(prefix):
+                try:
+                    handler(key)
+                except Exception:
+                    log.exception("invalidation handler for %s failed", key)
+
+    def forget(self) -> None:
+        with self.lock:
+            self.versions.clear()
+            self.synced_at = time.monotonic()
+
+
+class InvalidationBus:
+    """Cross-worker eviction: committed writes publish versioned keys, every worker applies them.
+
+    With a transport configured, ``versions.get`` is answered from the keys this
+    worker has seen instead of a read per request, and subscribers (the identity
+    cache) evict as soon as a message arrives. ``INVALIDATION_TRANSPORT=none``
+    keeps every read on the ``cache_versions`` table.
+    """
+
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("INVALIDATION_TRANSPORT", "none")
+        app.config.setdefault("INVALIDATION_SQLITE_PATH", str(Path(app.instance_path) / "invalidation.db"))
+        # AF_UNIX paths are limited to ~100 bytes; keep this directory short.
+        app.config.setdefault("INVALIDATION_SOCKET_DIR", str(Path(app.instance_path) / "bus"))
+        app.config.setdefault("INVALIDATION_POLL_INTERVAL", 0.05)
+        app.config.setdefault("INVALIDATION_RESYNC_SECONDS", 30.0)
+        if app.config["INVALIDATION_TRANSPORT"] not in TRANSPORTS:
+            raise ValueError(f"Unknown INVALIDATION_TRANSPORT {app.config['INVALIDATION_TRANSPORT']!r}")
+        app.extensions["invalidation_bus"] = _State(app)
+        app.before_request(self._listen)
+
+    def _state(self) -> _State:
+        return current_app.extensions["invalidation_bus"]
+
+    def _listen(self) -> None:
+        state = self._state()
+        if state.kind != "none":
+            state.running()
+
+    def subscribe(self, app: Flask, prefix: str, handler: Handler) -> None:
+        """Call ``handler(key)`` on the listener thread for other workers' keys starting with ``prefix``."""
+        app.extensions["invalidation_bus"].handlers.append((prefix, handler))
+
+    def version(self, key: str) -> int | None:
+        """The newest version of ``key`` this worker has seen, or None when it has to ask the database."""
+        state = self._state()
+        if state.kind == "none" or not state.running():
+            return None
+        return state.versions.get(key)
+
+    def remember(self, key: str, version: int) -> None:
+        state = self._state()
+        if state.kind != "none":
+            with state.lock:
+                state.versions[key] = max(state.versions.get(key, version), version)
+
+    def stage(self, session: Session, changes: dict[str, int | None]) -> None:
+        """Publish ``changes`` (key -> new version) once ``session`` commits; dropped on rollback."""
+        session.info.setdefault("invalidations", {}).update(changes)
+
+    def publish(self, changes: dict[str, int | None]) -> None:
+        state = self._state()
+        if state.kind == "none" or not changes:
+            return
+        for key, version in changes.items():
+            if version is not None:
+                self.remember(key, version)
+        if not state.running():
+            return
+        now = time.time()
+        registry = state.app.extensions["metrics"]
+        try:
+            state.transport.publish([Message(key, version, now, state.origin) for key, version in changes.items()])
+        except Exception:
+            log.exception("invalidation bus publish failed")
+            registry.invalidation_errors.inc(state.kind, "publish")
+            return
+        registry.invalidations_published.inc(state.kind, amount=len(changes))
+
+    def shutdown(self, app: Flask) -> None:
+        """Stop this process's listener and release the transport (tests, clean worker exit)."""
+        state: _State = app.extensions["invalidation_bus"]
+        state.stopping.set()
+        if state.thread is not None and state.pid == os.getpid():
+            state.thread.join()
+            state.transport.close()
+
+    def stats(self) -> dict:
+        state = self._state()
+        return {
+            "transport": state.kind,
+            "listening": state.thread is not None and state.thread.is_alive(),
+            "known_keys": len(state.versions),
+        }
+
+
+bus = InvalidationBus()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session) -> None:
+    changes = session.info.pop("invalidations", None)
+    if changes and has_app_context():
+        bus.publish(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session: Session) -> None:
+    session.info.pop("invalidations", None)
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, insert, or_, select, update
+
+from . import versions
+from .extensions import db
+from .models import Job, utc_now
+
+
+PENDING, RUNNING, DONE, DEAD = "pending", "running", "done", "dead"
+
+log = logging.getLogger(__name__)
+_jobs = Job.__table__
+
+
+class PermanentFailure(Exception):
+    """Raised by a handler when retrying cannot help; the job is dead-lettered at once."""
+
+
+@dataclass(frozen=True)
+class ClaimedJob:
+    id: int
+    kind: str
+    payload: dict
+    idempotency_key: str | None
+    attempts: int  # including the one about to run
+    max_attempts: int
+
+
+def backoff(attempts: int, base: float, cap: float) -> float:
+    """Exponential backoff with jitter: half fixed, half random, so retries spread out."""
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class JobQueue:
+    """Database-backed queue: jobs are rows, enqueued on the caller's transaction.
+
+    Workers claim due rows with a lease (``locked_at``); a worker that dies
+    mid-job leaves a lease that expires after ``JOB_LEASE_SECONDS``, and the
+    job is claimed again. Delivery is therefore at-least-once, which is what
+    the idempotency key handed to every handler is for.
+    """
+
+    def __init__(self, app: Flask | None = None):
+        self.handlers: dict[str, Callable[[ClaimedJob], None]] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("JOB_MAX_ATTEMPTS", 8)
+        app.config.setdefault("JOB_BACKOFF_SECONDS", 5.0)
+        app.config.setdefault("JOB_BACKOFF_MAX_SECONDS", 3600.0)
+        app.config.setdefault("JOB_LEASE_SECONDS", 300.0)
+        app.config.setdefault("JOB_POLL_SECONDS", 1.0)
+        app.config.setdefault("JOB_CONCURRENCY", 4)
+
+    def handler(self, kind: str) -> Callable[[Callable[[ClaimedJob], None]], Callable[[ClaimedJob], None]]:
+        def decorator(fn: Callable[[ClaimedJob], None]) -> Callable[[ClaimedJob], None]:
+            self.handlers[kind] = fn
+            return fn
+
+        return decorator
+
+    def enqueue(self, kind: str, payload: dict, key: str | None = None, delay: float = 0.0) -> None:
+        """Stage a job on the caller's transaction; a ``key`` that was enqueued before is ignored."""
+        if kind not in self.handlers:
+            raise ValueError(f"no handler registered for job kind {kind!r}")
+        values = {
+            "kind": kind,
+            "payload": json.dumps(payload),
+            "idempotency_key": key,
+            "status": PENDING,
+            "max_attempts": current_app.config["JOB_MAX_ATTEMPTS"],
+            "run_at": utc_now() + timedelta(seconds=delay),
+        }
+        dialect = db.session.get_bind().dialect.name
+        if key is not None and dialect in ("sqlite", "postgresql"):
+            stmt = versions.dialect_insert(dialect)(_jobs).values(**values)
+            db.session.execute(stmt.on_conflict_do_nothing(index_elements=[_jobs.c.idempotency_key]))
+        elif key is None or db.session.scalar(select(_jobs.c.id).where(_jobs.c.idempotency_key == key)) is None:
+            db.session.execute(insert(_jobs).values(**values))
+
+    def _due(self):
+        now = utc_now()
+        expired = now - timedelta(seconds=current_app.config["JOB_LEASE_SECONDS"])
+        return or_(
+            and_(_jobs.c.status == PENDING, _jobs.c.run_at <= now),
+            and_(_jobs.c.status == RUNNING, _jobs.c.locked_at < expired),
+        )
+
+    def claim(self, worker_id: str, limit: int) -> list[ClaimedJob]:
+        """Lease up to ``limit`` due jobs to ``worker_id`` and commit."""
+        due = self._due()
+        candidates = select(_jobs.c.id).where(due).order_by(_jobs.c.run_at).limit(limit)
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            candidates = candidates.with_for_update(skip_locked=True)
+        lease = {"status": RUNNING, "locked_by": worker_id, "locked_at": utc_now(), "attempts": _jobs.c.attempts + 1}
+        columns = (_jobs.c.id, _jobs.c.kind, _jobs.c.payload, _jobs.c.idempotency_key, _jobs.c.attempts,
+                   _jobs.c.max_attempts)
+
+        if dialect in ("sqlite", "postgresql"):
+            # The outer ``due`` re-check makes a row another worker took in the meantime drop out.
+            stmt = update(_jobs).where(_jobs.c.id.in_(candidates.scalar_subquery()), due).values(**lease)
+            rows = db.session.execute(stmt.returning(*columns)).all()
+        else:
+            rows = []
+            for job_id in db.session.scalars(candidates).all():
+                if db.session.execute(update(_jobs).where(_jobs.c.id == job_id, due).values(**lease)).rowcount:
+                    rows.append(db.session.execute(select(*columns).where(_jobs.c.id == job_id)).one())
+        db.session.commit()
+        return [ClaimedJob(r.id, r.kind, json.loads(r.payload), r.idempotency_key, r.attempts, r.max_attempts)
+                for r in rows]
+
+    def run(self, job: ClaimedJob, worker_id: str) -> str:
+        """Run one claimed job and record the outcome; returns the new status."""
+        fn = self.handlers.get(job.kind)
+        try:
+            if fn is None:
+                raise PermanentFailure(f"no handler registered for job kind {job.kind!r}")
+            fn(job)
+        except Exception as exc:
+            db.session.rollback()
+            config = current_app.config
+            if isinstance(exc, PermanentFailure) or job.attempts >= job.max_attempts:
+                values = {"status": DEAD, "finished_at": utc_now()}
+                log.error("job %s (%s) dead after %d attempts: %s", job.id, job.kind, job.attempts, exc)
+            else:
+                delay = backoff(job.attempts, config["JOB_BACKOFF_SECONDS"], config["JOB_BACKOFF_MAX_SECONDS"])
+                values = {"status": PENDING, "run_at": utc_now() + timedelta(seconds=delay)}
+                log.warning("job %s (%s) attempt %d failed, retrying in %.0f s: %s",
+                            job.id, job.kind, job.attempts, delay, exc)
+            values["last_error"] = f"{type(exc).__name__}: {exc}"[:2000]
+        else:
+            values = {"status": DONE, "finished_at": utc_now(), "last_error": None}
+        values.update(locked_by=None, locked_at=None)
+        # Only the lease holder records an outcome; after a lease expiry the job belongs to someone else.
+        db.session.execute(
+            update(_jobs).where(_jobs.c.id == job.id, _jobs.c.locked_by == worker_id).values(**values)
+        )
+        db.session.commit()
+        return values["status"]
+
+    def work(
+        self,
+        app: Flask,
+        concurrency: int,
+        once: bool = False,
+        worker_id: str | None = None,
+        stop: threading.Event | None = None,
+    ) -> int:
+        """Claim and run jobs on ``concurrency`` threads until ``stop`` is set.
+
+        With ``once`` it returns as soon as nothing is due or running. Returns
+        the number of jobs run.
+        """
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        stop = stop or threading.Event()
+        poll = app.config["JOB_POLL_SECONDS"]
+        processed = 0
+
+        def run(job: ClaimedJob) -> None:
+            with app.app_context():
+                self.run(job, worker_id)
+
+        inflight: set[Future] = set()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job") as pool:
+            while not stop.is_set():
+                inflight = {f for f in inflight if not f.done()}
+                if len(inflight) < concurrency:
+                    with app.app_context():
+                        claimed = self.claim(worker_id, concurrency - len(inflight))
+                    inflight.update(pool.submit(run, job) for job in claimed)
+                    processed += len(claimed)
+                # Either every slot is busy or nothing else is due: sleep until a job
+                # finishes or the next poll.
+                if not inflight:
+                    if once:
+                        break
+                    stop.wait(poll)
+                else:
+                    wait(inflight, timeout=poll, return_when=FIRST_COMPLETED)
+        return processed
+
+
+jobs = JobQueue()
+
+cli = AppGroup("jobs", help="Background job queue.")
+
+
+@cli.command("work")
+@click.option("--concurrency", type=int, help="Jobs run at once (default JOB_CONCURRENCY).")
+@click.option("--once", is_flag=True, help="Exit when no job is due instead of polling.")
+def work_command(concurrency: int | None, once: bool) -> None:
+    """Run queued jobs until interrupted (SIGINT/SIGTERM finish the running ones first)."""
+    app = current_app._get_current_object()
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    done = jobs.work(app, concurrency or app.config["JOB_CONCURRENCY"], once=once, stop=stop)
+    click.echo(f"Ran {done} jobs.")
+
+
+@cli.command("dead")
+@click.option("--limit", type=int, default=50, show_default=True)
+def dead_command(limit: int) -> None:
+    """List dead-lettered jobs, newest first."""
+    rows = db.session.execute(
+        select(_jobs.c.id, _jobs.c.kind, _jobs.c.attempts, _jobs.c.finished_at, _jobs.c.last_error)
+        .where(_jobs.c.status == DEAD)
+        .order_by(_jobs.c.id.desc())
+        .limit(limit)
+    )
+    for row in rows:
+        click.echo(f"{row.id}\t{row.kind}\t{row.attempts} attempts\t{row.finished_at:%Y-%m-%d %H:%M}\t{row.last_error}")
+
+
+@cli.command("retry")
+@click.argument("job_ids", nargs=-1, type=int)
+@click.option("--all-dead", is_flag=True, help="Requeue every dead job.")
+def retry_command(job_ids: tuple[int, ...], all_dead: bool) -> None:
+    """Requeue dead jobs with a fresh attempt budget."""
+    if not job_ids and not all_dead:
+        raise click.UsageError("pass job ids or --all-dead")
+    stmt = update(_jobs).where(_jobs.c.status == DEAD)
+    if not all_dead:
+        stmt = stmt.where(_jobs.c.id.in_(job_ids))
+    result = db.session.execute(stmt.values(status=PENDING, attempts=0, run_at=utc_now(), finished_at=None))
+    db.session.commit()
+    click.echo(f"Requeued {result.rowcount} jobs.")
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from flask import Flask, current_app, g, has_app_context, has_request_context, request, template_rendered
+from flask.signals import before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+SLOW_QUERY_LIMIT = 50
+
+_INF = 'le="+Inf"'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        for labels, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, _INF)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    """One app's metrics; values are per process, like any in-process Prometheus client."""
+
+    def __init__(self):
+        route = ("endpoint", "method")
+        self.requests = Counter("psycare_requests_total", "Requests served.", ("endpoint", "method", "status"))
+        self.latency = Histogram(
+            "psycare_request_duration_seconds", "Time to produce the response.", LATENCY_BUCKETS, route
+        )
+        self.sql_count = Histogram(
+            "psycare_request_sql_statements", "SQL statements executed per request.", COUNT_BUCKETS, route
+        )
+        self.sql_time = Histogram(
+            "psycare_request_sql_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS, route
+        )
+        self.template_time = Histogram(
+            "psycare_request_template_seconds", "Time spent rendering templates per request.", LATENCY_BUCKETS, route
+        )
+        self.hash_time = Histogram(
+            "psycare_password_hash_seconds", "Password hash and verify calls.", LATENCY_BUCKETS, ("op",)
+        )
+        self.slow_requests = Counter("psycare_slow_requests_total", "Requests over SLOW_REQUEST_MS.", ("endpoint",))
+        self.invalidations_published = Counter(
+            "psycare_invalidations_published_total", "Cache invalidations sent to other workers.", ("transport",)
+        )
+        self.invalidations_received = Counter(
+            "psycare_invalidations_received_total", "Cache invalidations applied from other workers.", ("transport",)
+        )
+        self.invalidation_lag = Histogram(
+            "psycare_invalidation_lag_seconds", "Commit-to-eviction delay of received invalidations.", LAG_BUCKETS,
+            ("transport",),
+        )
+        self.invalidation_errors = Counter(
+            "psycare_invalidation_errors_total", "Failed invalidation publishes and receives.", ("transport", "op")
+        )
+
+    def render(self) -> str:
+        lines = []
+        for metric in (
+            self.requests, self.latency, self.sql_count, self.sql_time,
+            self.template_time, self.hash_time, self.slow_requests, self.invalidations_published,
+            self.invalidations_received, self.invalidation_lag, self.invalidation_errors,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("METRICS_TOKEN", None)
+        # Opt-in: 0 disables, otherwise requests slower than this log their queries.
+        app.config.setdefault("SLOW_REQUEST_MS", 0)
+        app.extensions["metrics"] = Registry()
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        template_rendered.connect(self._template_done, app)
+        before_render_template.connect(self._template_start, app)
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._sql_start)
+        event.listen(engine, "after_cursor_execute", self._sql_done)
+
+    @property
+    def registry(self) -> Registry:
+        return current_app.extensions["metrics"]
+
+    def render(self) -> str:
+        return self.registry.render()
+
+    def observe_hash(self, op: str, seconds: float) -> None:
+        if has_app_context():
+            self.registry.hash_time.observe(seconds, op)
+            state = g.get("metrics") if has_request_context() else None
+            if state is not None:
+                state["hash"] += seconds
+
+    @staticmethod
+    def _start() -> None:
+        slow = current_app.config["SLOW_REQUEST_MS"]
+        g.metrics = {
+            "start": time.perf_counter(),
+            "sql_count": 0,
+            "sql": 0.0,
+            "template": 0.0,
+            "template_depth": 0,
+            "hash": 0.0,
+            "queries": [] if slow else None,
+        }
+
+    def _finish(self, response):
+        state = g.pop("metrics", None)
+        if state is None:
+            return response
+        elapsed = time.perf_counter() - state["start"]
+        endpoint = request.endpoint or "<unmatched>"
+        labels = (endpoint, request.method)
+        registry = self.registry
+        registry.requests.inc(endpoint, request.method, str(response.status_code))
+        registry.latency.observe(elapsed, *labels)
+        registry.sql_count.observe(state["sql_count"], *labels)
+        registry.sql_time.observe(state["sql"], *labels)
+        registry.template_time.observe(state["template"], *labels)
+
+        slow = current_app.config["SLOW_REQUEST_MS"]
+        if slow and elapsed * 1000 >= slow:
+            registry.slow_requests.inc(endpoint)
+            current_app.logger.warning(
+                "slow request %s %s (%s) -> %s in %.1f ms: %d SQL statements in %.1f ms, "
+                "templates %.1f ms, password hashing %.1f ms\n%s",
+                request.method, request.path, endpoint, response.status_code, elapsed * 1000,
+                state["sql_count"], state["sql"] * 1000, state["template"] * 1000, state["hash"] * 1000,
+                "\n".join(f"  {ms:8.2f} ms  {sql}" for ms, sql in state["queries"]),
+            )
+        return response
+
+    @staticmethod
+    def _state() -> dict | None:
+        return g.get("metrics") if has_request_context() else None
+
+    def _sql_start(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context._psycare_started = time.perf_counter()
+
+    def _sql_done(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        state = self._state()
+        started = getattr(context, "_psycare_started", None)
+        if state is None or started is None:
+            return
+        elapsed = time.perf_counter() - started
+        state["sql_count"] += 1
+        state["sql"] += elapsed
+        queries = state["queries"]
+        if queries is not None and len(queries) < SLOW_QUERY_LIMIT:
+            queries.append((elapsed * 1000, " ".join(statement.split())[:500]))
+
+    def _template_start(self, app, template, context, **extra) -> None:
+        state = self._state()
+        if state is not None:
+            # Fragments render inside pages; only the outermost render is timed.
+            if state["template_depth"] == 0:
+                state["template_started"] = time.perf_counter()
+            state["template_depth"] += 1
+
+    def _template_done(self, app, template, context, **extra) -> None:
+        state = self._state()
+        if state is not None and state["template_depth"]:
+            state["template_depth"] -= 1
+            if state["template_depth"] == 0:
+                state["template"] += time.perf_counter() - state["template_started"]
+
+
+metrics = Metrics()
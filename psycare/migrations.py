@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass
+from typing import Callable
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, bindparam, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import mood_stats, search, summary
+from .extensions import db
+from .models import (
+    COMPRESS_MIN_BYTES,
+    EXCERPT_LENGTH,
+    Alert,
+    CacheVersion,
+    Job,
+    JournalArchive,
+    JournalEntry,
+    MoodDaily,
+    MoodEntry,
+    MoodStats,
+    MoodWeekly,
+    PatientSummary,
+    Resource,
+    make_excerpt,
+    utc_now,
+)
+
+
+BACKFILL_BATCH = 1000
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+# Kept out of db.metadata so create_all/drop_all never touch the version history.
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=utc_now),
+)
+
+
+def migration(version: int, description: str):
+    def decorator(fn: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        MIGRATIONS.append(Migration(version, description, fn))
+        return fn
+
+    return decorator
+
+
+def applied_versions(conn: Connection) -> set[int]:
+    schema_migrations.create(conn, checkfirst=True)
+    return set(conn.scalars(select(schema_migrations.c.version)))
+
+
+def upgrade(engine: Engine | None = None) -> list[int]:
+    """Apply pending migrations in order, one transaction each.
+
+    Migrations are written to be idempotent so they can also run right after
+    ``db.create_all()`` on a fresh database, where the objects already exist.
+    """
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+
+    done = []
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        if m.version in applied:
+            continue
+        with engine.begin() as conn:
+            m.apply(conn)
+            conn.execute(schema_migrations.insert().values(version=m.version, description=m.description))
+        done.append(m.version)
+    return done
+
+
+def ensure_schema() -> list[int]:
+    """Create missing tables, then apply pending migrations; run once per deploy, not per worker."""
+    db.create_all()
+    return upgrade()
+
+
+def _create_index(conn: Connection, model, name: str) -> None:
+    index = next(i for i in model.__table__.indexes if i.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def _drop_index(conn: Connection, name: str) -> None:
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+@migration(1, "composite indexes for time-ordered queries")
+def _composite_indexes(conn: Connection) -> None:
+    _create_index(conn, JournalEntry, "ix_journal_entries_patient_created")
+    _create_index(conn, JournalEntry, "ix_journal_entries_patient_shared_created")
+    _create_index(conn, MoodEntry, "ix_mood_entries_patient_created")
+    _create_index(conn, Alert, "ix_alerts_therapist_resolved_created")
+    _create_index(conn, Resource, "ix_resources_therapist_created")
+    # Single-column indexes that are now left-prefixes of the composites above.
+    _drop_index(conn, "ix_journal_entries_patient_id")
+    _drop_index(conn, "ix_mood_entries_patient_id")
+    _drop_index(conn, "ix_alerts_therapist_id")
+    _drop_index(conn, "ix_resources_therapist_id")
+
+
+@migration(2, "patient_summaries table for the therapist dashboard")
+def _patient_summaries(conn: Connection) -> None:
+    PatientSummary.__table__.create(conn, checkfirst=True)
+    summary.rebuild(conn)
+
+
+@migration(3, "incremental mood statistics")
+def _mood_stats(conn: Connection) -> None:
+    MoodStats.__table__.create(conn, checkfirst=True)
+    MoodDaily.__table__.create(conn, checkfirst=True)
+    mood_stats.rebuild(conn)
+
+
+@migration(4, "cache_versions table for cross-worker cache invalidation")
+def _cache_versions(conn: Connection) -> None:
+    CacheVersion.__table__.create(conn, checkfirst=True)
+
+
+@migration(5, "FTS5 index over journal entries")
+def _journal_fts(conn: Connection) -> None:
+    # A no-op on engines without FTS5; search falls back to LIKE there.
+    search.install_fts(conn, legacy=True)
+
+
+@migration(6, "jobs table for background deliveries")
+def _jobs(conn: Connection) -> None:
+    Job.__table__.create(conn, checkfirst=True)
+
+
+@migration(7, "weekly mood rollups and the journal archive")
+def _retention(conn: Connection) -> None:
+    if "total_sq" not in {c["name"] for c in inspect(conn).get_columns("mood_daily")}:
+        conn.execute(text("ALTER TABLE mood_daily ADD COLUMN total_sq INTEGER NOT NULL DEFAULT 0"))
+    MoodWeekly.__table__.create(conn, checkfirst=True)
+    JournalArchive.__table__.create(conn, checkfirst=True)
+    # Nothing has been retired yet, so every bucket can still be rebuilt from raw rows.
+    mood_stats.rebuild(conn)
+
+
+@migration(8, "stored journal excerpts and compressed large bodies")
+def _journal_bodies(conn: Connection) -> None:
+    columns = {c["name"] for c in inspect(conn).get_columns("journal_entries")}
+    if "excerpt" not in columns:
+        conn.execute(
+            text(f"ALTER TABLE journal_entries ADD COLUMN excerpt VARCHAR({EXCERPT_LENGTH}) NOT NULL DEFAULT ''")
+        )
+    if "body_z" not in columns:
+        conn.execute(text("ALTER TABLE journal_entries ADD COLUMN body_z BLOB"))
+
+    journals = JournalEntry.__table__
+    last = 0
+    while True:
+        rows = conn.execute(
+            select(journals.c.id, journals.c.patient_id, journals.c.title, journals.c.body,
+                   journals.c.shared_with_therapist)
+            .where(journals.c.id > last, journals.c.body_z.is_(None))
+            .order_by(journals.c.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        last = rows[-1].id
+        large = [r for r in rows if len(r.body.encode()) >= COMPRESS_MIN_BYTES]
+        conn.execute(
+            journals.update().where(journals.c.id == bindparam("b_id")).values(excerpt=bindparam("b_excerpt")),
+            [{"b_id": r.id, "b_excerpt": make_excerpt(r.body)} for r in rows],
+        )
+        if large:
+            conn.execute(
+                journals.update()
+                .where(journals.c.id == bindparam("b_id"))
+                .values(body="", body_z=bindparam("b_body_z")),
+                [{"b_id": r.id, "b_body_z": zlib.compress(r.body.encode())} for r in large],
+            )
+            # The update trigger just re-indexed them with the emptied column.
+            search.index_bodies(conn, [r._asdict() for r in large])
+
+
+@migration(9, "contentless FTS index over journal text")
+def _contentless_fts(conn: Connection) -> None:
+    # Migration 5's index kept a plaintext copy of every body, compressed ones included.
+    search.drop_fts(conn)
+    search.install_fts(conn)
+
+
+cli = AppGroup("db", help="Schema management.")
+
+
+@cli.command("upgrade")
+def upgrade_command() -> None:
+    """Create missing tables and apply pending migrations."""
+    done = ensure_schema()
+    click.echo(f"Applied migrations: {', '.join(map(str, done))}" if done else "Schema is up to date.")
+
+
+@cli.command("current")
+def current_command() -> None:
+    """Show the applied schema version."""
+    with db.engine.begin() as conn:
+        applied = applied_versions(conn)
+    click.echo(str(max(applied, default=0)))
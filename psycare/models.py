@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import zlib
 from datetime import datetime, timezone
 from typing import Optional
 
 from flask_login import UserMixin
-from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy.ext.hybrid import hybrid_property
 
 from .extensions import db
+from .passwords import hasher
 
 
 def utc_now() -> datetime:
@@ -26,10 +28,13 @@ class User(db.Model, UserMixin):
     created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        return hasher.needs_rehash(self.password_hash)
 
 
 class PatientTherapist(db.Model):
@@ -45,39 +50,83 @@ class PatientTherapist(db.Model):
     )
 
 
+EXCERPT_LENGTH = 200
+COMPRESS_MIN_BYTES = 4096
+
+
+def make_excerpt(body: str) -> str:
+    """The start of ``body`` with whitespace collapsed, cut at a word boundary to ``EXCERPT_LENGTH``."""
+    flat = " ".join(body.split())
+    if len(flat) <= EXCERPT_LENGTH:
+        return flat
+    cut = flat[: EXCERPT_LENGTH - 1]
+    return (cut.rsplit(" ", 1)[0] if " " in cut else cut) + "…"
+
+
 class JournalEntry(db.Model):
     __tablename__ = "journal_entries"
 
     id: int = db.Column(db.Integer, primary_key=True)
-    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
     title: str = db.Column(db.String(200), nullable=False)
-    body: str = db.Column(db.Text, nullable=False)
+    excerpt: str = db.Column(db.String(EXCERPT_LENGTH), nullable=False, default="")
+    # Bodies are only loaded when an entry is opened. One of the two holds the
+    # text: ``body_z`` (zlib) once it reaches COMPRESS_MIN_BYTES, else ``_body``.
+    _body = db.deferred(db.Column("body", db.Text, nullable=False, default=""), group="body")
+    body_z = db.deferred(db.Column(db.LargeBinary, nullable=True), group="body")
     shared_with_therapist: bool = db.Column(db.Boolean, nullable=False, default=True)
     flagged_risk: bool = db.Column(db.Boolean, nullable=False, default=False)
 
     created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
     updated_at = db.Column(db.DateTime, nullable=False, default=utc_now, onupdate=utc_now)
 
+    __table_args__ = (
+        db.Index("ix_journal_entries_patient_created", "patient_id", "created_at"),
+        db.Index("ix_journal_entries_patient_shared_created", "patient_id", "shared_with_therapist", "created_at"),
+    )
+
+    @hybrid_property
+    def body(self) -> str:
+        return zlib.decompress(self.body_z).decode() if self.body_z is not None else self._body
+
+    @body.inplace.setter
+    def _body_setter(self, value: str) -> None:
+        self.excerpt = make_excerpt(value)
+        if len(value.encode()) >= COMPRESS_MIN_BYTES:
+            self._body, self.body_z = "", zlib.compress(value.encode())
+        else:
+            self._body, self.body_z = value, None
+
+    @body.inplace.expression
+    @classmethod
+    def _body_expression(cls):
+        # The plain column: empty for compressed rows, so SQL readers also take ``body_z``.
+        return cls._body
+
 
 class MoodEntry(db.Model):
     __tablename__ = "mood_entries"
 
     id: int = db.Column(db.Integer, primary_key=True)
-    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
     rating: int = db.Column(db.Integer, nullable=False)  # 1..10
     note: str = db.Column(db.String(500), nullable=False, default="")
 
     created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
 
+    __table_args__ = (
+        db.Index("ix_mood_entries_patient_created", "patient_id", "created_at"),
+    )
+
 
 class Alert(db.Model):
     __tablename__ = "alerts"
 
     id: int = db.Column(db.Integer, primary_key=True)
     patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
-    therapist_id: Optional[int] = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True, index=True)
+    therapist_id: Optional[int] = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
 
     kind: str = db.Column(db.String(50), nullable=False, default="panic")
     message: str = db.Column(db.String(500), nullable=False, default="")
@@ -85,15 +134,156 @@ class Alert(db.Model):
 
     created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
 
+    __table_args__ = (
+        db.Index("ix_alerts_therapist_resolved_created", "therapist_id", "resolved", "created_at"),
+    )
+
 
 class Resource(db.Model):
     __tablename__ = "resources"
 
     id: int = db.Column(db.Integer, primary_key=True)
-    therapist_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    therapist_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
     title: str = db.Column(db.String(200), nullable=False)
     url: str = db.Column(db.String(500), nullable=False)
     description: str = db.Column(db.String(500), nullable=False, default="")
 
     created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+
+    __table_args__ = (
+        db.Index("ix_resources_therapist_created", "therapist_id", "created_at"),
+    )
+
+
+class PatientSummary(db.Model):
+    """Denormalized dashboard row per link; kept in sync by :mod:`psycare.summary`."""
+
+    __tablename__ = "patient_summaries"
+
+    therapist_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+
+    display_name: str = db.Column(db.String(120), nullable=False, default="")
+    email: str = db.Column(db.String(255), nullable=False, default="")
+
+    last_mood_rating: Optional[int] = db.Column(db.Integer, nullable=True)
+    last_mood_at = db.Column(db.DateTime, nullable=True)
+    last_journal_title: Optional[str] = db.Column(db.String(200), nullable=True)
+    last_journal_flagged: bool = db.Column(db.Boolean, nullable=False, default=False)
+    last_shared_journal_at = db.Column(db.DateTime, nullable=True)
+    unresolved_alert_count: int = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, nullable=False, default=utc_now, onupdate=utc_now)
+
+    __table_args__ = (
+        db.Index("ix_patient_summaries_therapist_name", "therapist_id", "display_name"),
+        db.Index("ix_patient_summaries_patient", "patient_id"),
+    )
+
+
+class MoodStats(db.Model):
+    """Running mood aggregates per patient; maintained by :mod:`psycare.mood_stats`."""
+
+    __tablename__ = "mood_stats"
+
+    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+
+    count: int = db.Column(db.Integer, nullable=False, default=0)
+    total: int = db.Column(db.Integer, nullable=False, default=0)
+    total_sq: int = db.Column(db.Integer, nullable=False, default=0)
+    recent: str = db.Column(db.String(200), nullable=False, default="")  # last N ratings, oldest first
+    last_rating: Optional[int] = db.Column(db.Integer, nullable=True)
+    last_at = db.Column(db.DateTime, nullable=True)
+
+
+class MoodDaily(db.Model):
+    """Per-patient, per-UTC-day mood bucket; backs the rolling means."""
+
+    __tablename__ = "mood_daily"
+
+    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+
+    count: int = db.Column(db.Integer, nullable=False, default=0)
+    total: int = db.Column(db.Integer, nullable=False, default=0)
+    total_sq: int = db.Column(db.Integer, nullable=False, default=0)
+    min_rating: int = db.Column(db.Integer, nullable=False)
+    max_rating: int = db.Column(db.Integer, nullable=False)
+
+
+class MoodWeekly(db.Model):
+    """Per-patient mood bucket for an ISO week (``week`` is its Monday); old daily buckets are folded in here."""
+
+    __tablename__ = "mood_weekly"
+
+    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    week = db.Column(db.Date, primary_key=True)
+
+    count: int = db.Column(db.Integer, nullable=False, default=0)
+    total: int = db.Column(db.Integer, nullable=False, default=0)
+    total_sq: int = db.Column(db.Integer, nullable=False, default=0)
+    min_rating: int = db.Column(db.Integer, nullable=False)
+    max_rating: int = db.Column(db.Integer, nullable=False)
+
+
+class JournalArchive(db.Model):
+    """Journal entries moved out of ``journal_entries`` by retention; ``body_z`` is the zlib-compressed body."""
+
+    __tablename__ = "journal_archive"
+
+    id: int = db.Column(db.Integer, primary_key=True)  # the entry's original id
+    patient_id: int = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+
+    title: str = db.Column(db.String(200), nullable=False)
+    body_z: bytes = db.Column(db.LargeBinary, nullable=False)
+    shared_with_therapist: bool = db.Column(db.Boolean, nullable=False)
+    flagged_risk: bool = db.Column(db.Boolean, nullable=False)
+
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+
+    __table_args__ = (
+        db.Index("ix_journal_archive_patient_created", "patient_id", "created_at"),
+    )
+
+    @property
+    def body(self) -> str:
+        return zlib.decompress(self.body_z).decode()
+
+
+class CacheVersion(db.Model):
+    """Monotonic counters that per-process caches compare against to detect stale entries."""
+
+    __tablename__ = "cache_versions"
+
+    key: str = db.Column(db.String(100), primary_key=True)
+    version: int = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Job(db.Model):
+    """Durable background work; claimed and run by ``flask jobs work`` (:mod:`psycare.jobs`)."""
+
+    __tablename__ = "jobs"
+
+    id: int = db.Column(db.Integer, primary_key=True)
+    kind: str = db.Column(db.String(50), nullable=False)
+    payload: str = db.Column(db.Text, nullable=False, default="{}")  # JSON
+    # Enqueueing the same key twice is a no-op; handlers pass it on so receivers can dedupe retries.
+    idempotency_key: Optional[str] = db.Column(db.String(200), nullable=True, unique=True)
+
+    status: str = db.Column(db.String(16), nullable=False, default="pending")  # pending|running|done|dead
+    attempts: int = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts: int = db.Column(db.Integer, nullable=False, default=8)
+    run_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    locked_by: Optional[str] = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error: Optional[str] = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
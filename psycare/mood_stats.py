@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+
+from sqlalchemy import Date, bindparam, cast, func, insert, inspect, literal, or_, select, tuple_, union_all, update
+from sqlalchemy.engine import Connection
+
+from . import versions
+from .extensions import db
+from .models import MoodDaily, MoodEntry, MoodStats, MoodWeekly, utc_now
+
+
+RECENT_SIZE = 30
+WINDOWS = (7, 30)
+HISTORY_DAYS = 90
+MAX_HISTORY_DAYS = 3650
+
+
+def _parse_recent(recent: str) -> list[int]:
+    return [int(r) for r in recent.split(",") if r]
+
+
+def _upsert(table, values: dict, changes: dict, returning=()) -> list:
+    """Insert ``values``, or apply ``changes`` to the row already there, in one atomic statement where possible."""
+    keys = list(table.primary_key.columns)
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        stmt = versions.dialect_insert(dialect)(table).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=changes)
+        if not returning:
+            db.session.execute(stmt)
+            return []
+        return db.session.execute(stmt.returning(*returning)).all()
+    match = [c == values[c.name] for c in keys]
+    if not db.session.execute(update(table).where(*match).values(**changes)).rowcount:
+        db.session.execute(insert(table).values(**values))
+    return db.session.execute(select(*returning).where(*match)).all() if returning else []
+
+
+def record(entry: MoodEntry) -> None:
+    """Fold one new check-in into the aggregates: each counter moves in SQL, so concurrent check-ins all count.
+
+    The ``recent`` ring is rewritten after the upsert, which holds the row lock
+    until commit, so no concurrent check-in can slip in between.
+    """
+    db.session.flush()
+    rating, at = entry.rating, entry.created_at
+
+    stats = MoodStats.__table__
+    (row,) = _upsert(
+        stats,
+        {"patient_id": entry.patient_id, "count": 1, "total": rating, "total_sq": rating * rating,
+         "recent": "", "last_rating": rating, "last_at": at},
+        {"count": stats.c.count + 1, "total": stats.c.total + rating, "total_sq": stats.c.total_sq + rating * rating,
+         "last_rating": rating, "last_at": at},
+        returning=[stats.c.recent],
+    )
+    ring = (_parse_recent(row.recent) + [rating])[-RECENT_SIZE:]
+    db.session.execute(
+        update(stats).where(stats.c.patient_id == entry.patient_id).values(recent=",".join(map(str, ring)))
+    )
+
+    daily = MoodDaily.__table__
+    # Two-argument min/max: SQLite's scalar forms, LEAST/GREATEST elsewhere.
+    sqlite = db.session.get_bind().dialect.name == "sqlite"
+    least, greatest = (func.min, func.max) if sqlite else (func.least, func.greatest)
+    _upsert(
+        daily,
+        {"patient_id": entry.patient_id, "day": at.date(), "count": 1, "total": rating, "total_sq": rating * rating,
+         "min_rating": rating, "max_rating": rating},
+        {"count": daily.c.count + 1, "total": daily.c.total + rating, "total_sq": daily.c.total_sq + rating * rating,
+         "min_rating": least(daily.c.min_rating, rating), "max_rating": greatest(daily.c.max_rating, rating)},
+    )
+
+
+def stats_for(patient_id: int, today: date | None = None) -> dict:
+    today = today or utc_now().date()
+    stats = db.session.get(MoodStats, patient_id)
+    result: dict = {
+        "count": 0,
+        "mean": None,
+        "stddev": None,
+        "last_rating": None,
+        "last_at": None,
+        "recent": [],
+        **{f"mean_{days}d": None for days in WINDOWS},
+    }
+    if stats is None or not stats.count:
+        return result
+
+    mean = stats.total / stats.count
+    variance = max(stats.total_sq / stats.count - mean * mean, 0.0)
+    result.update(
+        count=stats.count,
+        mean=round(mean, 2),
+        stddev=round(math.sqrt(variance), 2),
+        last_rating=stats.last_rating,
+        last_at=stats.last_at.isoformat() if stats.last_at else None,
+        recent=_parse_recent(stats.recent),
+    )
+
+    since = today - timedelta(days=max(WINDOWS) - 1)
+    buckets = db.session.execute(
+        select(MoodDaily.day, MoodDaily.count, MoodDaily.total).where(
+            MoodDaily.patient_id == patient_id, MoodDaily.day >= since
+        )
+    ).all()
+    for days in WINDOWS:
+        start = today - timedelta(days=days - 1)
+        count = sum(b.count for b in buckets if b.day >= start)
+        total = sum(b.total for b in buckets if b.day >= start)
+        result[f"mean_{days}d"] = round(total / count, 2) if count else None
+    return result
+
+
+@dataclass(frozen=True)
+class MoodPoint:
+    at: datetime  # the check-in time, or the start of the day/week bucket
+    resolution: str  # entry|day|week
+    count: int
+    mean: float
+    min_rating: int
+    max_rating: int
+
+    def as_dict(self) -> dict:
+        return {
+            "at": self.at.isoformat(),
+            "resolution": self.resolution,
+            "count": self.count,
+            "mean": round(self.mean, 2),
+            "min": self.min_rating,
+            "max": self.max_rating,
+        }
+
+
+def _first_raw_day(patient_id_col):
+    first = select(func.min(MoodEntry.created_at)).where(MoodEntry.patient_id == patient_id_col).scalar_subquery()
+    return _day(first, db.session.get_bind().dialect.name)
+
+
+def _rollup_rows(patient_ids: list[int], since: date | None, until: date | None):
+    # Daily buckets from a patient's first raw day on duplicate mood_entries and are left out.
+    first_raw = _first_raw_day(MoodDaily.patient_id)
+    daily = select(
+        MoodDaily.patient_id,
+        MoodDaily.day.label("start"),
+        literal("day").label("resolution"),
+        MoodDaily.count,
+        MoodDaily.total,
+        MoodDaily.min_rating,
+        MoodDaily.max_rating,
+    ).where(MoodDaily.patient_id.in_(patient_ids), or_(first_raw.is_(None), MoodDaily.day < first_raw))
+    weekly = select(
+        MoodWeekly.patient_id,
+        MoodWeekly.week,
+        literal("week"),
+        MoodWeekly.count,
+        MoodWeekly.total,
+        MoodWeekly.min_rating,
+        MoodWeekly.max_rating,
+    ).where(MoodWeekly.patient_id.in_(patient_ids))
+    if since is not None:
+        daily = daily.where(MoodDaily.day >= since)
+        weekly = weekly.where(MoodWeekly.week > since - timedelta(days=7))
+    if until is not None:
+        daily = daily.where(MoodDaily.day < until)
+        weekly = weekly.where(MoodWeekly.week < until)
+    return db.session.execute(union_all(daily, weekly).order_by("patient_id", "start")).all()
+
+
+def _rollup_point(row) -> MoodPoint:
+    return MoodPoint(
+        datetime.combine(row.start, time.min), row.resolution, row.count, row.total / row.count, row.min_rating,
+        row.max_rating,
+    )
+
+
+def rollups(patient_id: int) -> list[MoodPoint]:
+    """Buckets of the patient's retired check-ins, oldest first."""
+    return [_rollup_point(r) for r in _rollup_rows([patient_id], None, None)]
+
+
+def history_since(days: int | None, today: date | None = None) -> datetime:
+    """Start of a ``days``-long history window ending today, clamped to ``MAX_HISTORY_DAYS``."""
+    days = max(1, min(days or HISTORY_DAYS, MAX_HISTORY_DAYS))
+    today = today or utc_now().date()
+    return datetime.combine(today - timedelta(days=days - 1), time.min)
+
+
+def histories(patient_ids: list[int], since: datetime, until: datetime | None = None) -> dict[int, list[MoodPoint]]:
+    """Check-ins in ``[since, until)`` per patient, oldest first.
+
+    Rollups stand in where raw rows were retired. Two statements, however many
+    patients are asked for.
+    """
+    since = since.replace(tzinfo=None)
+    until = until.replace(tzinfo=None) if until is not None else None
+    result: dict[int, list[MoodPoint]] = {patient_id: [] for patient_id in patient_ids}
+    if not patient_ids:
+        return result
+
+    for row in _rollup_rows(patient_ids, since.date(), until.date() if until is not None else None):
+        result[row.patient_id].append(_rollup_point(row))
+
+    raw = select(MoodEntry.patient_id, MoodEntry.rating, MoodEntry.created_at).where(
+        MoodEntry.patient_id.in_(patient_ids), MoodEntry.created_at >= since
+    )
+    if until is not None:
+        raw = raw.where(MoodEntry.created_at < until)
+    for row in db.session.execute(raw.order_by(MoodEntry.patient_id, MoodEntry.created_at, MoodEntry.id)):
+        result[row.patient_id].append(MoodPoint(row.created_at, "entry", 1, row.rating, row.rating, row.rating))
+    return result
+
+
+def series_rows(patient_ids: list[int], since: datetime, until: datetime, raw: bool = True) -> list[tuple]:
+    """``(patient_id, epoch seconds, count, total, min, max)`` per point in ``[since, until)``, by patient and time.
+
+    With ``raw`` check-ins are points of their own and rollups stand in where they
+    were retired, as in ``histories``. Without it every day comes from
+    ``mood_daily``, so the row count follows the days asked for, not the check-ins.
+    """
+    dialect = db.session.get_bind().dialect.name
+    daily = select(
+        MoodDaily.patient_id,
+        _epoch(MoodDaily.day, dialect).label("t"),
+        MoodDaily.count,
+        MoodDaily.total,
+        MoodDaily.min_rating,
+        MoodDaily.max_rating,
+    ).where(MoodDaily.patient_id.in_(patient_ids), MoodDaily.day >= since.date(), MoodDaily.day < until.date())
+    weekly = select(
+        MoodWeekly.patient_id,
+        _epoch(MoodWeekly.week, dialect),
+        MoodWeekly.count,
+        MoodWeekly.total,
+        MoodWeekly.min_rating,
+        MoodWeekly.max_rating,
+    ).where(
+        MoodWeekly.patient_id.in_(patient_ids),
+        MoodWeekly.week > since.date() - timedelta(days=7),
+        MoodWeekly.week < until.date(),
+    )
+    parts = [daily, weekly]
+    if raw:
+        first_raw = _first_raw_day(MoodDaily.patient_id)
+        parts[0] = daily.where(or_(first_raw.is_(None), MoodDaily.day < first_raw))
+        parts.append(
+            select(
+                MoodEntry.patient_id,
+                _epoch(MoodEntry.created_at, dialect),
+                literal(1),
+                MoodEntry.rating,
+                MoodEntry.rating,
+                MoodEntry.rating,
+            ).where(
+                MoodEntry.patient_id.in_(patient_ids),
+                MoodEntry.created_at >= since.replace(tzinfo=None),
+                MoodEntry.created_at < until.replace(tzinfo=None),
+            )
+        )
+    return db.session.execute(union_all(*parts).order_by("patient_id", "t")).all()
+
+
+def history(patient_id: int, since: datetime, until: datetime | None = None) -> list[MoodPoint]:
+    return histories([patient_id], since, until)[patient_id]
+
+
+def _day(column, dialect_name: str):
+    # SQLite stores datetimes as ISO strings, where CAST(... AS DATE) yields the year only.
+    if dialect_name == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _epoch(column, dialect_name: str):
+    # Seconds since 1970 for a naive UTC datetime or a date, computed by the database.
+    if dialect_name == "sqlite":
+        return (func.julianday(column) - 2440587.5) * 86400.0
+    return func.extract("epoch", column)
+
+
+def rebuild(conn: Connection) -> None:
+    """Recompute the aggregates from ``mood_entries`` (backfills and bulk loads).
+
+    Only days that still have raw rows are recomputed: older daily buckets and
+    ``mood_weekly`` are all that is left of check-ins retired by retention.
+    Schemas upgraded from before migration 7 have no ``mood_weekly`` yet.
+    """
+    moods = MoodEntry.__table__
+    daily = MoodDaily.__table__
+    weekly = MoodWeekly.__table__
+    day = _day(moods.c.created_at, conn.dialect.name)
+
+    conn.execute(
+        daily.delete().where(
+            tuple_(daily.c.patient_id, daily.c.day).in_(select(moods.c.patient_id, day).distinct())
+        )
+    )
+    conn.execute(
+        insert(daily).from_select(
+            ["patient_id", "day", "count", "total", "total_sq", "min_rating", "max_rating"],
+            select(
+                moods.c.patient_id,
+                day,
+                func.count(),
+                func.sum(moods.c.rating),
+                func.sum(moods.c.rating * moods.c.rating),
+                func.min(moods.c.rating),
+                func.max(moods.c.rating),
+            ).group_by(moods.c.patient_id, day),
+        )
+    )
+
+    buckets = select(daily.c.patient_id, daily.c.count, daily.c.total, daily.c.total_sq)
+    if inspect(conn).has_table(weekly.name):
+        buckets = union_all(
+            buckets, select(weekly.c.patient_id, weekly.c.count, weekly.c.total, weekly.c.total_sq)
+        )
+    buckets = buckets.subquery()
+    conn.execute(MoodStats.__table__.delete())
+    conn.execute(
+        insert(MoodStats.__table__).from_select(
+            ["patient_id", "count", "total", "total_sq", "recent"],
+            select(
+                buckets.c.patient_id,
+                func.sum(buckets.c.count),
+                func.sum(buckets.c.total),
+                func.sum(buckets.c.total_sq),
+                literal(""),
+            ).group_by(buckets.c.patient_id),
+        )
+    )
+
+    rn = (
+        func.row_number()
+        .over(partition_by=moods.c.patient_id, order_by=(moods.c.created_at.desc(), moods.c.id.desc()))
+        .label("rn")
+    )
+    ranked = select(moods.c.patient_id, moods.c.rating, moods.c.created_at, rn).subquery()
+    rows = conn.execute(
+        select(ranked.c.patient_id, ranked.c.rating, ranked.c.created_at)
+        .where(ranked.c.rn <= RECENT_SIZE)
+        .order_by(ranked.c.patient_id, ranked.c.rn.desc())
+    )
+    stats = MoodStats.__table__
+    params = []
+    for patient_id, group in groupby(rows, key=lambda r: r.patient_id):
+        group = list(group)
+        params.append(
+            {
+                "b_patient_id": patient_id,
+                "b_recent": ",".join(str(r.rating) for r in group),
+                "b_last_rating": group[-1].rating,
+                "b_last_at": group[-1].created_at,
+            }
+        )
+    if params:
+        conn.execute(
+            update(stats)
+            .where(stats.c.patient_id == bindparam("b_patient_id"))
+            .values(
+                recent=bindparam("b_recent"),
+                last_rating=bindparam("b_last_rating"),
+                last_at=bindparam("b_last_at"),
+            ),
+            params,
+        )
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import smtplib
+import urllib.error
+import urllib.request
+from email.message import EmailMessage
+
+from flask import current_app
+from sqlalchemy import select
+
+from .extensions import db
+from .jobs import ClaimedJob, PermanentFailure, jobs
+from .models import Alert, User
+
+
+WEBHOOK = "alert.webhook"
+EMAIL = "alert.email"
+
+
+def _channels() -> list[str]:
+    config = current_app.config
+    channels = []
+    if config["ALERT_WEBHOOK_URL"]:
+        channels.append(WEBHOOK)
+    if config["SMTP_HOST"] and config["ALERT_EMAIL_FROM"]:
+        channels.append(EMAIL)
+    return channels
+
+
+def alert_raised(alert: Alert, patient_name: str) -> None:
+    """Stage one delivery job per configured channel on the caller's transaction.
+
+    Nothing is sent here, so the panic request never waits on SMTP or a webhook.
+    """
+    channels = _channels()
+    if alert.therapist_id is None or not channels:
+        return
+    if alert.id is None:
+        db.session.flush()
+    payload = {
+        "alert_id": alert.id,
+        "therapist_id": alert.therapist_id,
+        "patient_id": alert.patient_id,
+        "patient_name": patient_name,
+        "kind": alert.kind,
+        "message": alert.message,
+        "created_at": alert.created_at.isoformat(),
+    }
+    for kind in channels:
+        jobs.enqueue(kind, payload, key=f"{kind}:{alert.id}")
+
+
+@jobs.handler(WEBHOOK)
+def deliver_webhook(job: ClaimedJob) -> None:
+    request = urllib.request.Request(
+        current_app.config["ALERT_WEBHOOK_URL"],
+        data=json.dumps(job.payload).encode(),
+        headers={"Content-Type": "application/json", "Idempotency-Key": job.idempotency_key or str(job.id)},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=current_app.config["DELIVERY_TIMEOUT"]) as response:
+            response.read()
+    except urllib.error.HTTPError as exc:
+        # 4xx other than timeouts and rate limits will not change on retry.
+        if 400 <= exc.code < 500 and exc.code not in (408, 429):
+            raise PermanentFailure(f"webhook answered {exc.code}") from exc
+        raise
+
+
+@jobs.handler(EMAIL)
+def deliver_email(job: ClaimedJob) -> None:
+    config = current_app.config
+    payload = job.payload
+    to = db.session.scalar(select(User.email).where(User.id == payload["therapist_id"]))
+    if to is None:
+        raise PermanentFailure("therapist no longer exists")
+
+    message = EmailMessage()
+    message["From"] = config["ALERT_EMAIL_FROM"]
+    message["To"] = to
+    message["Subject"] = f"Crisis alert: {payload['patient_name']}"
+    # A stable Message-ID lets mail systems drop the duplicate of a retried send.
+    message["Message-ID"] = f"<{job.idempotency_key or job.id}@psycare>"
+    message.set_content(
+        f"{payload['patient_name']} raised a {payload['kind']} alert at {payload['created_at']}.\n\n"
+        f"{payload['message']}\n\nOpen your PSYCare dashboard to follow up and resolve it.\n"
+    )
+    try:
+        with smtplib.SMTP(config["SMTP_HOST"], config["SMTP_PORT"], timeout=config["DELIVERY_TIMEOUT"]) as smtp:
+            smtp.send_message(message)
+    except smtplib.SMTPRecipientsRefused as exc:
+        raise PermanentFailure(f"recipient refused: {to}") from exc
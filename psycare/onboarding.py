@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import csv
+import io
+import re
+from dataclasses import dataclass
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from . import summary, versions
+from .assignments import assignments
+from .extensions import db
+from .freshness import touch
+from .models import PatientTherapist, User
+
+
+MAX_ROWS = 1000
+MAX_UPLOAD_BYTES = 256 * 1024  # MAX_ROWS of the longest emails, with room for extra columns
+
+LINKED = "linked"
+ALREADY_LINKED = "already linked"
+NOT_FOUND = "not found"
+NOT_PATIENT = "not a patient"
+INVALID = "invalid email"
+DUPLICATE = "duplicate"
+
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_SPLIT_RE = re.compile(r"[\s,;]+")
+
+
+@dataclass
+class RowResult:
+    row: int
+    email: str
+    status: str
+
+
+def parse_emails(text: str) -> list[str]:
+    """Emails from pasted text or CSV; a header cell named ``email`` selects that column."""
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    if "email" in header:
+        col = header.index("email")
+        return [row[col].strip() for row in rows[1:] if len(row) > col and row[col].strip()]
+    return [token for row in rows for cell in row for token in _SPLIT_RE.split(cell) if token]
+
+
+def _insert_links(therapist_id: int, patient_ids: list[int]) -> set[int]:
+    """Insert links ignoring existing ones; returns the patient ids actually linked."""
+    table = PatientTherapist.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = versions.dialect_insert(dialect)
+        stmt = (
+            insert(table)
+            .values([{"patient_id": pid, "therapist_id": therapist_id} for pid in patient_ids])
+            .on_conflict_do_nothing(index_elements=[table.c.patient_id, table.c.therapist_id])
+            .returning(table.c.patient_id)
+        )
+        return set(db.session.scalars(stmt))
+
+    existing = set(
+        db.session.scalars(
+            select(table.c.patient_id).where(
+                table.c.therapist_id == therapist_id, table.c.patient_id.in_(patient_ids)
+            )
+        )
+    )
+    fresh = [pid for pid in patient_ids if pid not in existing]
+    if fresh:
+        db.session.execute(table.insert(), [{"patient_id": pid, "therapist_id": therapist_id} for pid in fresh])
+    return set(fresh)
+
+
+def bulk_assign(therapist_id: int, emails: list[str]) -> list[RowResult]:
+    """Link every patient in ``emails`` to the therapist; the caller commits."""
+    if len(emails) > MAX_ROWS:
+        raise ValueError(f"at most {MAX_ROWS} rows per upload")
+
+    normalized = [email.strip().lower() for email in emails]
+    wanted = {email for email in normalized if _EMAIL_RE.match(email)}
+    users = {}
+    if wanted:
+        rows = db.session.execute(select(User.email, User.id, User.role).where(User.email.in_(wanted)))
+        users = {email: (uid, role) for email, uid, role in rows}
+
+    patient_ids = sorted({uid for uid, role in users.values() if role == "patient"})
+    linked = _insert_links(therapist_id, patient_ids) if patient_ids else set()
+    if linked:
+        summary.add_patients(therapist_id, sorted(linked))
+        assignments.links_changed()
+        touch(therapist_id, *linked)
+
+    results, seen = [], set()
+    for row, email in enumerate(normalized, start=1):
+        if not _EMAIL_RE.match(email):
+            status = INVALID
+        elif email in seen:
+            status = DUPLICATE
+        elif email not in users:
+            status = NOT_FOUND
+        elif users[email][1] != "patient":
+            status = NOT_PATIENT
+        else:
+            status = LINKED if users[email][0] in linked else ALREADY_LINKED
+        seen.add(email)
+        results.append(RowResult(row, emails[row - 1].strip(), status))
+    return results
+
+
+@click.command("assign-patients")
+@click.argument("therapist_email")
+@click.argument("source", type=click.File("r"), default="-")
+@with_appcontext
+def cli(therapist_email: str, source) -> None:
+    """Link the patients listed in SOURCE (CSV or one email per line) to a therapist."""
+    therapist_id = db.session.scalar(
+        select(User.id).where(User.email == therapist_email.strip().lower(), User.role == "therapist")
+    )
+    if therapist_id is None:
+        raise click.ClickException(f"No therapist {therapist_email!r}.")
+    try:
+        results = bulk_assign(therapist_id, parse_emails(source.read()))
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from exc
+    db.session.commit()
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["row", "email", "status"])
+    writer.writerows((r.row, r.email, r.status) for r in results)
+    click.echo(out.getvalue(), nl=False)
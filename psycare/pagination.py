@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from flask import abort, current_app, request
+from sqlalchemy import tuple_
+
+
+MAX_PAGE_SIZE = 100
+
+
+@dataclass
+class Page:
+    items: list[Any] = field(default_factory=list)
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+def encode_cursor(created_at: datetime, ident: int, direction: str) -> str:
+    raw = json.dumps([direction, created_at.isoformat(), ident], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[str, datetime, int]:
+    """Parse an opaque cursor; raises ValueError for anything malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        direction, created_at, ident = json.loads(base64.urlsafe_b64decode(padded))
+        if (
+            direction not in ("next", "prev")
+            or not isinstance(created_at, str)
+            or not isinstance(ident, int)
+            or isinstance(ident, bool)
+        ):
+            raise ValueError("invalid cursor")
+        return direction, datetime.fromisoformat(created_at), ident
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def page_size() -> int:
+    default = current_app.config.get("PAGE_SIZE", 20)
+    size = request.args.get("per_page", default, type=int)
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate(query, created_col, id_col, cursor: str | None = None, per_page: int | None = None) -> Page:
+    """Newest-first keyset pagination over ``(created_col, id_col)``.
+
+    Each page is a single range scan of ``per_page + 1`` rows, so its cost does
+    not depend on how deep into the history the cursor points.
+    """
+    per_page = per_page or page_size()
+    key = tuple_(created_col, id_col)
+
+    direction = None
+    if cursor:
+        try:
+            direction, created_at, ident = decode_cursor(cursor)
+        except ValueError:
+            abort(400)
+        if direction == "next":
+            query = query.filter(key < tuple_(created_at, ident))
+        else:
+            query = query.filter(key > tuple_(created_at, ident))
+
+    if direction == "prev":
+        query = query.order_by(created_col.asc(), id_col.asc())
+    else:
+        query = query.order_by(created_col.desc(), id_col.desc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == "prev":
+        rows.reverse()
+
+    page = Page(items=rows)
+    if not rows:
+        return page
+
+    def _cursor(row, d: str) -> str:
+        return encode_cursor(getattr(row, created_col.key), getattr(row, id_col.key), d)
+
+    older_exist = has_more if direction != "prev" else True
+    newer_exist = direction == "next" or (direction == "prev" and has_more)
+    if older_exist:
+        page.next_cursor = _cursor(rows[-1], "next")
+    if newer_exist:
+        page.prev_cursor = _cursor(rows[0], "prev")
+    return page
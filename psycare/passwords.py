@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from typing import Callable, TypeVar
+
+from flask import Flask, current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .metrics import metrics
+
+
+T = TypeVar("T")
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+
+
+class HashPoolBusy(RuntimeError):
+    """Raised instead of queueing when the hash pool is already at its depth limit."""
+
+
+class HashPoolTimeout(HashPoolBusy):
+    """Raised when a queued or running hash does not finish within the pool's timeout."""
+
+
+class HashPool:
+    """Fixed set of hashing threads plus a cap on how many jobs may wait for them.
+
+    scrypt and pbkdf2 release the GIL, so the workers hash in parallel while the
+    cap keeps a login burst from occupying every request thread of a worker.
+    """
+
+    def __init__(self, workers: int, queue_depth: int, timeout: float):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+
+    def run(self, fn: Callable[..., T], *args) -> T:
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolBusy("password hashing is saturated")
+
+        def job() -> T:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._executor.submit(job)
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # A job still waiting for a thread is dropped and gives its slot back; one
+            # already hashing cannot be interrupted and frees its slot when it finishes.
+            if future.cancel():
+                self._slots.release()
+            raise HashPoolTimeout("password hashing timed out") from None
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache(maxsize=8)
+def _hash_prefix(method: str) -> str:
+    # werkzeug expands e.g. "pbkdf2:sha256" to "pbkdf2:sha256:<default iterations>"
+    return generate_password_hash("probe", method=method, salt_length=1).split("$", 1)[0]
+
+
+class PasswordHasher:
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault("PASSWORD_HASH_METHOD", DEFAULT_METHOD)
+        app.config.setdefault("PASSWORD_SALT_LENGTH", 16)
+        app.config.setdefault("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+        app.config.setdefault("PASSWORD_HASH_QUEUE", 16)
+        app.config.setdefault("PASSWORD_HASH_TIMEOUT", 10.0)
+        app.extensions["password_pool"] = HashPool(
+            workers=app.config["PASSWORD_HASH_WORKERS"],
+            queue_depth=app.config["PASSWORD_HASH_QUEUE"],
+            timeout=app.config["PASSWORD_HASH_TIMEOUT"],
+        )
+
+    def _run(self, op: str, fn: Callable[..., T], *args) -> T:
+        if not has_app_context():
+            return fn(*args)
+        started = time.perf_counter()
+        try:
+            return current_app.extensions["password_pool"].run(fn, *args)
+        finally:
+            # Includes any wait for a pool slot, which is what the request feels.
+            metrics.observe_hash(op, time.perf_counter() - started)
+
+    def hash(self, password: str) -> str:
+        if not has_app_context():
+            return generate_password_hash(password, method=DEFAULT_METHOD)
+        method = current_app.config["PASSWORD_HASH_METHOD"]
+        salt_length = current_app.config["PASSWORD_SALT_LENGTH"]
+        return self._run("hash", generate_password_hash, password, method, salt_length)
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        return self._run("verify", check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        method = current_app.config["PASSWORD_HASH_METHOD"] if has_app_context() else DEFAULT_METHOD
+        return pwhash.split("$", 1)[0] != _hash_prefix(method)
+
+
+hasher = PasswordHasher()
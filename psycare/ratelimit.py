@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from flask import Flask, current_app
+
+
+def parse_rate(spec: str | None) -> tuple[float, float] | None:
+    """``"10/60"`` -> a burst of 10 refilled at 10 per 60 seconds; empty disables."""
+    if not spec:
+        return None
+    count, seconds = spec.split("/", 1)
+    return float(count), float(count) / float(seconds)
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets held in a bounded LRU so key churn cannot grow memory."""
+
+    def __init__(self, capacity: float, refill_per_second: float, maxsize: int = 10_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.refill = refill_per_second
+        self.maxsize = maxsize
+        self._clock = clock
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> bool:
+        now = self._clock()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - stamp) * self.refill)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed
+
+
+class LoginLimiter:
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        # Loose on purpose: clients behind one NAT share an address. Guessing is held back
+        # by the per-email bucket, and floods by HashPool shedding.
+        app.config.setdefault("LOGIN_RATE_LIMIT_IP", "300/60")
+        app.config.setdefault("LOGIN_RATE_LIMIT_EMAIL", "10/60")
+        buckets = {}
+        for scope, key in (("ip", "LOGIN_RATE_LIMIT_IP"), ("email", "LOGIN_RATE_LIMIT_EMAIL")):
+            rate = parse_rate(app.config[key])
+            if rate:
+                buckets[scope] = TokenBucketLimiter(*rate)
+        app.extensions["login_limiter"] = buckets
+
+    def allow(self, ip: str | None, email: str | None = None) -> bool:
+        buckets = current_app.extensions["login_limiter"]
+        if "ip" in buckets and not buckets["ip"].allow(ip or "-"):
+            return False
+        if email and "email" in buckets and not buckets["email"].allow(email):
+            return False
+        return True
+
+
+login_limiter = LoginLimiter()
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.engine import Connection
+
+from . import summary
+from .extensions import db
+from .freshness import touch_patient
+from .models import JournalArchive, JournalEntry, MoodDaily, MoodEntry, MoodWeekly, User, utc_now
+
+
+_moods = MoodEntry.__table__
+_daily = MoodDaily.__table__
+_weekly = MoodWeekly.__table__
+_journals = JournalEntry.__table__
+_archive = JournalArchive.__table__
+
+
+@dataclass
+class RetentionResult:
+    moods_deleted: int = 0
+    days_compacted: int = 0
+    journals_archived: int = 0
+
+
+def _monday(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _batches(step, changed) -> int:
+    """Call ``step(conn)`` in its own short transaction until it handles fewer than a full batch.
+
+    ``changed()`` runs after each batch that moved rows, once it is committed.
+    """
+    batch_size = current_app.config["RETENTION_BATCH_SIZE"]
+    total = 0
+    while True:
+        with db.engine.begin() as conn:
+            done = step(conn, batch_size)
+        total += done
+        if done:
+            changed()
+        if done < batch_size:
+            return total
+
+
+def _touched(patient_id: int, journals: bool = False) -> None:
+    # The same bumps the write routes make, so ETags and cached fragments built on the old rows go stale.
+    if journals:
+        summary.refresh_journal(patient_id)
+    touch_patient(patient_id)
+    db.session.commit()
+
+
+def _retire_moods(patient_id: int, cutoff: datetime, keep: int) -> int:
+    with db.engine.begin() as conn:
+        if keep:
+            kth = conn.scalar(
+                select(_moods.c.created_at)
+                .where(_moods.c.patient_id == patient_id)
+                .order_by(_moods.c.created_at.desc(), _moods.c.id.desc())
+                .offset(keep - 1)
+                .limit(1)
+            )
+            if kth is None:
+                return 0
+            # Whole days only, so a day's bucket is either backed by raw rows or not at all.
+            cutoff = min(cutoff, _midnight(kth.date()))
+
+    def step(conn: Connection, batch_size: int) -> int:
+        ids = conn.scalars(
+            select(_moods.c.id)
+            .where(_moods.c.patient_id == patient_id, _moods.c.created_at < cutoff)
+            .limit(batch_size)
+        ).all()
+        if ids:
+            conn.execute(_moods.delete().where(_moods.c.id.in_(ids)))
+        return len(ids)
+
+    return _batches(step, lambda: _touched(patient_id))
+
+
+def _fold_days(conn: Connection, patient_id: int, rows) -> None:
+    weeks: dict[date, dict] = {}
+    for r in rows:
+        week = weeks.setdefault(
+            _monday(r.day),
+            {"count": 0, "total": 0, "total_sq": 0, "min_rating": r.min_rating, "max_rating": r.max_rating},
+        )
+        week["count"] += r.count
+        week["total"] += r.total
+        week["total_sq"] += r.total_sq
+        week["min_rating"] = min(week["min_rating"], r.min_rating)
+        week["max_rating"] = max(week["max_rating"], r.max_rating)
+
+    existing = conn.execute(
+        select(_weekly).where(_weekly.c.patient_id == patient_id, _weekly.c.week.in_(list(weeks)))
+    ).all()
+    for e in existing:
+        week = weeks[e.week]
+        week.update(
+            count=week["count"] + e.count,
+            total=week["total"] + e.total,
+            total_sq=week["total_sq"] + e.total_sq,
+            min_rating=min(week["min_rating"], e.min_rating),
+            max_rating=max(week["max_rating"], e.max_rating),
+        )
+    merged = {e.week for e in existing}
+
+    new = [{"patient_id": patient_id, "week": w, **v} for w, v in weeks.items() if w not in merged]
+    if new:
+        conn.execute(insert(_weekly), new)
+    if merged:
+        conn.execute(
+            update(_weekly)
+            .where(_weekly.c.patient_id == patient_id, _weekly.c.week == bindparam("b_week"))
+            .values(
+                count=bindparam("b_count"),
+                total=bindparam("b_total"),
+                total_sq=bindparam("b_total_sq"),
+                min_rating=bindparam("b_min_rating"),
+                max_rating=bindparam("b_max_rating"),
+            ),
+            [{"b_week": w, **{f"b_{k}": v for k, v in weeks[w].items()}} for w in merged],
+        )
+    conn.execute(_daily.delete().where(_daily.c.patient_id == patient_id, _daily.c.day.in_([r.day for r in rows])))
+
+
+def _compact_days(patient_id: int, cutoff: date) -> int:
+    with db.engine.begin() as conn:
+        first_raw = conn.scalar(select(func.min(_moods.c.created_at)).where(_moods.c.patient_id == patient_id))
+    # Buckets still backed by raw rows stay daily; only whole weeks are folded.
+    if first_raw is not None:
+        cutoff = min(cutoff, first_raw.date())
+    cutoff = _monday(cutoff)
+
+    def step(conn: Connection, batch_size: int) -> int:
+        rows = conn.execute(
+            select(_daily)
+            .where(_daily.c.patient_id == patient_id, _daily.c.day < cutoff)
+            .order_by(_daily.c.day)
+            .limit(batch_size)
+        ).all()
+        if rows:
+            _fold_days(conn, patient_id, rows)
+        return len(rows)
+
+    return _batches(step, lambda: _touched(patient_id))
+
+
+def _archive_journals(patient_id: int, cutoff: datetime, keep: int) -> int:
+    newest = (
+        select(_journals.c.id)
+        .where(_journals.c.patient_id == patient_id)
+        .order_by(_journals.c.created_at.desc(), _journals.c.id.desc())
+        .limit(keep)
+    )
+
+    def step(conn: Connection, batch_size: int) -> int:
+        rows = conn.execute(
+            select(_journals)
+            .where(
+                _journals.c.patient_id == patient_id,
+                _journals.c.created_at < cutoff,
+                _journals.c.id.not_in(newest.scalar_subquery()),
+            )
+            .order_by(_journals.c.created_at)
+            .limit(batch_size)
+        ).all()
+        if rows:
+            archived_at = utc_now()
+            conn.execute(insert(_archive), [
+                {
+                    "id": r.id,
+                    "patient_id": r.patient_id,
+                    "title": r.title,
+                    "body_z": r.body_z if r.body_z is not None else zlib.compress(r.body.encode()),
+                    "shared_with_therapist": r.shared_with_therapist,
+                    "flagged_risk": r.flagged_risk,
+                    "created_at": r.created_at,
+                    "updated_at": r.updated_at,
+                    "archived_at": archived_at,
+                }
+                for r in rows
+            ])
+            # The FTS delete trigger takes the entries out of the search index.
+            conn.execute(_journals.delete().where(_journals.c.id.in_([r.id for r in rows])))
+        return len(rows)
+
+    return _batches(step, lambda: _touched(patient_id, journals=True))
+
+
+def run(today: date | None = None, echo=None) -> RetentionResult:
+    """Retire old rows patient by patient, in transactions of at most ``RETENTION_BATCH_SIZE`` rows.
+
+    Check-ins older than ``RETENTION_MOOD_DAYS`` are deleted (their ``mood_daily``
+    buckets already hold count, sum, min and max), daily buckets older than
+    ``RETENTION_MOOD_DAILY_DAYS`` are folded into ``mood_weekly``, and journal
+    entries older than ``RETENTION_JOURNAL_DAYS`` move to ``journal_archive``.
+    Each patient keeps their newest ``RETENTION_KEEP_RECENT`` check-ins and
+    entries whatever their age. A setting of 0 days turns that step off.
+    """
+    config = current_app.config
+    today = today or utc_now().date()
+    keep = config["RETENTION_KEEP_RECENT"]
+    echo = echo or (lambda message: None)
+    result = RetentionResult()
+
+    with db.engine.begin() as conn:
+        patient_ids = conn.scalars(select(User.id).where(User.role == "patient").order_by(User.id)).all()
+    for patient_id in patient_ids:
+        if config["RETENTION_MOOD_DAYS"]:
+            cutoff = _midnight(today - timedelta(days=config["RETENTION_MOOD_DAYS"]))
+            result.moods_deleted += _retire_moods(patient_id, cutoff, keep)
+        if config["RETENTION_MOOD_DAILY_DAYS"]:
+            cutoff = today - timedelta(days=config["RETENTION_MOOD_DAILY_DAYS"])
+            result.days_compacted += _compact_days(patient_id, cutoff)
+        if config["RETENTION_JOURNAL_DAYS"]:
+            cutoff = _midnight(today - timedelta(days=config["RETENTION_JOURNAL_DAYS"]))
+            result.journals_archived += _archive_journals(patient_id, cutoff, keep)
+    echo(
+        f"moods deleted: {result.moods_deleted}, daily buckets folded into weeks: {result.days_compacted}, "
+        f"journal entries archived: {result.journals_archived}"
+    )
+    return result
+
+
+@click.command("retention")
+@click.option("--today", type=click.DateTime(["%Y-%m-%d"]), help="Measure ages from this day (default today).")
+@with_appcontext
+def cli(today) -> None:
+    """Retire old check-ins into rollups and move old journal entries to the archive."""
+    run(today.date() if today else None, echo=click.echo)
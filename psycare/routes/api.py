@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import wraps
+from typing import Callable, TypeVar
+
+from flask import Blueprint, abort, g, request
+from sqlalchemy import func, select
+from sqlalchemy.sql import ColumnElement
+from werkzeug.exceptions import HTTPException
+
+from .. import tokens
+from ..assignments import assignments
+from ..extensions import csrf, db
+from ..models import Alert, JournalEntry, MoodEntry, PatientSummary, Resource, User
+from ..pagination import MAX_PAGE_SIZE, paginate
+from ..passwords import HashPoolBusy
+from ..ratelimit import login_limiter
+
+
+F = TypeVar("F", bound=Callable)
+
+MAX_BATCH_PATIENTS = 100
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+csrf.exempt(bp)
+
+
+@dataclass(frozen=True)
+class FieldSet:
+    """Columns a resource exposes; ``fields=`` picks a subset, ``default`` is used otherwise."""
+
+    columns: dict[str, ColumnElement]
+    default: tuple[str, ...]
+    # field -> column with its zlib-compressed value, for rows that leave the plain column empty
+    compressed: dict[str, ColumnElement] = field(default_factory=dict)
+
+    def pick(self, raw: str | None) -> list[str]:
+        if not raw:
+            return list(self.default)
+        wanted = {name.strip() for name in raw.split(",") if name.strip()}
+        unknown = wanted - self.columns.keys()
+        if unknown:
+            abort(400, description=f"unknown fields: {', '.join(sorted(unknown))}")
+        return [name for name in self.columns if name in wanted]
+
+
+JOURNAL = FieldSet(
+    {
+        "id": JournalEntry.id,
+        "title": JournalEntry.title,
+        "body": JournalEntry.body,
+        "shared_with_therapist": JournalEntry.shared_with_therapist,
+        "flagged_risk": JournalEntry.flagged_risk,
+        "created_at": JournalEntry.created_at,
+        "updated_at": JournalEntry.updated_at,
+    },
+    default=("id", "title", "shared_with_therapist", "flagged_risk", "created_at"),
+    compressed={"body": JournalEntry.body_z},
+)
+MOOD = FieldSet(
+    {"id": MoodEntry.id, "rating": MoodEntry.rating, "note": MoodEntry.note, "created_at": MoodEntry.created_at},
+    default=("id", "rating", "note", "created_at"),
+)
+ALERT = FieldSet(
+    {
+        "id": Alert.id,
+        "patient_id": Alert.patient_id,
+        "kind": Alert.kind,
+        "message": Alert.message,
+        "resolved": Alert.resolved,
+        "created_at": Alert.created_at,
+    },
+    default=("id", "patient_id", "kind", "message", "resolved", "created_at"),
+)
+RESOURCE = FieldSet(
+    {
+        "id": Resource.id,
+        "title": Resource.title,
+        "url": Resource.url,
+        "description": Resource.description,
+        "created_at": Resource.created_at,
+    },
+    default=("id", "title", "url", "description", "created_at"),
+)
+PATIENT = FieldSet(
+    {
+        "id": PatientSummary.patient_id,
+        "display_name": PatientSummary.display_name,
+        "email": PatientSummary.email,
+        "last_mood_rating": PatientSummary.last_mood_rating,
+        "last_mood_at": PatientSummary.last_mood_at,
+        "last_journal_title": PatientSummary.last_journal_title,
+        "last_journal_flagged": PatientSummary.last_journal_flagged,
+        "last_shared_journal_at": PatientSummary.last_shared_journal_at,
+        "unresolved_alert_count": PatientSummary.unresolved_alert_count,
+    },
+    default=("id", "display_name", "email", "last_mood_rating", "last_mood_at", "unresolved_alert_count"),
+)
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _rows(rows, names: list[str], zipped: tuple[str, ...] = ()) -> list[dict]:
+    data = [{name: _plain(row._mapping[name]) for name in names} for row in rows]
+    for row, item in zip(rows, data):
+        for name in zipped:
+            if row._mapping[f"{name}_z"] is not None:
+                item[name] = zlib.decompress(row._mapping[f"{name}_z"]).decode()
+    return data
+
+
+def _page(spec: FieldSet, *criteria) -> dict:
+    """Cursor-paginated column query; rows are plain tuples, never ORM instances."""
+    names = spec.pick(request.args.get("fields"))
+    # id and created_at always ride along because the cursor is built from them.
+    selected = [name for name in spec.columns if name in names or name in ("id", "created_at")]
+    zipped = tuple(name for name in names if name in spec.compressed)
+    query = db.session.query(
+        *(spec.columns[name].label(name) for name in selected),
+        *(spec.compressed[name].label(f"{name}_z") for name in zipped),
+    ).filter(*criteria)
+    page = paginate(query, spec.columns["created_at"], spec.columns["id"], request.args.get("cursor"))
+    return {
+        "data": _rows(page.items, names, zipped),
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    }
+
+
+def api_auth(*roles: str) -> Callable[[F], F]:
+    """Bearer-token auth resolved through the identity cache; sets ``g.api_user``."""
+
+    def decorator(fn: F) -> F:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+            user = tokens.verify(token) if scheme.lower() == "bearer" and token else None
+            if user is None:
+                abort(401)
+            if roles and user.role not in roles:
+                abort(403)
+            g.api_user = user
+            return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def _assigned_patient(patient_id: int) -> int:
+    if not assignments.is_assigned(g.api_user.id, patient_id):
+        abort(403)
+    return patient_id
+
+
+@bp.errorhandler(HTTPException)
+def _json_error(exc: HTTPException):
+    return {"error": exc.name.lower().replace(" ", "_"), "message": exc.description}, exc.code
+
+
+@bp.post("/tokens")
+def create_token():
+    payload = request.get_json(silent=True) or {}
+    email = str(payload.get("email", "")).lower().strip()
+    password = str(payload.get("password", ""))
+    if not email or not password:
+        abort(400, description="email and password are required")
+    if not login_limiter.allow(request.remote_addr, email):
+        abort(429)
+
+    user = User.query.filter_by(email=email).first()
+    try:
+        valid = user is not None and user.check_password(password)
+        if valid and user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
+    except HashPoolBusy:
+        abort(503)
+    if not valid:
+        abort(401, description="invalid email or password")
+    return {"token": tokens.issue(user.id, user.password_hash), "token_type": "Bearer", "role": user.role}, 201
+
+
+@bp.get("/me")
+@api_auth()
+def me():
+    user = g.api_user
+    return {"data": {"id": user.id, "role": user.role, "display_name": user.display_name, "email": user.email}}
+
+
+@bp.get("/journal")
+@api_auth("patient")
+def journal():
+    return _page(JOURNAL, JournalEntry.patient_id == g.api_user.id)
+
+
+@bp.get("/moods")
+@api_auth("patient")
+def moods():
+    return _page(MOOD, MoodEntry.patient_id == g.api_user.id)
+
+
+@bp.get("/resources")
+@api_auth("patient", "therapist")
+def resources():
+    if g.api_user.role == "therapist":
+        therapist_id = g.api_user.id
+    else:
+        # an unlinked patient gets an empty page (therapist_id IS NULL matches nothing)
+        therapist_id = assignments.therapist_of(g.api_user.id)
+    return _page(RESOURCE, Resource.therapist_id == therapist_id)
+
+
+@bp.get("/alerts")
+@api_auth("therapist")
+def alerts():
+    criteria = [Alert.therapist_id == g.api_user.id]
+    resolved = request.args.get("resolved")
+    if resolved in ("0", "1"):
+        criteria.append(Alert.resolved.is_(resolved == "1"))
+    return _page(ALERT, *criteria)
+
+
+@bp.get("/patients")
+@api_auth("therapist")
+def patients():
+    names = PATIENT.pick(request.args.get("fields"))
+    rows = db.session.execute(
+        select(*(PATIENT.columns[name].label(name) for name in names))
+        .where(PatientSummary.therapist_id == g.api_user.id)
+        .order_by(PatientSummary.display_name.asc())
+    )
+    return {"data": _rows(rows, names)}
+
+
+@bp.get("/patients/<int:patient_id>/journal")
+@api_auth("therapist")
+def patient_journal(patient_id: int):
+    _assigned_patient(patient_id)
+    return _page(JOURNAL, JournalEntry.patient_id == patient_id, JournalEntry.shared_with_therapist.is_(True))
+
+
+@bp.get("/patients/<int:patient_id>/moods")
+@api_auth("therapist")
+def patient_moods(patient_id: int):
+    _assigned_patient(patient_id)
+    return _page(MOOD, MoodEntry.patient_id == patient_id)
+
+
+@bp.get("/moods/batch")
+@api_auth("therapist")
+def moods_batch():
+    """Latest ``limit`` moods for each of ``patient_ids`` in one round trip."""
+    try:
+        ids = sorted({int(part) for part in request.args.get("patient_ids", "").split(",") if part.strip()})
+    except ValueError:
+        abort(400, description="patient_ids must be a comma separated list of integers")
+    if not ids or len(ids) > MAX_BATCH_PATIENTS:
+        abort(400, description=f"pass between 1 and {MAX_BATCH_PATIENTS} patient_ids")
+    if not set(ids) <= assignments.patients_of(g.api_user.id):
+        abort(403)
+    limit = max(1, min(request.args.get("limit", 10, type=int), MAX_PAGE_SIZE))
+    names = MOOD.pick(request.args.get("fields"))
+
+    rank = func.row_number().over(
+        partition_by=MoodEntry.patient_id,
+        order_by=(MoodEntry.created_at.desc(), MoodEntry.id.desc()),
+    )
+    ranked = (
+        select(MoodEntry.patient_id.label("patient_id"), *(MOOD.columns[n].label(n) for n in names), rank.label("rn"))
+        .where(MoodEntry.patient_id.in_(ids))
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(ranked).where(ranked.c.rn <= limit).order_by(ranked.c.patient_id, ranked.c.rn)
+    )
+
+    data: dict[str, list[dict]] = {str(pid): [] for pid in ids}
+    for row in rows:
+        data[str(row.patient_id)].append({name: _plain(row._mapping[name]) for name in names})
+    return {"data": data}
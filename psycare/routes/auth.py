@@ -6,6 +6,8 @@ from flask_login import current_user, login_required, login_user, logout_user
 from ..extensions import db
 from ..forms import LoginForm, RegisterForm
 from ..models import User
+from ..passwords import HashPoolBusy
+from ..ratelimit import login_limiter
 
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
@@ -28,8 +30,22 @@ def login_post():
     if not form.validate_on_submit():
         return render_template("auth/login.html", form=form, title="Login"), 400
 
-    user = User.query.filter_by(email=form.email.data.lower().strip()).first()
-    if not user or not user.check_password(form.password.data):
+    email = form.email.data.lower().strip()
+    if not login_limiter.allow(request.remote_addr, email):
+        flash("Too many login attempts. Please wait a minute and try again.", "danger")
+        return render_template("auth/login.html", form=form, title="Login"), 429
+
+    user = User.query.filter_by(email=email).first()
+    try:
+        valid = user is not None and user.check_password(form.password.data)
+        if valid and user.password_needs_rehash():
+            user.set_password(form.password.data)
+            db.session.commit()
+    except HashPoolBusy:
+        flash("The server is busy. Please try again in a moment.", "warning")
+        return render_template("auth/login.html", form=form, title="Login"), 503
+
+    if not valid:
         flash("Invalid email or password", "danger")
         return render_template("auth/login.html", form=form, title="Login"), 401
 
@@ -55,6 +71,10 @@ def register_post():
     if not form.validate_on_submit():
         return render_template("auth/register.html", form=form, title="Register"), 400
 
+    if not login_limiter.allow(request.remote_addr):
+        flash("Too many attempts. Please wait a minute and try again.", "danger")
+        return render_template("auth/register.html", form=form, title="Register"), 429
+
     email = form.email.data.lower().strip()
     existing = User.query.filter_by(email=email).first()
     if existing:
@@ -66,7 +86,11 @@ def register_post():
         display_name=form.display_name.data.strip(),
         role="patient",
     )
-    user.set_password(form.password.data)
+    try:
+        user.set_password(form.password.data)
+    except HashPoolBusy:
+        flash("The server is busy. Please try again in a moment.", "warning")
+        return render_template("auth/register.html", form=form, title="Register"), 503
     db.session.add(user)
     db.session.commit()
 
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-from flask import Blueprint, redirect, render_template, url_for
+import hmac
+
+from flask import Blueprint, abort, current_app, redirect, render_template, request, url_for
 from flask_login import current_user
 
+from ..freshness import freshness
+from ..identity import identity
+from ..invalidation import bus
+from ..metrics import metrics
+
 
 bp = Blueprint("main", __name__)
 
@@ -19,4 +26,19 @@ def index():
 
 @bp.get("/health")
 def health():
-    return {"status": "ok"}, 200
+    return {
+        "status": "ok",
+        "user_cache": identity.stats(),
+        "fragment_cache": freshness.stats(),
+        "invalidation": bus.stats(),
+    }, 200
+
+
+@bp.get("/metrics")
+def prometheus_metrics():
+    token = current_app.config["METRICS_TOKEN"]
+    if token:
+        scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(given.encode(), token.encode()):
+            abort(401)
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
-from flask import Blueprint, abort, flash, redirect, render_template, url_for
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    flash,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    stream_with_context,
+    url_for,
+)
 from flask_login import current_user
+from sqlalchemy.orm import undefer_group
 
+from .. import export, mood_stats, notify, search, summary, timeseries
+from ..assignments import assignments
 from ..authz import role_required
-from ..extensions import db
+from ..extensions import db, event_hub
 from ..forms import JournalForm, MoodForm
-from ..models import Alert, JournalEntry, MoodEntry, PatientTherapist
+from ..freshness import freshness, touch_patient
+from ..models import Alert, JournalArchive, JournalEntry, MoodEntry, Resource
+from ..pagination import Page, paginate
 
 
 bp = Blueprint("patient", __name__, url_prefix="/patient")
@@ -14,7 +31,13 @@ bp = Blueprint("patient", __name__, url_prefix="/patient")
 
 @bp.get("/dashboard")
 @role_required("patient")
+@freshness.conditional
 def dashboard():
+    cards = freshness.fragment("patient.dashboard", _dashboard_cards)
+    return render_template("patient/dashboard.html", title="Patient Dashboard", cards=cards)
+
+
+def _dashboard_cards() -> str:
     journal_entries = (
         JournalEntry.query.filter_by(patient_id=current_user.id)
         .order_by(JournalEntry.created_at.desc())
@@ -27,25 +50,45 @@ def dashboard():
         .limit(10)
         .all()
     )
-    therapist_link = PatientTherapist.query.filter_by(patient_id=current_user.id).first()
     return render_template(
-        "patient/dashboard.html",
-        title="Patient Dashboard",
+        "patient/_dashboard_cards.html",
         journal_entries=journal_entries,
         mood_entries=mood_entries,
-        therapist_link=therapist_link,
+        mood_summary=mood_stats.stats_for(current_user.id),
+        therapist_id=assignments.therapist_of(current_user.id),
     )
 
 
 @bp.route("/journal", methods=["GET"])
 @role_required("patient")
 def journal_list():
-    entries = (
-        JournalEntry.query.filter_by(patient_id=current_user.id)
-        .order_by(JournalEntry.created_at.desc())
-        .all()
+    page = paginate(
+        JournalEntry.query.filter_by(patient_id=current_user.id),
+        JournalEntry.created_at,
+        JournalEntry.id,
+        request.args.get("cursor"),
+    )
+    return render_template("patient/journal_list.html", title="My Journal", entries=page.items, page=page)
+
+
+@bp.get("/journal/archive")
+@role_required("patient")
+def journal_archive():
+    page = paginate(
+        JournalArchive.query.filter_by(patient_id=current_user.id),
+        JournalArchive.created_at,
+        JournalArchive.id,
+        request.args.get("cursor"),
     )
-    return render_template("patient/journal_list.html", title="My Journal", entries=entries)
+    return render_template("patient/journal_archive.html", title="Journal Archive", entries=page.items, page=page)
+
+
+@bp.get("/journal/search")
+@role_required("patient")
+def journal_search():
+    query = request.args.get("q", "").strip()
+    hits = search.search_journal(current_user.id, query) if query else []
+    return render_template("patient/journal_search.html", title="Search Journal", query=query, hits=hits)
 
 
 @bp.route("/journal/new", methods=["GET", "POST"])
@@ -61,6 +104,8 @@ def journal_new():
             flagged_risk=bool(form.flagged_risk.data),
         )
         db.session.add(entry)
+        summary.refresh_journal(current_user.id)
+        touch_patient(current_user.id)
         db.session.commit()
         flash("Journal entry created", "success")
         return redirect(url_for("patient.journal_list"))
@@ -68,8 +113,9 @@ def journal_new():
     return render_template("patient/journal_form.html", title="New Entry", form=form)
 
 
-def _get_own_entry(entry_id: int) -> JournalEntry:
-    entry = db.session.get(JournalEntry, entry_id)
+def _get_own_entry(entry_id: int, with_body: bool = False) -> JournalEntry:
+    options = [undefer_group("body")] if with_body else []
+    entry = db.session.get(JournalEntry, entry_id, options=options)
     if not entry or entry.patient_id != current_user.id:
         abort(404)
     return entry
@@ -78,13 +124,15 @@ def _get_own_entry(entry_id: int) -> JournalEntry:
 @bp.route("/journal/<int:entry_id>/edit", methods=["GET", "POST"])
 @role_required("patient")
 def journal_edit(entry_id: int):
-    entry = _get_own_entry(entry_id)
+    entry = _get_own_entry(entry_id, with_body=True)
     form = JournalForm(obj=entry)
     if form.validate_on_submit():
         entry.title = form.title.data.strip()
         entry.body = form.body.data.strip()
         entry.shared_with_therapist = bool(form.shared_with_therapist.data)
         entry.flagged_risk = bool(form.flagged_risk.data)
+        summary.refresh_journal(current_user.id)
+        touch_patient(current_user.id)
         db.session.commit()
         flash("Journal entry updated", "success")
         return redirect(url_for("patient.journal_list"))
@@ -97,6 +145,8 @@ def journal_edit(entry_id: int):
 def journal_delete(entry_id: int):
     entry = _get_own_entry(entry_id)
     db.session.delete(entry)
+    summary.refresh_journal(current_user.id)
+    touch_patient(current_user.id)
     db.session.commit()
     flash("Journal entry deleted", "success")
     return redirect(url_for("patient.journal_list"))
@@ -113,6 +163,9 @@ def mood_checkin():
             note=(form.note.data or "").strip(),
         )
         db.session.add(entry)
+        mood_stats.record(entry)
+        summary.record_mood(entry)
+        touch_patient(current_user.id)
         db.session.commit()
         flash("Mood check-in saved", "success")
         return redirect(url_for("patient.dashboard"))
@@ -126,44 +179,110 @@ def mood_checkin():
     return render_template("patient/mood.html", title="Mood Check-in", form=form, recent=recent)
 
 
+@bp.get("/mood/stats")
+@role_required("patient")
+def mood_stats_json():
+    return mood_stats.stats_for(current_user.id)
+
+
+@bp.get("/mood/history")
+@role_required("patient")
+def mood_history_json():
+    since = mood_stats.history_since(request.args.get("days", type=int))
+    return {"points": [p.as_dict() for p in mood_stats.history(current_user.id, since)]}
+
+
+@bp.get("/mood/series")
+@role_required("patient")
+def mood_series_json():
+    args = timeseries.series_args()
+    return timeseries.payload(args, [current_user.id])
+
+
 @bp.get("/resources")
 @role_required("patient")
 def resources():
-    therapist_link = PatientTherapist.query.filter_by(patient_id=current_user.id).first()
-    if not therapist_link:
-        items = []
+    therapist_id = assignments.therapist_of(current_user.id)
+    if not therapist_id:
+        page = Page()
     else:
-        from ..models import Resource
-
-        items = (
-            Resource.query.filter_by(therapist_id=therapist_link.therapist_id)
-            .order_by(Resource.created_at.desc())
-            .all()
+        page = paginate(
+            Resource.query.filter_by(therapist_id=therapist_id),
+            Resource.created_at,
+            Resource.id,
+            request.args.get("cursor"),
         )
-    return render_template("patient/resources.html", title="Resources", items=items)
+    return render_template("patient/resources.html", title="Resources", items=page.items, page=page)
 
 
 @bp.route("/crisis", methods=["GET", "POST"])
 @role_required("patient")
 def crisis():
-    therapist_link = PatientTherapist.query.filter_by(patient_id=current_user.id).first()
-
-    from flask import request
+    therapist_id = assignments.therapist_of(current_user.id)
 
     if request.method == "POST":
         alert = Alert(
             patient_id=current_user.id,
-            therapist_id=therapist_link.therapist_id if therapist_link else None,
+            therapist_id=therapist_id,
             kind="panic",
             message="Patient pressed the panic button.",
         )
         db.session.add(alert)
+        summary.alert_opened(alert)
+        touch_patient(current_user.id)
+        notify.alert_raised(alert, current_user.display_name)
         db.session.commit()
+        if alert.therapist_id:
+            event_hub.publish(
+                f"therapist:{alert.therapist_id}",
+                "alert",
+                {
+                    "id": alert.id,
+                    "patient_id": alert.patient_id,
+                    "patient_name": current_user.display_name,
+                    "kind": alert.kind,
+                    "message": alert.message,
+                    "created_at": alert.created_at.isoformat(),
+                },
+            )
         flash("Alert sent to your therapist (if linked).", "warning")
         return redirect(url_for("patient.dashboard"))
 
     return render_template(
         "patient/crisis.html",
         title="Crisis / Emergency",
-        therapist_link=therapist_link,
+        therapist_id=therapist_id,
     )
+
+
+@bp.get("/export")
+@role_required("patient")
+def export_record():
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in export.FORMATS:
+        abort(400)
+    compress = request.args.get("gzip") == "1"
+    name = export.filename(current_user.id, fmt, compress)
+    mimetype = "application/gzip" if compress else export.FORMATS[fmt]
+
+    if export.row_count(current_user.id) > current_app.config["EXPORT_SYNC_MAX_ROWS"]:
+        # Too large to generate on a request thread: a job writes the file and the next visit collects it.
+        path = export.ready_file(current_user.id, fmt, compress)
+        if path is not None:
+            resp = send_file(path, mimetype=mimetype, as_attachment=True, download_name=name, max_age=0)
+            resp.headers["Cache-Control"] = "no-store"
+            return resp
+        export.request_file(current_user.id, fmt, compress)
+        db.session.commit()
+        flash("Your record is large, so it is being prepared in the background. "
+              "Use the export link again in a few minutes to download it.", "info")
+        return redirect(url_for("patient.dashboard"))
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+    }
+    # Generated while it is sent: this thread is busy until the client has read everything.
+    return Response(stream_with_context(export.render(current_user.id, fmt, compress)), mimetype=mimetype,
+                    headers=headers)
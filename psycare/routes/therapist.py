@@ -1,63 +1,74 @@
 from __future__ import annotations
 
-from flask import Blueprint, abort, flash, redirect, render_template, url_for
+from datetime import timedelta
+
+from flask import Blueprint, Response, abort, flash, redirect, render_template, request, url_for
 from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import undefer_group
 
+from .. import mood_stats, onboarding, search, summary, timeseries
+from ..assignments import assignments
 from ..authz import role_required
-from ..extensions import db
-from ..forms import AssignPatientForm, ResourceForm
-from ..models import Alert, JournalEntry, MoodEntry, PatientTherapist, Resource, User
+from ..events import StreamLimitReached
+from ..extensions import db, event_hub
+from ..forms import AssignPatientForm, BulkAssignForm, ResourceForm
+from ..freshness import freshness, touch
+from ..models import (
+    Alert,
+    JournalArchive,
+    JournalEntry,
+    MoodEntry,
+    PatientSummary,
+    PatientTherapist,
+    Resource,
+    User,
+    utc_now,
+)
+from ..pagination import paginate
 
 
 bp = Blueprint("therapist", __name__, url_prefix="/therapist")
 
 
-def _assigned_patient_ids() -> list[int]:
-    links = PatientTherapist.query.filter_by(therapist_id=current_user.id).all()
-    return [l.patient_id for l in links]
-
-
 @bp.get("/dashboard")
 @role_required("therapist")
+@freshness.conditional
 def dashboard():
-    patient_ids = _assigned_patient_ids()
+    cards = freshness.fragment("therapist.dashboard", _dashboard_cards)
+    return render_template("therapist/dashboard.html", title="Therapist Dashboard", cards=cards)
 
-    patients = []
-    if patient_ids:
-        patients = User.query.filter(User.id.in_(patient_ids)).order_by(User.display_name.asc()).all()
 
-    recent_journals = []
-    if patient_ids:
-        recent_journals = (
-            JournalEntry.query.filter(
-                JournalEntry.patient_id.in_(patient_ids),
-                JournalEntry.shared_with_therapist.is_(True),
-            )
-            .order_by(JournalEntry.created_at.desc())
-            .limit(10)
-            .all()
-        )
+def _dashboard_cards() -> str:
+    summaries = (
+        PatientSummary.query.filter_by(therapist_id=current_user.id)
+        .order_by(PatientSummary.display_name.asc())
+        .all()
+    )
 
-    recent_moods = []
-    if patient_ids:
-        recent_moods = (
-            MoodEntry.query.filter(MoodEntry.patient_id.in_(patient_ids))
-            .order_by(MoodEntry.created_at.desc())
+    recent_journals = sorted(
+        (s for s in summaries if s.last_shared_journal_at),
+        key=lambda s: s.last_shared_journal_at,
+        reverse=True,
+    )[:10]
+    recent_moods = sorted(
+        (s for s in summaries if s.last_mood_at),
+        key=lambda s: s.last_mood_at,
+        reverse=True,
+    )[:10]
+
+    alerts = []
+    if any(s.unresolved_alert_count for s in summaries):
+        alerts = (
+            Alert.query.filter_by(therapist_id=current_user.id, resolved=False)
+            .order_by(Alert.created_at.desc())
             .limit(10)
             .all()
         )
 
-    alerts = (
-        Alert.query.filter_by(therapist_id=current_user.id, resolved=False)
-        .order_by(Alert.created_at.desc())
-        .limit(10)
-        .all()
-    )
-
     return render_template(
-        "therapist/dashboard.html",
-        title="Therapist Dashboard",
-        patients=patients,
+        "therapist/_dashboard_cards.html",
+        patients=summaries,
         recent_journals=recent_journals,
         recent_moods=recent_moods,
         alerts=alerts,
@@ -79,15 +90,21 @@ def patients():
         link = PatientTherapist(patient_id=patient.id, therapist_id=current_user.id)
         db.session.add(link)
         try:
-            db.session.commit()
-            flash("Patient linked", "success")
-        except Exception:
+            db.session.flush()
+        except IntegrityError:
             db.session.rollback()
             flash("This patient is already linked", "info")
+            return redirect(url_for("therapist.patients"))
+
+        summary.add_patient(current_user.id, patient)
+        assignments.links_changed()
+        touch(current_user.id, patient.id)
+        db.session.commit()
+        flash("Patient linked", "success")
 
         return redirect(url_for("therapist.patients"))
 
-    patient_ids = _assigned_patient_ids()
+    patient_ids = assignments.patients_of(current_user.id)
     patients = []
     if patient_ids:
         patients = User.query.filter(User.id.in_(patient_ids)).order_by(User.display_name.asc()).all()
@@ -95,55 +112,187 @@ def patients():
     return render_template("therapist/patients.html", title="My Patients", form=form, patients=patients)
 
 
+@bp.route("/patients/bulk", methods=["GET", "POST"])
+@role_required("therapist")
+def patients_bulk():
+    form = BulkAssignForm()
+    results = None
+
+    if form.validate_on_submit():
+        text = form.emails.data or ""
+        upload = form.csv_file.data.read(onboarding.MAX_UPLOAD_BYTES + 1) if form.csv_file.data else b""
+        if len(upload) > onboarding.MAX_UPLOAD_BYTES:
+            flash(f"CSV files are limited to {onboarding.MAX_UPLOAD_BYTES // 1024} KB", "warning")
+            return render_template(
+                "therapist/patients_bulk.html", title="Bulk Link Patients", form=form, results=None
+            ), 413
+        emails = onboarding.parse_emails(text + "\n" + upload.decode("utf-8-sig", errors="replace"))
+        if not emails:
+            flash("Paste some emails or choose a CSV file", "warning")
+        elif len(emails) > onboarding.MAX_ROWS:
+            flash(f"At most {onboarding.MAX_ROWS} rows per upload", "warning")
+        else:
+            results = onboarding.bulk_assign(current_user.id, emails)
+            db.session.commit()
+            linked = sum(r.status == onboarding.LINKED for r in results)
+            flash(f"Linked {linked} of {len(results)} rows", "success" if linked else "info")
+
+    return render_template("therapist/patients_bulk.html", title="Bulk Link Patients", form=form, results=results)
+
+
 @bp.get("/patients/<int:patient_id>/journal")
 @role_required("therapist")
 def patient_journal(patient_id: int):
-    if patient_id not in _assigned_patient_ids():
+    if not assignments.is_assigned(current_user.id, patient_id):
         abort(403)
 
     patient = db.session.get(User, patient_id)
     if not patient:
         abort(404)
 
-    entries = (
-        JournalEntry.query.filter_by(patient_id=patient_id, shared_with_therapist=True)
-        .order_by(JournalEntry.created_at.desc())
-        .all()
+    page = paginate(
+        JournalEntry.query.filter_by(patient_id=patient_id, shared_with_therapist=True),
+        JournalEntry.created_at,
+        JournalEntry.id,
+        request.args.get("cursor"),
     )
 
     return render_template(
         "therapist/patient_journal.html",
         title=f"{patient.display_name} - Journal",
         patient=patient,
-        entries=entries,
+        entries=page.items,
+        page=page,
+    )
+
+
+@bp.get("/patients/<int:patient_id>/journal/<int:entry_id>")
+@role_required("therapist")
+def patient_journal_entry(patient_id: int, entry_id: int):
+    if not assignments.is_assigned(current_user.id, patient_id):
+        abort(403)
+
+    entry = db.session.get(JournalEntry, entry_id, options=[undefer_group("body")])
+    if not entry or entry.patient_id != patient_id or not entry.shared_with_therapist:
+        abort(404)
+
+    return render_template(
+        "therapist/patient_journal_entry.html",
+        title=entry.title,
+        patient=db.session.get(User, patient_id),
+        entry=entry,
+    )
+
+
+@bp.get("/patients/<int:patient_id>/journal/archive")
+@role_required("therapist")
+def patient_journal_archive(patient_id: int):
+    if not assignments.is_assigned(current_user.id, patient_id):
+        abort(403)
+
+    patient = db.session.get(User, patient_id)
+    if not patient:
+        abort(404)
+
+    page = paginate(
+        JournalArchive.query.filter_by(patient_id=patient_id, shared_with_therapist=True),
+        JournalArchive.created_at,
+        JournalArchive.id,
+        request.args.get("cursor"),
+    )
+
+    return render_template(
+        "therapist/patient_journal_archive.html",
+        title=f"{patient.display_name} - Journal archive",
+        patient=patient,
+        entries=page.items,
+        page=page,
+    )
+
+
+@bp.get("/patients/<int:patient_id>/journal/search")
+@role_required("therapist")
+def patient_journal_search(patient_id: int):
+    if not assignments.is_assigned(current_user.id, patient_id):
+        abort(403)
+
+    patient = db.session.get(User, patient_id)
+    if not patient:
+        abort(404)
+
+    query = request.args.get("q", "").strip()
+    hits = search.search_journal(patient_id, query, shared_only=True) if query else []
+    return render_template(
+        "therapist/patient_journal_search.html",
+        title=f"{patient.display_name} - Journal search",
+        patient=patient,
+        query=query,
+        hits=hits,
     )
 
 
 @bp.get("/patients/<int:patient_id>/mood")
 @role_required("therapist")
 def patient_mood(patient_id: int):
-    if patient_id not in _assigned_patient_ids():
+    if not assignments.is_assigned(current_user.id, patient_id):
         abort(403)
 
     patient = db.session.get(User, patient_id)
     if not patient:
         abort(404)
 
-    entries = (
-        MoodEntry.query.filter_by(patient_id=patient_id)
-        .order_by(MoodEntry.created_at.desc())
-        .limit(100)
-        .all()
+    page = paginate(
+        MoodEntry.query.filter_by(patient_id=patient_id),
+        MoodEntry.created_at,
+        MoodEntry.id,
+        request.args.get("cursor"),
     )
+    # Past the oldest check-in still on file, the history continues as daily/weekly rollups.
+    earlier = []
+    if not page.has_next:
+        earlier = mood_stats.rollups(patient_id)
 
     return render_template(
         "therapist/patient_mood.html",
         title=f"{patient.display_name} - Mood",
         patient=patient,
-        entries=entries,
+        entries=page.items,
+        page=page,
+        earlier=earlier[::-1],
+        trend_start=(utc_now().date() - timedelta(days=364)).isoformat(),
+        mood_summary=mood_stats.stats_for(patient_id),
     )
 
 
+@bp.get("/patients/<int:patient_id>/mood/stats")
+@role_required("therapist")
+def patient_mood_stats(patient_id: int):
+    if not assignments.is_assigned(current_user.id, patient_id):
+        abort(403)
+    return mood_stats.stats_for(patient_id)
+
+
+@bp.get("/patients/<int:patient_id>/mood/history")
+@role_required("therapist")
+def patient_mood_history(patient_id: int):
+    if not assignments.is_assigned(current_user.id, patient_id):
+        abort(403)
+    since = mood_stats.history_since(request.args.get("days", type=int))
+    return {"points": [p.as_dict() for p in mood_stats.history(patient_id, since)]}
+
+
+@bp.get("/mood/series")
+@role_required("therapist")
+def mood_series():
+    patient_ids = list(dict.fromkeys(request.args.getlist("patient_id", type=int)))
+    if not patient_ids or len(patient_ids) > timeseries.MAX_PATIENTS:
+        abort(400)
+    if not set(patient_ids) <= assignments.patients_of(current_user.id):
+        abort(403)
+    args = timeseries.series_args()
+    return timeseries.payload(args, patient_ids)
+
+
 @bp.post("/alerts/<int:alert_id>/resolve")
 @role_required("therapist")
 def alert_resolve(alert_id: int):
@@ -151,17 +300,43 @@ def alert_resolve(alert_id: int):
     if not alert or alert.therapist_id != current_user.id:
         abort(404)
 
-    alert.resolved = True
-    db.session.commit()
+    if not alert.resolved:
+        alert.resolved = True
+        summary.alert_resolved(alert)
+        touch(current_user.id)
+        db.session.commit()
     flash("Alert resolved", "success")
     return redirect(url_for("therapist.dashboard"))
 
 
+@bp.get("/alerts/stream")
+@role_required("therapist")
+def alerts_stream():
+    # The dashboard passes the id in the query when it reconnects after a refusal; browsers only set the header.
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get("last_event_id", type=int)
+    try:
+        body = event_hub.stream(f"therapist:{current_user.id}", last_event_id)
+    except StreamLimitReached:
+        return Response(status=503, headers={"Retry-After": "10"})
+    return Response(
+        body,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @bp.get("/resources")
 @role_required("therapist")
 def resources_list():
-    items = Resource.query.filter_by(therapist_id=current_user.id).order_by(Resource.created_at.desc()).all()
-    return render_template("therapist/resources_list.html", title="Resources", items=items)
+    page = paginate(
+        Resource.query.filter_by(therapist_id=current_user.id),
+        Resource.created_at,
+        Resource.id,
+        request.args.get("cursor"),
+    )
+    return render_template("therapist/resources_list.html", title="Resources", items=page.items, page=page)
 
 
 @bp.route("/resources/new", methods=["GET", "POST"])
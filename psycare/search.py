@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import event, or_, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import undefer_group
+
+from .extensions import db
+from .models import JournalEntry
+
+
+FTS_TABLE = "journal_fts"
+_HIT_START, _HIT_END = "\x02", "\x03"
+
+# Owner tokens let FTS intersect a patient's (and, for therapists, the shared)
+# posting list with the query terms instead of filtering every global match.
+# They are spelled so ordinary search words never collide with them.
+_OWNER_EXPR = (
+    "'pid' || {row}.patient_id || "
+    "CASE WHEN {row}.shared_with_therapist THEN ' isshared' ELSE '' END"
+)
+
+# SQL spelling of JournalEntry.body: compressed rows keep their text in body_z.
+_TEXT_EXPR = "journal_text({row}.body, {row}.body_z)"
+
+# Contentless: the index keeps postings only, never a second copy of the text.
+# Removing a row takes the values it was indexed with, which the triggers
+# rebuild from the journal row itself.
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, body, owner, content='', "
+    "tokenize='unicode61')",
+    f"""CREATE TRIGGER IF NOT EXISTS journal_fts_ai AFTER INSERT ON journal_entries BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body, owner)
+        VALUES (new.id, new.title, {_TEXT_EXPR.format(row="new")}, {_OWNER_EXPR.format(row="new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS journal_fts_ad AFTER DELETE ON journal_entries BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body, owner)
+        VALUES ('delete', old.id, old.title, {_TEXT_EXPR.format(row="old")}, {_OWNER_EXPR.format(row="old")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS journal_fts_au
+        AFTER UPDATE OF title, body, body_z, shared_with_therapist, patient_id ON journal_entries BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body, owner)
+        VALUES ('delete', old.id, old.title, {_TEXT_EXPR.format(row="old")}, {_OWNER_EXPR.format(row="old")});
+        INSERT INTO {FTS_TABLE}(rowid, title, body, owner)
+        VALUES (new.id, new.title, {_TEXT_EXPR.format(row="new")}, {_OWNER_EXPR.format(row="new")});
+    END""",
+]
+
+# The layout migration 5 installed: a regular FTS table holding its own copy of
+# title and body. Migration 9 replaces it with FTS_DDL.
+LEGACY_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, body, owner, tokenize='unicode61')",
+    f"""CREATE TRIGGER IF NOT EXISTS journal_fts_ai AFTER INSERT ON journal_entries BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body, owner)
+        VALUES (new.id, new.title, new.body, {_OWNER_EXPR.format(row="new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS journal_fts_ad AFTER DELETE ON journal_entries BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS journal_fts_au
+        AFTER UPDATE OF title, body, shared_with_therapist, patient_id ON journal_entries BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, title, body, owner)
+        VALUES (new.id, new.title, new.body, {_OWNER_EXPR.format(row="new")});
+    END""",
+]
+
+
+def journal_text(body: str, body_z: bytes | None) -> str:
+    return zlib.decompress(body_z).decode() if body_z is not None else body
+
+
+@event.listens_for(Engine, "connect")
+def _register_functions(dbapi_connection, connection_record) -> None:
+    # The triggers above call journal_text() on every write to journal_entries.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("journal_text", 2, journal_text, deterministic=True)
+
+
+@dataclass
+class SearchHit:
+    id: int
+    title: str
+    created_at: datetime
+    shared_with_therapist: bool
+    flagged_risk: bool
+    snippet: Markup
+
+
+def install_fts(conn: Connection, legacy: bool = False) -> bool:
+    """Create the FTS index and its sync triggers; False when the engine has no FTS5.
+
+    ``legacy`` installs migration 5's original layout, for that migration only.
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.exec_driver_sql("DROP TABLE temp.fts5_probe")
+    except Exception:
+        return False
+    exists = _has_fts_table(conn)
+    for ddl in LEGACY_FTS_DDL if legacy else FTS_DDL:
+        conn.exec_driver_sql(ddl)
+    if not exists:
+        _index_rows(conn, after_id=0, body="body" if legacy else _TEXT_EXPR.format(row="journal_entries"))
+    return True
+
+
+def drop_fts(conn: Connection) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    for trigger in ("journal_fts_ai", "journal_fts_ad", "journal_fts_au"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def _has_fts_table(conn: Connection) -> bool:
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first() is not None
+
+
+def _index_rows(conn: Connection, after_id: int, body: str = _TEXT_EXPR.format(row="journal_entries")) -> None:
+    conn.exec_driver_sql(
+        f"INSERT INTO {FTS_TABLE}(rowid, title, body, owner) "
+        f"SELECT id, title, {body}, {_OWNER_EXPR.format(row='journal_entries')} FROM journal_entries WHERE id > ?",
+        (after_id,),
+    )
+
+
+def index_bodies(conn: Connection, rows: list[dict]) -> None:
+    """Re-index entries compressed by migration 8 under migration 5's layout, whose triggers only saw ``body``.
+
+    ``rows`` carry id, patient_id, title, body (plain text) and shared_with_therapist.
+    A no-op where the index was never installed.
+    """
+    if not rows or conn.dialect.name != "sqlite" or not _has_fts_table(conn):
+        return
+    conn.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": r["id"]} for r in rows])
+    conn.execute(
+        text(f"INSERT INTO {FTS_TABLE}(rowid, title, body, owner) VALUES (:id, :title, :body, :owner)"),
+        [
+            {
+                "id": r["id"],
+                "title": r["title"],
+                "body": r["body"],
+                "owner": f"pid{r['patient_id']}" + (" isshared" if r["shared_with_therapist"] else ""),
+            }
+            for r in rows
+        ],
+    )
+
+
+@contextmanager
+def deferred_index(conn: Connection) -> Iterator[None]:
+    """Bulk loads: drop the per-row insert trigger, then index the new rows in one statement.
+
+    Only rows appended with ids above the current maximum are indexed afterwards.
+    """
+    if conn.dialect.name != "sqlite" or not _has_fts_table(conn):
+        yield
+        return
+    after_id = conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM journal_entries").scalar()
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS journal_fts_ai")
+    try:
+        yield
+        _index_rows(conn, after_id)
+    finally:
+        conn.exec_driver_sql(FTS_DDL[1])
+
+
+def fts_enabled() -> bool:
+    flag = current_app.extensions.get("journal_fts")
+    if flag is None:
+        flag = False
+        if db.engine.dialect.name == "sqlite":
+            found = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+            ).first()
+            flag = found is not None
+        current_app.extensions["journal_fts"] = flag
+    return flag
+
+
+def _terms(query: str) -> list[str]:
+    return re.findall(r"\w+", query.lower())[:8]
+
+
+def _render_snippet(raw: str) -> Markup:
+    return Markup(str(escape(raw)).replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>"))
+
+
+def search_journal(patient_id: int, query: str, shared_only: bool = False, limit: int = 20) -> list[SearchHit]:
+    terms = _terms(query)
+    if not terms:
+        return []
+    if fts_enabled():
+        return _search_fts(patient_id, terms, shared_only, limit)
+    return _search_like(patient_id, terms, shared_only, limit)
+
+
+def _search_fts(patient_id: int, terms: list[str], shared_only: bool, limit: int) -> list[SearchHit]:
+    owner = f"owner:pid{patient_id}" + (" AND owner:isshared" if shared_only else "")
+    match = owner + " AND (" + " ".join(f'"{t}"' for t in terms) + ")"
+    rows = db.session.execute(
+        text(
+            f"""
+            SELECT j.id, j.title, j.created_at, j.shared_with_therapist, j.flagged_risk,
+                   {_TEXT_EXPR.format(row="j")} AS body
+            FROM {FTS_TABLE}
+            JOIN journal_entries AS j ON j.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :match
+              AND j.patient_id = :patient_id
+              AND (:shared_only = 0 OR j.shared_with_therapist = 1)
+            ORDER BY bm25({FTS_TABLE}, 5.0, 1.0, 0.0)
+            LIMIT :limit
+            """
+        ).columns(created_at=db.DateTime, shared_with_therapist=db.Boolean, flagged_risk=db.Boolean),
+        {
+            "match": match,
+            "patient_id": patient_id,
+            "shared_only": int(shared_only),
+            "limit": limit,
+        },
+    )
+    # The index is contentless, so snippets are cut from the stored text of the hits.
+    return [SearchHit(*row[:5], snippet=_like_snippet(row.body, terms)) for row in rows]
+
+
+def _like_snippet(body: str, terms: list[str], width: int = 80) -> Markup:
+    lowered = body.lower()
+    pos = min((p for p in (lowered.find(t) for t in terms) if p >= 0), default=0)
+    start = max(0, pos - width // 2)
+    excerpt = ("…" if start else "") + body[start : start + width] + ("…" if start + width < len(body) else "")
+    pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+    return _render_snippet(pattern.sub(lambda m: _HIT_START + m.group(0) + _HIT_END, excerpt))
+
+
+def _search_like(patient_id: int, terms: list[str], shared_only: bool, limit: int) -> list[SearchHit]:
+    query = JournalEntry.query.options(undefer_group("body")).filter(JournalEntry.patient_id == patient_id)
+    if shared_only:
+        query = query.filter(JournalEntry.shared_with_therapist.is_(True))
+    for term in terms:
+        like = f"%{term}%"
+        # Compressed bodies are opaque to SQL; their excerpt is the best LIKE can do.
+        query = query.filter(
+            or_(JournalEntry.title.ilike(like), JournalEntry.body.ilike(like), JournalEntry.excerpt.ilike(like))
+        )
+    entries = query.order_by(JournalEntry.created_at.desc(), JournalEntry.id.desc()).limit(limit).all()
+    return [
+        SearchHit(
+            e.id, e.title, e.created_at, e.shared_with_therapist, e.flagged_risk, _like_snippet(e.body, terms)
+        )
+        for e in entries
+    ]
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import random
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Iterable, Iterator
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Connection
+
+from . import mood_stats, search, summary
+from .assignments import assignments
+from .extensions import db
+from .models import Alert, JournalEntry, MoodEntry, PatientTherapist, Resource, User, make_excerpt
+from .passwords import hasher
+
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential")
+BATCH_SIZE = 10_000
+PASSWORD = "Password123!"
+
+WORDS = (
+    "sleep anxious calm family work walk therapy breathing tired hopeful panic friends exercise music "
+    "garden weekend appointment medication journal progress morning evening rain coffee worried proud "
+    "lonely grateful headache school partner sister brother dog park dinner meeting deadline rest"
+).split()
+
+
+@dataclass(frozen=True)
+class SeedConfig:
+    """Volumes are means per owner; ``distribution`` decides how they vary around them."""
+
+    therapists: int = 10
+    patients_per_therapist: float = 50
+    journals_per_patient: float = 20
+    moods_per_patient: float = 60
+    alerts_per_patient: float = 0.5
+    resources_per_therapist: float = 10
+    distribution: str = "exponential"
+    days: int = 365
+    shared_ratio: float = 0.7
+    flagged_ratio: float = 0.03
+    resolved_ratio: float = 0.8
+    seed: int = 1
+    end: date | None = None  # history ends here (default today), so runs on one day are identical
+    batch_size: int = BATCH_SIZE
+    password: str = PASSWORD
+
+    def __post_init__(self):
+        if self.distribution not in DISTRIBUTIONS:
+            raise ValueError(f"distribution must be one of {', '.join(DISTRIBUTIONS)}")
+
+
+@dataclass
+class SeedResult:
+    therapist_ids: list[int]
+    patient_ids: list[int]  # grouped by therapist, in therapist order
+    rows: dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+def therapist_email(config: SeedConfig, i: int) -> str:
+    return f"therapist{i}.s{config.seed}@example.com"
+
+
+def patient_email(config: SeedConfig, i: int) -> str:
+    return f"patient{i}.s{config.seed}@example.com"
+
+
+def _count(rng: random.Random, mean: float, distribution: str) -> int:
+    if mean <= 0:
+        return 0
+    if distribution == "fixed":
+        value = mean
+    elif distribution == "uniform":
+        value = rng.uniform(0, 2 * mean)
+    else:
+        # Long tail: most owners have a little, a few have a lot.
+        value = rng.expovariate(1 / mean)
+    # Stochastic rounding keeps fractional means (0.5 alerts per patient) exact on average.
+    return int(value + rng.random())
+
+
+# Text is cut from a fixed pseudo-random word stream: one RNG call per field
+# instead of one per word, which dominated generation time.
+_STREAM = random.Random("psycare-seed-words").choices(WORDS, k=8192)
+_STREAM += _STREAM[:200]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    start = rng.randrange(8192)
+    return " ".join(_STREAM[start:start + words])
+
+
+def _next_id(conn: Connection, model) -> int:
+    return (conn.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _write(conn: Connection, model, rows: Iterable[dict], batch_size: int) -> int:
+    """executemany in ``batch_size`` chunks; returns the row count."""
+    table = model.__table__
+    total = 0
+    batch: list[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(insert(table), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+
+class _Generator:
+    """Row streams for one run. Each table draws from its own RNG so the output is
+    identical however the writes are batched."""
+
+    def __init__(self, config: SeedConfig, end: datetime):
+        self.config = config
+        self.end = end
+        self.span = timedelta(days=config.days).total_seconds()
+
+    def rng(self, name: str) -> random.Random:
+        return random.Random(f"{self.config.seed}:{name}")
+
+    def when(self, rng: random.Random) -> datetime:
+        return self.end - timedelta(seconds=rng.random() * self.span)
+
+    def caseloads(self) -> list[int]:
+        rng = self.rng("caseload")
+        return [
+            _count(rng, self.config.patients_per_therapist, self.config.distribution)
+            for _ in range(self.config.therapists)
+        ]
+
+    def per_owner(self, name: str, owner_ids: list[int], mean: float) -> Iterator[tuple[random.Random, int]]:
+        rng = self.rng(name)
+        for owner_id in owner_ids:
+            for _ in range(_count(rng, mean, self.config.distribution)):
+                yield rng, owner_id
+
+    def journals(self, patient_ids: list[int], first_id: int) -> Iterator[dict]:
+        c = self.config
+        for n, (rng, pid) in enumerate(self.per_owner("journal", patient_ids, c.journals_per_patient)):
+            at = self.when(rng)
+            body = _text(rng, rng.randint(20, 120))
+            yield {
+                "id": first_id + n, "patient_id": pid, "title": _text(rng, 3).capitalize(),
+                "excerpt": make_excerpt(body), "body": body, "shared_with_therapist": rng.random() < c.shared_ratio,
+                "flagged_risk": rng.random() < c.flagged_ratio, "created_at": at, "updated_at": at,
+            }
+
+    def moods(self, patient_ids: list[int], first_id: int) -> Iterator[dict]:
+        for n, (rng, pid) in enumerate(self.per_owner("mood", patient_ids, self.config.moods_per_patient)):
+            yield {
+                "id": first_id + n, "patient_id": pid, "rating": min(10, max(1, round(rng.gauss(6, 2)))),
+                "note": _text(rng, rng.randint(0, 8)), "created_at": self.when(rng),
+            }
+
+    def alerts(self, patient_ids: list[int], therapist_of: dict[int, int], first_id: int) -> Iterator[dict]:
+        for n, (rng, pid) in enumerate(self.per_owner("alert", patient_ids, self.config.alerts_per_patient)):
+            yield {
+                "id": first_id + n, "patient_id": pid, "therapist_id": therapist_of[pid], "kind": "panic",
+                "message": "Patient pressed the panic button.",
+                "resolved": rng.random() < self.config.resolved_ratio, "created_at": self.when(rng),
+            }
+
+    def resources(self, therapist_ids: list[int], first_id: int) -> Iterator[dict]:
+        rows = self.per_owner("resource", therapist_ids, self.config.resources_per_therapist)
+        for n, (rng, tid) in enumerate(rows):
+            yield {
+                "id": first_id + n, "therapist_id": tid, "title": _text(rng, 4).capitalize(),
+                "url": f"https://example.org/resources/{first_id + n}", "description": _text(rng, 12),
+                "created_at": self.when(rng),
+            }
+
+
+def seed(config: SeedConfig, echo=None) -> SeedResult:
+    """Bulk-load synthetic data with Core inserts and explicit ids (no per-row round trips).
+
+    Needs an app context. One transaction per table; the derived summary and
+    mood tables are rebuilt at the end.
+    """
+    echo = echo or (lambda message: None)
+    started = time.perf_counter()
+    end_day = config.end or datetime.now(timezone.utc).date()
+    gen = _Generator(config, datetime.combine(end_day, dt_time(), tzinfo=timezone.utc))
+    result = SeedResult([], [])
+
+    with db.engine.begin() as conn:
+        if conn.scalar(select(User.id).where(User.email == therapist_email(config, 0))):
+            raise ValueError(f"seed {config.seed} has already been loaded into this database")
+        pwhash = hasher.hash(config.password)
+        caseloads = gen.caseloads()
+        first_user = _next_id(conn, User)
+        result.therapist_ids = list(range(first_user, first_user + config.therapists))
+        result.patient_ids = list(range(first_user + config.therapists, first_user + config.therapists + sum(caseloads)))
+        users = [
+            {"id": uid, "email": therapist_email(config, i), "password_hash": pwhash, "role": "therapist",
+             "display_name": f"Therapist {i}", "created_at": gen.end}
+            for i, uid in enumerate(result.therapist_ids)
+        ] + [
+            {"id": uid, "email": patient_email(config, i), "password_hash": pwhash, "role": "patient",
+             "display_name": f"Patient {i:06d}", "created_at": gen.end}
+            for i, uid in enumerate(result.patient_ids)
+        ]
+        result.rows["users"] = _write(conn, User, users, config.batch_size)
+
+        therapist_of: dict[int, int] = {}
+        patients = iter(result.patient_ids)
+        for tid, caseload in zip(result.therapist_ids, caseloads):
+            for _ in range(caseload):
+                therapist_of[next(patients)] = tid
+        first_link = _next_id(conn, PatientTherapist)
+        links = (
+            {"id": first_link + n, "patient_id": pid, "therapist_id": tid, "created_at": gen.end}
+            for n, (pid, tid) in enumerate(therapist_of.items())
+        )
+        result.rows["links"] = _write(conn, PatientTherapist, links, config.batch_size)
+    echo(f"users: {result.rows['users']}, links: {result.rows['links']}")
+
+    steps = (
+        ("journal entries", JournalEntry, lambda first: gen.journals(result.patient_ids, first)),
+        ("moods", MoodEntry, lambda first: gen.moods(result.patient_ids, first)),
+        ("alerts", Alert, lambda first: gen.alerts(result.patient_ids, therapist_of, first)),
+        ("resources", Resource, lambda first: gen.resources(result.therapist_ids, first)),
+    )
+    for name, model, rows in steps:
+        with db.engine.begin() as conn, (search.deferred_index(conn) if model is JournalEntry else nullcontext()):
+            result.rows[name] = _write(conn, model, rows(_next_id(conn, model)), config.batch_size)
+        echo(f"{name}: {result.rows[name]}")
+
+    with db.engine.begin() as conn:
+        summary.rebuild(conn)
+        mood_stats.rebuild(conn)
+    # Running workers cache the assignment map; tell them it changed.
+    assignments.links_changed()
+    db.session.commit()
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+@click.command("seed")
+@click.option("--therapists", type=int, default=SeedConfig.therapists, show_default=True)
+@click.option("--patients", "patients_per_therapist", type=float, default=SeedConfig.patients_per_therapist,
+              show_default=True, help="Mean patients per therapist.")
+@click.option("--journals", "journals_per_patient", type=float, default=SeedConfig.journals_per_patient,
+              show_default=True, help="Mean journal entries per patient.")
+@click.option("--moods", "moods_per_patient", type=float, default=SeedConfig.moods_per_patient,
+              show_default=True, help="Mean mood check-ins per patient.")
+@click.option("--alerts", "alerts_per_patient", type=float, default=SeedConfig.alerts_per_patient,
+              show_default=True, help="Mean alerts per patient.")
+@click.option("--resources", "resources_per_therapist", type=float, default=SeedConfig.resources_per_therapist,
+              show_default=True, help="Mean resources per therapist.")
+@click.option("--distribution", type=click.Choice(DISTRIBUTIONS), default=SeedConfig.distribution,
+              show_default=True, help="How per-owner counts vary around their mean.")
+@click.option("--days", type=int, default=SeedConfig.days, show_default=True, help="Length of the history.")
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), help="Last day of the history (default today).")
+@click.option("--seed", "seed_value", type=int, default=SeedConfig.seed, show_default=True)
+@click.option("--batch-size", type=int, default=BATCH_SIZE, show_default=True)
+@click.option("--password", default=PASSWORD, show_default=True, help="Password of every seeded account.")
+@with_appcontext
+def cli(seed_value: int, end, **options) -> None:
+    """Load deterministic synthetic therapists, patients and their data."""
+    config = SeedConfig(seed=seed_value, end=end.date() if end else None, **options)
+    try:
+        result = seed(config, echo=click.echo)
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from exc
+    total = sum(result.rows.values())
+    click.echo(
+        f"Seeded {total} rows in {result.seconds:.1f} s ({total / max(result.seconds, 1e-9):,.0f} rows/s). "
+        f"Log in as {therapist_email(config, 0)} or {patient_email(config, 0)} with the seed password."
+    )
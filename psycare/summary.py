@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from sqlalchemy import func, insert, literal, select, true, update
+from sqlalchemy.engine import Connection
+
+from .extensions import db
+from .models import Alert, JournalEntry, MoodEntry, PatientSummary, PatientTherapist, User, utc_now
+
+# Every helper below only stages statements on db.session; the caller's commit
+# makes the summary change atomic with the write it mirrors.
+
+_summary = PatientSummary.__table__
+
+
+def _latest_mood(column):
+    return (
+        select(column)
+        .where(MoodEntry.patient_id == _summary.c.patient_id)
+        .order_by(MoodEntry.created_at.desc(), MoodEntry.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def _latest_shared_journal(column):
+    return (
+        select(column)
+        .where(
+            JournalEntry.patient_id == _summary.c.patient_id,
+            JournalEntry.shared_with_therapist.is_(True),
+        )
+        .order_by(JournalEntry.created_at.desc(), JournalEntry.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def _journal_values() -> dict:
+    return {
+        "last_journal_title": _latest_shared_journal(JournalEntry.title),
+        "last_journal_flagged": func.coalesce(_latest_shared_journal(JournalEntry.flagged_risk), False),
+        "last_shared_journal_at": _latest_shared_journal(JournalEntry.created_at),
+    }
+
+
+def _refresh_all_values() -> dict:
+    open_alerts = (
+        select(func.count(Alert.id))
+        .where(
+            Alert.therapist_id == _summary.c.therapist_id,
+            Alert.patient_id == _summary.c.patient_id,
+            Alert.resolved.is_(False),
+        )
+        .scalar_subquery()
+    )
+    return {
+        "last_mood_rating": _latest_mood(MoodEntry.rating),
+        "last_mood_at": _latest_mood(MoodEntry.created_at),
+        "unresolved_alert_count": open_alerts,
+        **_journal_values(),
+    }
+
+
+def add_patient(therapist_id: int, patient: User) -> None:
+    """Create the summary row for a new link, seeded from the patient's existing history."""
+    add_patients(therapist_id, [patient.id])
+
+
+def add_patients(therapist_id: int, patient_ids: list[int]) -> None:
+    """Set-based ``add_patient`` for many freshly linked patients of one therapist."""
+    if not patient_ids:
+        return
+    db.session.execute(
+        insert(_summary).from_select(
+            ["therapist_id", "patient_id", "display_name", "email", "updated_at"],
+            select(
+                literal(therapist_id), User.id, User.display_name, User.email, literal(utc_now(), db.DateTime)
+            ).where(User.id.in_(patient_ids)),
+        )
+    )
+    db.session.execute(
+        update(_summary)
+        .where(_summary.c.therapist_id == therapist_id, _summary.c.patient_id.in_(patient_ids))
+        .values(**_refresh_all_values())
+    )
+
+
+def record_mood(entry: MoodEntry) -> None:
+    db.session.flush()
+    db.session.execute(
+        update(_summary)
+        .where(_summary.c.patient_id == entry.patient_id)
+        .values(last_mood_rating=entry.rating, last_mood_at=entry.created_at)
+    )
+
+
+def refresh_journal(patient_id: int) -> None:
+    """Re-derive the latest shared entry; covers creates, edits, unsharing and deletes alike."""
+    db.session.flush()
+    db.session.execute(update(_summary).where(_summary.c.patient_id == patient_id).values(**_journal_values()))
+
+
+def _adjust_alerts(alert: Alert, delta: int) -> None:
+    if alert.therapist_id is None:
+        return
+    db.session.execute(
+        update(_summary)
+        .where(_summary.c.therapist_id == alert.therapist_id, _summary.c.patient_id == alert.patient_id)
+        .values(unresolved_alert_count=_summary.c.unresolved_alert_count + delta)
+    )
+
+
+def alert_opened(alert: Alert) -> None:
+    _adjust_alerts(alert, 1)
+
+
+def alert_resolved(alert: Alert) -> None:
+    _adjust_alerts(alert, -1)
+
+
+def rebuild(conn: Connection) -> None:
+    """Recompute every summary row from the source tables (backfills and bulk loads)."""
+    links = PatientTherapist.__table__
+    users = User.__table__
+    conn.execute(_summary.delete())
+    conn.execute(
+        insert(_summary).from_select(
+            [
+                "therapist_id",
+                "patient_id",
+                "display_name",
+                "email",
+                "last_journal_flagged",
+                "unresolved_alert_count",
+                "updated_at",
+            ],
+            select(
+                links.c.therapist_id,
+                links.c.patient_id,
+                users.c.display_name,
+                users.c.email,
+                literal(False),
+                literal(0),
+                literal(utc_now(), db.DateTime),
+            ).select_from(links.join(users, users.c.id == links.c.patient_id)),
+        )
+    )
+    conn.execute(update(_summary).where(true()).values(**_refresh_all_values()))
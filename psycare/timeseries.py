@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import chain
+from typing import TYPE_CHECKING
+
+from flask import abort, request
+
+from . import mood_stats
+from .models import utc_now
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+MODES = ("lttb", "bucket")
+DEFAULT_POINTS = 200
+MAX_POINTS = 2000
+DEFAULT_DAYS = 90
+MAX_PATIENTS = 50
+# Longer ranges are served from daily rollups instead of raw check-ins.
+RAW_MAX_DAYS = 366
+# The range the date arithmetic here and in mood_stats can represent.
+FIRST_DAY = date.min + timedelta(days=7)
+LAST_DAY = date.max - timedelta(days=1)
+
+
+@dataclass(frozen=True)
+class SeriesArgs:
+    start: datetime
+    end: datetime
+    points: int
+    mode: str
+
+
+def load(patient_ids: list[int], args: SeriesArgs) -> dict[int, dict[str, np.ndarray]]:
+    """Columnar series per patient, read straight into arrays.
+
+    Ranges longer than ``RAW_MAX_DAYS`` are read from the daily rollups, so a
+    years-long request loads one row per day rather than one per check-in.
+    """
+    # numpy is imported on first use: most workers never serve a series.
+    import numpy as np
+
+    raw = (args.end - args.start).days <= RAW_MAX_DAYS
+    rows = mood_stats.series_rows(patient_ids, args.start, args.end, raw=raw)
+    table = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 6).reshape(-1, 6)
+    owners = table[:, 0]
+    result = {}
+    for patient_id in patient_ids:
+        lo, hi = np.searchsorted(owners, patient_id, "left"), np.searchsorted(owners, patient_id, "right")
+        _, t, count, total, low, high = table[lo:hi].T
+        result[patient_id] = {"t": t, "mean": total / count, "min": low, "max": high, "count": count}
+    return result
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the ``n`` points Largest-Triangle-Three-Buckets keeps; first and last always survive.
+
+    Bucket bounds and the next-bucket averages are computed up front; only the
+    pick itself walks the buckets, since each depends on the one before.
+    """
+    import numpy as np
+
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1][:n])
+
+    # n - 2 buckets over the interior points: [edges[i], edges[i + 1])
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    widths = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[: size - 1], edges[:-1]) / widths, x[-1])
+    avg_y = np.append(np.add.reduceat(y[: size - 1], edges[:-1]) / widths, y[-1])
+
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the area of the triangle (a, candidate, average of the next bucket).
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def bucket(series: dict[str, np.ndarray], n: int, start: float, end: float) -> dict[str, np.ndarray]:
+    """Aggregate into ``n`` equal time buckets over ``[start, end)``: count-weighted mean, min, max, count.
+
+    Empty buckets are dropped; ``t`` is each bucket's start.
+    """
+    import numpy as np
+
+    width = (end - start) / n
+    idx = np.clip(((series["t"] - start) // width).astype(np.int64), 0, n - 1)
+    count = np.bincount(idx, weights=series["count"], minlength=n)
+    total = np.bincount(idx, weights=series["mean"] * series["count"], minlength=n)
+    low = np.full(n, np.inf)
+    high = np.full(n, -np.inf)
+    np.minimum.at(low, idx, series["min"])
+    np.maximum.at(high, idx, series["max"])
+
+    filled = count > 0
+    return {
+        "t": (start + np.arange(n) * width)[filled],
+        "mean": total[filled] / count[filled],
+        "min": low[filled],
+        "max": high[filled],
+        "count": count[filled],
+    }
+
+
+def downsample(series: dict[str, np.ndarray], args: SeriesArgs) -> dict:
+    """A columnar series of at most ``args.points`` points, whatever the length of the history."""
+    import numpy as np
+
+    checkins = int(series["count"].sum())
+    if len(series["t"]) > args.points:
+        if args.mode == "bucket":
+            start = args.start.replace(tzinfo=timezone.utc).timestamp()
+            end = args.end.replace(tzinfo=timezone.utc).timestamp()
+            series = bucket(series, args.points, start, end)
+        else:
+            keep = lttb(series["t"], series["mean"], args.points)
+            series = {name: column[keep] for name, column in series.items()}
+    return {
+        "t": series["t"].astype(np.int64).tolist(),
+        "mean": np.round(series["mean"], 2).tolist(),
+        "min": series["min"].astype(np.int64).tolist(),
+        "max": series["max"].astype(np.int64).tolist(),
+        "count": series["count"].astype(np.int64).tolist(),
+        "checkins": checkins,
+    }
+
+
+def _date_arg(name: str, default: date) -> date:
+    raw = request.args.get(name)
+    if not raw:
+        return default
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        abort(400)
+
+
+def series_args() -> SeriesArgs:
+    """Parse ``start``/``end`` (inclusive ISO dates), ``points`` and ``mode`` from the query string."""
+    end_day = min(_date_arg("end", utc_now().date()), LAST_DAY)
+    start_day = max(_date_arg("start", end_day - timedelta(days=DEFAULT_DAYS - 1)), FIRST_DAY)
+    mode = request.args.get("mode", MODES[0])
+    if start_day > end_day or mode not in MODES:
+        abort(400)
+    points = max(2, min(request.args.get("points", DEFAULT_POINTS, type=int), MAX_POINTS))
+    return SeriesArgs(
+        start=datetime.combine(start_day, time.min),
+        end=datetime.combine(end_day + timedelta(days=1), time.min),
+        points=points,
+        mode=mode,
+    )
+
+
+def payload(args: SeriesArgs, patient_ids: list[int]) -> dict:
+    series = load(patient_ids, args)
+    return {
+        "start": args.start.date().isoformat(),
+        "end": (args.end - timedelta(days=1)).date().isoformat(),
+        "mode": args.mode,
+        "points": args.points,
+        "series": {str(patient_id): downsample(columns, args) for patient_id, columns in series.items()},
+    }
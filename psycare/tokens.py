@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import hmac
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from .identity import CachedUser, fingerprint, identity
+
+
+_SALT = "psycare-api-token"
+
+
+def _serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=_SALT)
+
+
+def issue(user_id: int, password_hash: str) -> str:
+    return _serializer().dumps({"uid": user_id, "key": fingerprint(password_hash)})
+
+
+def verify(token: str) -> CachedUser | None:
+    """User a valid, unexpired token was issued to; None otherwise, or once their password has changed."""
+    max_age = current_app.config.get("API_TOKEN_MAX_AGE", 7 * 24 * 3600)
+    try:
+        payload = _serializer().loads(token, max_age=max_age)
+    except BadSignature:
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("uid"), int):
+        return None
+    user = identity.load(payload["uid"])
+    if user is None or not hmac.compare_digest(str(payload.get("key", "")), user.token_key):
+        return None
+    return user
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from flask import g, has_request_context
+from sqlalchemy import select, update
+
+from .extensions import db
+from .invalidation import bus
+from .models import CacheVersion
+
+
+def _memo() -> dict[str, int] | None:
+    if not has_request_context():
+        return None
+    if "cache_versions" not in g:
+        g.cache_versions = {}
+    return g.cache_versions
+
+
+def get(key: str) -> int:
+    """Current version of ``key``; read at most once per request, and not at all once the bus has seen it."""
+    memo = _memo()
+    if memo is not None and key in memo:
+        return memo[key]
+    version = bus.version(key)
+    if version is None:
+        version = db.session.scalar(select(CacheVersion.version).where(CacheVersion.key == key)) or 0
+        # A bump staged in this transaction is not a version other workers will ever see if it rolls back.
+        if key not in db.session.info.get("invalidations", ()):
+            bus.remember(key, version)
+    if memo is not None:
+        memo[key] = version
+    return version
+
+
+def bump(*keys: str) -> None:
+    """Stage an increment of each key on the caller's transaction; the bus publishes it on commit."""
+    dialect = db.session.get_bind().dialect.name
+    table = CacheVersion.__table__
+    if dialect in ("sqlite", "postgresql"):
+        insert = dialect_insert(dialect)
+        stmt = insert(table).values([{"key": key, "version": 1} for key in keys])
+        rows = db.session.execute(
+            stmt.on_conflict_do_update(index_elements=[table.c.key], set_={"version": table.c.version + 1})
+            .returning(table.c.key, table.c.version)
+        )
+        changes: dict[str, int | None] = {key: version for key, version in rows}
+    else:
+        for key in keys:
+            result = db.session.execute(update(table).where(table.c.key == key).values(version=table.c.version + 1))
+            if result.rowcount == 0:
+                db.session.execute(table.insert().values(key=key, version=1))
+        changes = dict.fromkeys(keys)
+    bus.stage(db.session(), changes)
+
+    memo = _memo()
+    if memo is not None:
+        for key in keys:
+            memo.pop(key, None)
+
+
+def dialect_insert(dialect: str):
+    """``insert`` with ON CONFLICT support, imported only for the dialect in use."""
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
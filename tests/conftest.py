@@ -0,0 +1,110 @@
+import pytest
+
+from psycare import create_app, migrations, summary
+from psycare.extensions import db
+from psycare.invalidation import bus
+from psycare.models import PatientTherapist, User
+
+PASSWORD = "Password123!"
+
+
+def _config(uri, **overrides):
+    return {
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "SECRET_KEY": "test",
+        **overrides,
+    }
+
+
+def _seed_users(app):
+    with app.app_context():
+        therapist = User(email="t@example.com", display_name="Therapist", role="therapist")
+        therapist.set_password(PASSWORD)
+        patient = User(email="p@example.com", display_name="Patient", role="patient")
+        patient.set_password(PASSWORD)
+        db.session.add_all([therapist, patient])
+        db.session.commit()
+
+        link = PatientTherapist(patient_id=patient.id, therapist_id=therapist.id)
+        db.session.add(link)
+        summary.add_patient(therapist.id, patient)
+        db.session.commit()
+
+
+def _sign_in(client, email, password=PASSWORD):
+    return client.post("/auth/login", data={"email": email, "password": password}, follow_redirects=False)
+
+
+@pytest.fixture()
+def app():
+    app = create_app(_config("sqlite://"))
+
+    with app.app_context():
+        db.create_all()
+        migrations.upgrade()
+    _seed_users(app)
+
+    yield app
+
+
+@pytest.fixture()
+def make_app(tmp_path):
+    """Apps on SQLite files under ``tmp_path``; apps sharing a file behave like worker processes on one host.
+
+    The first app on a file creates the schema and, unless ``seed=False``, the
+    therapist/patient pair the ``app`` fixture has. Use it wherever threads or
+    several apps need connections of their own, which ``sqlite://`` cannot give.
+    """
+    made, ready = [], set()
+
+    def factory(name="app.db", seed=True, **config):
+        app = create_app(_config(f"sqlite:///{tmp_path / name}", **config))
+        made.append(app)
+        if name not in ready:
+            ready.add(name)
+            with app.app_context():
+                migrations.ensure_schema()
+            if seed:
+                _seed_users(app)
+        return app
+
+    yield factory
+    for app in made:
+        bus.shutdown(app)
+        with app.app_context():
+            db.engine.dispose()
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture()
+def login(client):
+    def _login(email, password=PASSWORD):
+        return _sign_in(client, email, password)
+
+    return _login
+
+
+@pytest.fixture()
+def login_as():
+    """A new test client of ``app``, signed in; for tests that drive several apps."""
+
+    def _login_as(app, email, password=PASSWORD):
+        client = app.test_client()
+        _sign_in(client, email, password)
+        return client
+
+    return _login_as
+
+
+@pytest.fixture()
+def ids(app):
+    with app.app_context():
+        therapist = User.query.filter_by(email="t@example.com").one()
+        patient = User.query.filter_by(email="p@example.com").one()
+        return {"therapist": therapist.id, "patient": patient.id}
@@ -0,0 +1,80 @@
+"""Local stand-ins for the webhook receiver and SMTP server that alert delivery talks to."""
+from __future__ import annotations
+
+import json
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookStub:
+    """Records JSON POSTs; answers with ``statuses`` in turn (the last one repeats) after ``delay``."""
+
+    def __init__(self, statuses=(200,), delay: float = 0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests: list[dict] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                time.sleep(stub.delay)
+                stub.requests.append({"headers": dict(self.headers), "json": json.loads(body)})
+                status = stub.statuses.pop(0) if len(stub.statuses) > 1 else stub.statuses[0]
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SMTPStub:
+    """Just enough SMTP for smtplib.send_message; keeps the parsed messages."""
+
+    def __init__(self):
+        self.messages = []
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str) -> None:
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                self.reply("220 stub ESMTP")
+                for raw in self.rfile:
+                    command = raw.decode().strip().upper()
+                    if command.startswith("DATA"):
+                        self.reply("354 end with .")
+                        lines = []
+                        for data in self.rfile:
+                            if data.rstrip(b"\r\n") == b".":
+                                break
+                            lines.append(data[1:] if data.startswith(b"..") else data)
+                        stub.messages.append(message_from_bytes(b"".join(lines)))
+                        self.reply("250 queued")
+                    elif command.startswith("QUIT"):
+                        self.reply("221 bye")
+                        return
+                    else:
+                        self.reply("250 ok")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,72 @@
+from sqlalchemy import event
+
+from psycare.extensions import db
+from psycare.models import User
+
+
+def _token(client, email):
+    resp = client.post("/api/v1/tokens", json={"email": email, "password": "Password123!"})
+    assert resp.status_code == 201
+    return {"Authorization": f"Bearer {resp.json['token']}"}
+
+
+def test_token_auth_and_errors(client):
+    assert client.get("/api/v1/me").status_code == 401
+    assert client.get("/api/v1/me", headers={"Authorization": "Bearer nope"}).json["error"] == "unauthorized"
+    assert client.post("/api/v1/tokens", json={"email": "p@example.com", "password": "wrong"}).status_code == 401
+
+    patient = _token(client, "p@example.com")
+    assert client.get("/api/v1/me", headers=patient).json["data"]["role"] == "patient"
+    assert client.get("/api/v1/alerts", headers=patient).status_code == 403
+
+
+def test_password_change_revokes_tokens(app, client):
+    headers = _token(client, "p@example.com")
+    assert client.get("/api/v1/me", headers=headers).status_code == 200
+
+    with app.app_context():
+        user = User.query.filter_by(email="p@example.com").one()
+        user.set_password("Another-password1")
+        db.session.commit()
+    assert client.get("/api/v1/me", headers=headers).status_code == 401
+
+
+def test_sparse_fields_and_cursor_pagination(client, login):
+    login("p@example.com")
+    for rating in range(1, 6):
+        client.post("/patient/mood", data={"rating": rating})
+    headers = _token(client, "p@example.com")
+
+    first = client.get("/api/v1/moods?fields=rating&per_page=2", headers=headers).json
+    assert first["data"] == [{"rating": 5}, {"rating": 4}]
+    second = client.get(f"/api/v1/moods?fields=rating&per_page=2&cursor={first['next_cursor']}", headers=headers).json
+    assert second["data"] == [{"rating": 3}, {"rating": 2}]
+
+    resp = client.get("/api/v1/moods?fields=rating,password_hash", headers=headers)
+    assert resp.status_code == 400
+    assert "password_hash" in resp.json["message"]
+
+
+def test_therapist_batch_moods_in_one_query(app, client, login, ids):
+    login("p@example.com")
+    for rating in (2, 4, 6):
+        client.post("/patient/mood", data={"rating": rating})
+    client.post("/patient/journal/new", data={"title": "Private", "body": "Some text"})
+    client.post("/auth/logout")
+
+    headers = _token(client, "t@example.com")
+    patients = client.get("/api/v1/patients?fields=id,last_mood_rating", headers=headers).json["data"]
+    assert patients == [{"id": ids["patient"], "last_mood_rating": 6}]
+    assert client.get(f"/api/v1/patients/{ids['patient']}/journal", headers=headers).json["data"] == []
+
+    client.get("/api/v1/me", headers=headers)  # warm the identity and assignment caches
+    client.get(f"/api/v1/moods/batch?patient_ids={ids['patient']}", headers=headers)
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    url = f"/api/v1/moods/batch?patient_ids={ids['patient']}&limit=2&fields=rating"
+    batch = client.get(url, headers=headers).json["data"]
+    assert batch == {str(ids["patient"]): [{"rating": 6}, {"rating": 4}]}
+    assert len(statements) <= 2  # assignment version check + the windowed mood query
+
+    assert client.get(f"/api/v1/moods/batch?patient_ids={ids['therapist']}", headers=headers).status_code == 403
@@ -0,0 +1,36 @@
+import re
+from pathlib import Path
+
+from psycare import create_app
+from psycare.assets import build, template_references
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_build_serves_hashed_precompressed_assets(tmp_path):
+    dist = tmp_path / "dist"
+    manifest, missing = build(ROOT / "ui", dist, ROOT / "templates")
+    assert not missing
+    assert set(manifest) >= set(template_references(ROOT / "templates"))
+    css = (dist / manifest["vendor/fontawesome-free/css/all.min.css"]).read_text()
+    font = Path(manifest["vendor/fontawesome-free/webfonts/fa-solid-900.woff2"]).name
+    assert f"url(../webfonts/{font})" in css
+
+    app = create_app(
+        {"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "test", "ASSETS_DIST": str(dist)}
+    )
+    client = app.test_client()
+    page = client.get("/auth/login").data.decode()
+    hashed = "/static/" + manifest["css/sb-admin-2.min.css"]
+    assert hashed in page
+    assert not re.search(r'/static/css/sb-admin-2\.min\.css"', page)
+
+    resp = client.get(hashed, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.mimetype == "text/css"
+    assert "immutable" in resp.headers["Cache-Control"]
+    assert "Accept-Encoding" in resp.headers["Vary"]
+
+    assert client.get(hashed).headers.get("Content-Encoding") is None
+    assert client.get("/static/css/sb-admin-2.min.css").status_code == 404
+    assert client.get("/static/vendor/jquery/jquery.js").status_code == 404
@@ -0,0 +1,33 @@
+from sqlalchemy import event
+
+from psycare.extensions import db
+from psycare.models import User
+
+
+def test_new_link_in_one_worker_is_visible_in_another(make_app, login_as):
+    worker_a, worker_b = make_app(), make_app()
+    with worker_a.app_context():
+        patient = User(email="new@example.com", display_name="Newcomer", role="patient")
+        patient.set_password("Password123!")
+        db.session.add(patient)
+        db.session.commit()
+        patient_id = patient.id
+
+    client_a = login_as(worker_a, "t@example.com")
+    client_b = login_as(worker_b, "t@example.com")
+    assert client_a.get(f"/therapist/patients/{patient_id}/journal").status_code == 403
+    client_b.post("/therapist/patients", data={"patient_email": "new@example.com"})
+    assert client_a.get(f"/therapist/patients/{patient_id}/journal").status_code == 200
+
+
+def test_membership_checks_only_read_the_version_when_warm(app, client, login, ids):
+    login("t@example.com")
+    url = f"/therapist/patients/{ids['patient']}/mood/stats"
+    client.get(url)
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert client.get(url).status_code == 200
+    assert not any("patient_therapists" in s for s in statements)
+    assert sum("cache_versions" in s for s in statements) == 1
@@ -0,0 +1,38 @@
+import pytest
+from flask import Flask
+
+from psycare import create_app
+from psycare.dbprofile import SERVER_ENGINE_OPTIONS, DatabaseProfile
+from psycare.extensions import db
+
+
+def test_sqlite_profile_sets_pragmas_on_connect(tmp_path):
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}"})
+    assert app.extensions["database_profile"] == "sqlite"
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+    plain = create_app(
+        {"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'plain.db'}", "DATABASE_PROFILE": "none"}
+    )
+    with plain.app_context():
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+
+
+def test_server_profile_feeds_engine_options():
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI="postgresql://db/psycare",
+        SQLALCHEMY_ENGINE_OPTIONS={"pool_size": 3},
+    )
+    DatabaseProfile(app)
+    assert app.extensions["database_profile"] == "server"
+    assert app.config["SQLALCHEMY_ENGINE_OPTIONS"] == {**SERVER_ENGINE_OPTIONS, "pool_size": 3}
+
+    app.config["DATABASE_PROFILE"] = "bogus"
+    with pytest.raises(ValueError):
+        DatabaseProfile(app)
@@ -0,0 +1,105 @@
+import json
+import threading
+
+from psycare.events import FileBackend
+
+
+def _next_event(response):
+    for chunk in response.response:
+        text = chunk.decode()
+        if text.startswith("id:"):
+            return text
+    return None
+
+
+def test_crisis_alert_reaches_stream_and_resumes(app, client, login, ids):
+    login("p@example.com")
+    client.post("/patient/crisis")
+    client.post("/auth/logout")
+
+    login("t@example.com")
+    # The dashboard's own reconnects pass the id in the query string.
+    response = client.get("/therapist/alerts/stream?last_event_id=0", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    text = _next_event(response)
+    response.close()
+
+    lines = dict(line.split(": ", 1) for line in text.strip().splitlines())
+    assert lines["event"] == "alert"
+    assert json.loads(lines["data"])["patient_id"] == ids["patient"]
+
+    # Resuming after the last seen id skips it and falls back to heartbeats.
+    app.config["EVENTS_HEARTBEAT_SECONDS"] = 0.01
+    response = client.get("/therapist/alerts/stream", headers={"Last-Event-ID": lines["id"]}, buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b"retry:")
+    assert next(chunks) == b": heartbeat\n\n"
+    response.close()
+
+
+def test_stream_requires_therapist(client, login):
+    login("p@example.com")
+    assert client.get("/therapist/alerts/stream").status_code == 403
+
+
+def test_file_backend_shares_events_between_instances(tmp_path):
+    writer = FileBackend(tmp_path / "events.log")
+    reader = FileBackend(tmp_path / "events.log", poll_interval=0.01)
+
+    start = reader.last_id()
+    first = writer.publish("therapist:1", "alert", {"n": 1})
+    writer.publish("therapist:2", "alert", {"n": 2})
+
+    events = reader.read(start, timeout=1)
+    assert [(e.channel, e.data["n"]) for e in events] == [("therapist:1", 1), ("therapist:2", 2)]
+    assert [e.data["n"] for e in reader.read(first, timeout=1)] == [2]
+    assert reader.read(events[-1].id, timeout=0.05) == []
+
+
+def test_file_backend_rotates(tmp_path):
+    backend = FileBackend(tmp_path / "events.log", max_bytes=64)
+    first = backend.publish("c", "k", {"n": 0})
+    for n in range(1, 5):
+        backend.publish("c", "k", {"n": n})
+    assert (tmp_path / "events.log.1").exists()
+    assert (tmp_path / "events.log").stat().st_size < 128
+    assert backend.last_id() > first
+
+
+def test_file_backend_ids_survive_rotation(tmp_path):
+    writer = FileBackend(tmp_path / "events.log", max_bytes=140)
+    reader = FileBackend(tmp_path / "events.log", poll_interval=0.01)
+    ids = [writer.publish("c", "k", {"n": n}) for n in range(6)]
+    assert (tmp_path / "events.log.1").exists() and ids == sorted(ids)
+
+    # A reader that stopped before the rotation finishes the rotated file, then moves on.
+    assert [e.data["n"] for e in reader.read(ids[0], timeout=1)] == [1, 2, 3, 4, 5]
+    assert [e.id for e in reader.read(ids[3], timeout=1)] == ids[4:]
+    assert reader.read(ids[-1], timeout=0.05) == []
+
+
+def test_file_backend_resyncs_from_mid_line_and_skips_bad_lines(tmp_path):
+    path = tmp_path / "events.log"
+    backend = FileBackend(path, poll_interval=0.01)
+    first = backend.publish("c", "k", {"n": 1})
+    with open(path, "ab") as fh:
+        fh.write(b"not json\n")
+    backend.publish("c", "k", {"n": 2})
+
+    assert [e.data["n"] for e in backend.read(first - 5, timeout=1)] == [2]
+    assert [e.data["n"] for e in backend.read(0, timeout=1)] == [1, 2]
+
+
+def test_streams_are_capped_per_worker(app, client, login):
+    app.config["EVENTS_HEARTBEAT_SECONDS"] = 0.01
+    app.extensions["event_streams"] = threading.BoundedSemaphore(1)
+    login("t@example.com")
+    first = client.get("/therapist/alerts/stream", buffered=False)
+    assert first.status_code == 200
+    refused = client.get("/therapist/alerts/stream")
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == "10"
+    first.close()
+    second = client.get("/therapist/alerts/stream", buffered=False)
+    assert second.status_code == 200
+    second.close()
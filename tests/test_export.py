@@ -0,0 +1,72 @@
+import csv
+import gzip
+import io
+import json
+
+from psycare import export
+from psycare.jobs import ClaimedJob, jobs
+
+
+def test_patient_export_streams_every_record(client, login):
+    login("p@example.com")
+    for rating in (3, 6, 9):
+        client.post("/patient/mood", data={"rating": rating})
+    client.post("/patient/journal/new", data={"title": "Day one", "body": "Some text"})
+    client.post("/patient/crisis")
+
+    resp = client.get("/patient/export")
+    assert resp.mimetype == "application/x-ndjson"
+    assert "attachment" in resp.headers["Content-Disposition"]
+    records = [json.loads(line) for line in resp.data.decode().splitlines()]
+    kinds = [r["record"] for r in records]
+    assert kinds == ["user", "link", "journal", "mood", "mood", "mood", "mood_day", "alert"]
+    assert [r["rating"] for r in records if r["record"] == "mood"] == [3, 6, 9]
+
+    resp = client.get("/patient/export?format=csv&gzip=1")
+    assert resp.mimetype == "application/gzip"
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(resp.data).decode())))
+    assert [r["record"] for r in rows] == kinds
+    assert rows[2]["title"] == "Day one"
+
+    assert client.get("/patient/export?format=xml").status_code == 400
+
+
+def test_export_batches_and_cli(app, client, login, ids):
+    login("p@example.com")
+    for rating in range(1, 8):
+        client.post("/patient/mood", data={"rating": rating})
+
+    with app.app_context():
+        batches = [b for b in export.iter_records(ids["patient"], batch_size=3) if b[0]["record"] == "mood"]
+    assert [len(b) for b in batches] == [3, 3, 1]
+
+    result = app.test_cli_runner().invoke(args=["export", "p@example.com", "--batch-size", "2"])
+    assert result.exit_code == 0
+    assert sum('"record": "mood"' in line for line in result.output.splitlines()) == 7
+
+    result = app.test_cli_runner().invoke(args=["export", "t@example.com"])
+    assert result.exit_code != 0
+
+
+def test_large_export_is_written_by_a_job_then_downloaded(make_app, login_as, tmp_path):
+    app = make_app(EXPORT_SYNC_MAX_ROWS=5, EXPORT_DIR=str(tmp_path / "exports"))
+    client = login_as(app, "p@example.com")
+    for rating in range(1, 6):
+        client.post("/patient/mood", data={"rating": rating})
+
+    resp = client.get("/patient/export")
+    assert resp.status_code == 302
+    assert client.get("/patient/export").status_code == 302  # still pending; not queued twice
+    assert jobs.work(app, concurrency=1, once=True) == 1
+
+    resp = client.get("/patient/export")
+    assert resp.status_code == 200
+    assert "attachment" in resp.headers["Content-Disposition"]
+    assert sum(json.loads(line)["record"] == "mood" for line in resp.data.decode().splitlines()) == 5
+    resp.close()
+
+    app.config["EXPORT_FILE_MAX_AGE"] = 0
+    with app.app_context():
+        (path,) = (tmp_path / "exports").iterdir()
+        export.expire_file(ClaimedJob(0, export.EXPIRE_FILE, {"path": str(path)}, None, 1, 1))
+    assert not path.exists()
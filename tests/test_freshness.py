@@ -0,0 +1,53 @@
+from sqlalchemy import event
+
+from psycare.extensions import db
+
+
+def _count_statements(app):
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_patient_dashboard_revalidates_until_data_changes(app, client, login):
+    login("p@example.com")
+    first = client.get("/patient/dashboard")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "private" in first.headers["Cache-Control"]
+
+    statements = _count_statements(app)
+    cached = client.get("/patient/dashboard", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert len(statements) == 1  # the data version lookup
+
+    # A plain reload re-renders the shell but reuses the cached cards.
+    statements.clear()
+    again = client.get("/patient/dashboard")
+    assert again.data == first.data
+    assert len(statements) == 1
+
+    client.post("/patient/mood", data={"rating": 4})
+    flashed = client.get("/patient/dashboard", headers={"If-None-Match": etag})
+    assert flashed.status_code == 200 and "ETag" not in flashed.headers
+
+    changed = client.get("/patient/dashboard", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_patient_write_invalidates_therapist_dashboard(client, login):
+    login("t@example.com")
+    etag = client.get("/therapist/dashboard").headers["ETag"]
+    assert client.get("/therapist/dashboard", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/auth/logout")
+
+    login("p@example.com")
+    client.post("/patient/journal/new", data={"title": "News", "body": "Some text", "shared_with_therapist": "y"})
+    client.post("/auth/logout")
+
+    login("t@example.com")
+    page = client.get("/therapist/dashboard", headers={"If-None-Match": etag})
+    assert page.status_code == 200
+    assert b"News" in page.data
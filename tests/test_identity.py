@@ -0,0 +1,49 @@
+from sqlalchemy import event
+
+from psycare.cache import TTLCache
+from psycare.extensions import db
+from psycare.identity import CachedUser, identity
+from psycare.models import User
+
+
+def test_authenticated_requests_are_served_from_cache(app, client, login):
+    login("p@example.com")
+    client.get("/")
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert client.get("/").status_code in (302, 303)
+    assert client.get("/therapist/dashboard").status_code == 403
+    assert statements == []
+
+    stats = client.get("/health").get_json()["user_cache"]
+    assert stats["hits"] >= 2
+    assert stats["misses"] >= 1
+
+
+def test_user_update_invalidates_cached_record(app, ids):
+    with app.app_context():
+        cached = identity.load(ids["patient"])
+        assert isinstance(cached, CachedUser)
+        assert identity.load(ids["patient"]) is cached
+
+        user = db.session.get(User, ids["patient"])
+        user.display_name = "Renamed"
+        db.session.commit()
+
+        assert identity.load(ids["patient"]).display_name == "Renamed"
+        assert identity.load(10_000) is None
+
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # "b" is least recently used
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 1, "size": 1, "maxsize": 2}
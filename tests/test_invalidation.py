@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from sqlalchemy import event
+
+from psycare.assignments import VERSION_KEY
+from psycare.extensions import db
+from psycare.identity import identity
+from psycare.models import User
+
+
+def _eventually(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "invalidation never arrived"
+        time.sleep(0.01)
+
+
+@pytest.fixture(params=["sqlite", "socket"])
+def workers(request, tmp_path, make_app):
+    config = {
+        "INVALIDATION_TRANSPORT": request.param,
+        "INVALIDATION_SQLITE_PATH": str(tmp_path / "bus.db"),
+        "INVALIDATION_SOCKET_DIR": str(tmp_path / "bus"),
+        "INVALIDATION_POLL_INTERVAL": 0.01,
+    }
+    first, second = make_app(**config), make_app(**config)
+    with first.app_context():
+        new = User(email="new@example.com", display_name="Newcomer", role="patient")
+        new.set_password("Password123!")
+        db.session.add(new)
+        db.session.commit()
+        therapist = User.query.filter_by(email="t@example.com").one()
+        ids = {"therapist": therapist.id, "new": new.id}
+    return first, second, ids
+
+
+def test_a_link_made_in_one_worker_reaches_the_other(workers, login_as):
+    first, second, ids = workers
+    writer, reader = login_as(first, "t@example.com"), login_as(second, "t@example.com")
+    url = f"/therapist/patients/{ids['new']}/journal"
+    assert reader.get(url).status_code == 403
+
+    writer.post("/therapist/patients", data={"patient_email": "new@example.com"})
+    state = second.extensions["invalidation_bus"]
+    _eventually(lambda: state.versions.get(VERSION_KEY) == 1)
+
+    statements = []
+    with second.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert reader.get(url).status_code == 200
+    assert not [s for s in statements if "cache_versions" in s]
+
+    metrics = reader.get("/metrics").get_data(as_text=True)
+    kind = state.kind
+    assert f'psycare_invalidation_lag_seconds_count{{transport="{kind}"}}' in metrics
+    assert f'psycare_invalidations_received_total{{transport="{kind}"}}' in metrics
+    assert reader.get("/health").json["invalidation"]["listening"] is True
+
+
+def test_identity_cache_evicts_other_workers_copy(workers, login_as):
+    first, second, ids = workers
+    login_as(second, "t@example.com").get("/therapist/dashboard")
+    cache = second.extensions["identity_cache"]
+    assert cache.get(ids["therapist"]).display_name == "Therapist"
+
+    login_as(first, "t@example.com")  # starts the first worker's transport
+    with first.app_context():
+        db.session.get(User, ids["therapist"]).display_name = "Dr. Renamed"
+        db.session.commit()
+    _eventually(lambda: cache.get(ids["therapist"]) is None)
+    with second.test_request_context():
+        assert identity.load(ids["therapist"]).display_name == "Dr. Renamed"
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+from sqlalchemy import select
+
+from psycare.extensions import db
+from psycare.jobs import DEAD, DONE, PENDING, jobs
+from psycare.models import Job
+from stubs import SMTPStub, WebhookStub
+
+
+@pytest.fixture()
+def app(make_app):
+    # Worker threads each need a connection of their own, which sqlite:// cannot give them.
+    return make_app()
+
+
+@pytest.fixture()
+def webhook():
+    stub = WebhookStub()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture()
+def smtp():
+    stub = SMTPStub()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture()
+def delivery(app, webhook, smtp):
+    app.config.update(
+        ALERT_WEBHOOK_URL=webhook.url,
+        SMTP_HOST=smtp.host,
+        SMTP_PORT=smtp.port,
+        ALERT_EMAIL_FROM="alerts@example.com",
+        JOB_BACKOFF_SECONDS=0,
+        JOB_POLL_SECONDS=0.05,
+    )
+    return webhook, smtp
+
+
+def _jobs(app):
+    with app.app_context():
+        return db.session.execute(select(Job.kind, Job.status, Job.attempts, Job.last_error).order_by(Job.id)).all()
+
+
+def test_panic_returns_before_slow_delivery(app, client, login, delivery):
+    webhook, smtp = delivery
+    login("p@example.com")
+
+    # The request only queues the deliveries; nothing is sent until a worker runs.
+    resp = client.post("/patient/crisis")
+    assert resp.status_code == 302
+    assert [(kind, status) for kind, status, *_ in _jobs(app)] == [("alert.webhook", PENDING), ("alert.email", PENDING)]
+    assert webhook.requests == [] and smtp.messages == []
+
+    assert jobs.work(app, concurrency=2, once=True) == 2
+    assert [status for _, status, *_ in _jobs(app)] == [DONE, DONE]
+
+    (hook,) = webhook.requests
+    assert hook["json"]["patient_name"] == "Patient"
+    assert hook["headers"]["Idempotency-Key"] == f"alert.webhook:{hook['json']['alert_id']}"
+    (mail,) = smtp.messages
+    assert mail["To"] == "t@example.com"
+    assert "Patient" in mail["Subject"]
+
+
+def test_failed_delivery_retries_then_dead_letters(app, client, login, delivery):
+    webhook, _ = delivery
+    webhook.statuses = [500, 200]
+    app.config.update(SMTP_HOST="")
+    login("p@example.com")
+    client.post("/patient/crisis")
+    jobs.work(app, concurrency=1, once=True)
+    assert _jobs(app) == [("alert.webhook", DONE, 2, None)]
+
+    webhook.statuses = [503]
+    app.config["JOB_MAX_ATTEMPTS"] = 3
+    client.post("/patient/crisis")
+    jobs.work(app, concurrency=1, once=True)
+    kind, status, attempts, error = _jobs(app)[-1]
+    assert (status, attempts) == (DEAD, 3)
+    assert "503" in error
+
+    # A 4xx will not get better; it is dead-lettered without retries.
+    webhook.statuses = [410]
+    client.post("/patient/crisis")
+    jobs.work(app, concurrency=1, once=True)
+    assert _jobs(app)[-1][1:3] == (DEAD, 1)
+
+    runner = app.test_cli_runner()
+    assert "alert.webhook" in runner.invoke(args=["jobs", "dead"]).output
+    assert "Requeued 2 jobs" in runner.invoke(args=["jobs", "retry", "--all-dead"]).output
+
+
+def test_idempotency_key_and_concurrent_workers(app, delivery):
+    webhook, _ = delivery
+    webhook.delay = 0.5
+    with app.app_context():
+        for i in range(4):
+            jobs.enqueue("alert.webhook", {"n": i}, key=f"test:{i}")
+        jobs.enqueue("alert.webhook", {"n": 0}, key="test:0")
+        db.session.commit()
+
+    started = time.perf_counter()
+    assert jobs.work(app, concurrency=4, once=True) == 4
+    # One at a time would take 2 s; overlapping deliveries finish well inside that.
+    assert time.perf_counter() - started < 4 * webhook.delay
+    assert sorted(r["json"]["n"] for r in webhook.requests) == [0, 1, 2, 3]
+
+
+def test_expired_lease_is_reclaimed(app, delivery):
+    with app.app_context():
+        jobs.enqueue("alert.webhook", {"n": 1})
+        db.session.commit()
+        assert len(jobs.claim("crashed-worker", 10)) == 1
+        assert jobs.claim("other", 10) == []
+
+        app.config["JOB_LEASE_SECONDS"] = 0
+        (job,) = jobs.claim("other", 10)
+        assert job.attempts == 2
+        assert jobs.run(job, "other") == DONE
@@ -0,0 +1,128 @@
+import json
+
+from sqlalchemy import create_engine, event, select, text
+
+from psycare import migrations, search
+from psycare.extensions import db
+from psycare.models import COMPRESS_MIN_BYTES, EXCERPT_LENGTH, JournalEntry, make_excerpt, utc_now
+
+LONG = "Started the morning anxious about the appointment. " + "walked to the park and back again " * 200
+
+
+def test_make_excerpt_cuts_on_a_word():
+    assert make_excerpt("  short\n\n entry ") == "short entry"
+    excerpt = make_excerpt(LONG)
+    assert len(excerpt) <= EXCERPT_LENGTH and excerpt.endswith("…")
+    assert LONG.startswith(excerpt[:-1]) and not excerpt[:-1].endswith(" ")
+
+
+def test_list_views_leave_bodies_behind(app, client, login, ids):
+    with app.app_context():
+        for i in range(3):
+            db.session.add(JournalEntry(patient_id=ids["patient"], title=f"Entry {i}", body=f"body {i}",
+                                        shared_with_therapist=True))
+        db.session.commit()
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    login("p@example.com")
+    for url in ("/patient/dashboard", "/patient/journal"):
+        assert client.get(url).status_code == 200
+    client.post("/auth/logout")
+    login("t@example.com")
+    for url in ("/therapist/dashboard", f"/therapist/patients/{ids['patient']}/journal"):
+        assert client.get(url).status_code == 200
+
+    journal_reads = [s for s in statements if s.startswith("SELECT") and "FROM journal_entries" in s]
+    assert journal_reads
+    assert not [s for s in journal_reads if "journal_entries.body" in s]
+
+
+def test_large_bodies_are_compressed_but_searchable_and_readable(app, client, login, ids):
+    login("p@example.com")
+    client.post("/patient/journal/new", data={"title": "Long day", "body": LONG, "shared_with_therapist": "y"})
+    with app.app_context():
+        row = db.session.execute(select(JournalEntry.__table__)).one()
+        assert row.body == "" and len(row.body_z) < COMPRESS_MIN_BYTES / 10
+        assert row.excerpt == make_excerpt(LONG)
+        entry_id = row.id
+
+    assert "Long day" in client.get("/patient/journal/search?q=park").get_data(as_text=True)
+    assert "walked to the park and back again walked" in client.get(
+        f"/patient/journal/{entry_id}/edit").get_data(as_text=True)
+    records = [json.loads(line) for line in client.get("/patient/export").get_data(as_text=True).splitlines()]
+    assert [r["body"] for r in records if r["record"] == "journal"] == [LONG.strip()]
+    assert not [r for r in records if "body_z" in r]
+    token = client.post("/api/v1/tokens", json={"email": "p@example.com", "password": "Password123!"}).json["token"]
+    api = client.get("/api/v1/journal?fields=title,body", headers={"Authorization": f"Bearer {token}"}).json
+    assert api["data"] == [{"title": "Long day", "body": LONG.strip()}]
+
+    # Sharing toggles re-fire the FTS triggers, which read compressed bodies too.
+    client.post(f"/patient/journal/{entry_id}/edit", data={"title": "Long day", "body": LONG})
+    assert "Long day" in client.get("/patient/journal/search?q=park").get_data(as_text=True)
+    client.post(f"/patient/journal/{entry_id}/edit", data={"title": "Long day", "body": LONG,
+                                                          "shared_with_therapist": "y"})
+
+    client.post("/auth/logout")
+    login("t@example.com")
+    page = client.get(f"/therapist/patients/{ids['patient']}/journal").get_data(as_text=True)
+    assert make_excerpt(LONG) in page and LONG.strip() not in page
+    assert LONG.strip() in client.get(f"/therapist/patients/{ids['patient']}/journal/{entry_id}").get_data(
+        as_text=True)
+    assert "Long day" in client.get(
+        f"/therapist/patients/{ids['patient']}/journal/search?q=park").get_data(as_text=True)
+
+
+def test_search_index_keeps_no_copy_of_the_text(app, client, login):
+    login("p@example.com")
+    client.post("/patient/journal/new", data={"title": "Long day", "body": LONG})
+    with app.app_context():
+        names = db.session.execute(text("SELECT name FROM sqlite_master WHERE name LIKE 'journal_fts%'")).scalars()
+        assert "journal_fts_content" not in set(names)
+        entry_id = db.session.execute(select(JournalEntry.id)).scalar_one()
+
+    def found(term):
+        return "Long day" in client.get(f"/patient/journal/search?q={term}").get_data(as_text=True)
+
+    assert found("park")
+    client.post(f"/patient/journal/{entry_id}/edit", data={"title": "Long day", "body": LONG.replace("park", "river")})
+    assert not found("park") and found("river")
+    client.post(f"/patient/journal/{entry_id}/delete")
+    assert not found("river")
+
+
+def test_unshared_entries_have_no_detail_view_for_therapists(app, client, login, ids):
+    with app.app_context():
+        entry = JournalEntry(patient_id=ids["patient"], title="Private", body="mine", shared_with_therapist=False)
+        db.session.add(entry)
+        db.session.commit()
+        entry_id = entry.id
+    login("t@example.com")
+    assert client.get(f"/therapist/patients/{ids['patient']}/journal/{entry_id}").status_code == 404
+    assert client.get(f"/therapist/patients/{ids['patient'] + 1}/journal/{entry_id}").status_code == 403
+
+
+def test_upgrade_backfills_excerpts_and_compresses_large_bodies(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    db.metadata.create_all(engine)
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        # Rewind to the schema before migration 8.
+        search.drop_fts(conn)
+        conn.execute(text("ALTER TABLE journal_entries DROP COLUMN excerpt"))
+        conn.execute(text("ALTER TABLE journal_entries DROP COLUMN body_z"))
+        search.install_fts(conn, legacy=True)
+        conn.execute(migrations.schema_migrations.delete().where(migrations.schema_migrations.c.version >= 8))
+        now = utc_now()
+        conn.execute(text(
+            "INSERT INTO journal_entries (patient_id, title, body, shared_with_therapist, flagged_risk, "
+            "created_at, updated_at) VALUES (1, :title, :body, 1, 0, :now, :now)"
+        ), [{"title": "Short", "body": "a quick note", "now": now}, {"title": "Long", "body": LONG, "now": now}])
+
+    assert migrations.upgrade(engine) == [8, 9]
+    with engine.begin() as conn:
+        rows = conn.execute(select(JournalEntry.__table__).order_by(JournalEntry.id)).all()
+        assert [(r.excerpt, r.body, r.body_z) for r in rows[:1]] == [("a quick note", "a quick note", None)]
+        assert rows[1].excerpt == make_excerpt(LONG) and rows[1].body == "" and rows[1].body_z
+        hits = conn.execute(text("SELECT rowid FROM journal_fts WHERE journal_fts MATCH 'park'")).scalars().all()
+        assert hits == [rows[1].id]
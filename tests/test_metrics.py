@@ -0,0 +1,60 @@
+import logging
+
+from psycare.metrics import Histogram
+
+
+def _sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} not found in metrics output")
+
+
+def test_requests_record_latency_sql_and_templates(client, login):
+    login("p@example.com")
+    assert client.get("/patient/dashboard").status_code == 200
+    client.get("/no-such-page")
+
+    body = client.get("/metrics")
+    assert body.status_code == 200
+    assert body.content_type.startswith("text/plain; version=0.0.4")
+    text = body.get_data(as_text=True)
+
+    dashboard = 'endpoint="patient.dashboard",method="GET"'
+    assert _sample(text, f'psycare_requests_total{{{dashboard},status="200"}}') == 1
+    assert _sample(text, f"psycare_request_duration_seconds_count{{{dashboard}}}") == 1
+    assert _sample(text, f"psycare_request_sql_statements_sum{{{dashboard}}}") >= 1
+    assert _sample(text, f"psycare_request_template_seconds_sum{{{dashboard}}}") > 0
+    assert _sample(text, 'psycare_requests_total{endpoint="<unmatched>",method="GET",status="404"}') == 1
+    assert _sample(text, 'psycare_password_hash_seconds_count{op="verify"}') == 1
+
+
+def test_metrics_token(app, client):
+    app.config["METRICS_TOKEN"] = "scrape-secret"
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+
+def test_slow_request_log_lists_queries(app, client, login, caplog):
+    client.get("/health")
+    assert not [r for r in caplog.records if "slow request" in r.getMessage()]
+
+    app.config["SLOW_REQUEST_MS"] = 0.001
+    login("p@example.com")
+    with caplog.at_level(logging.WARNING):
+        client.get("/patient/mood")
+    logged = [r.getMessage() for r in caplog.records if "slow request" in r.getMessage()]
+    assert logged and "patient.mood" in logged[-1]
+    assert "SELECT" in logged[-1]
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("h", "help", (1, 5), ("k",))
+    for value in (0.5, 3, 3, 9):
+        hist.observe(value, 'a"b')
+    lines = hist.render()
+    assert 'h_bucket{k="a\\"b",le="1"} 1' in lines
+    assert 'h_bucket{k="a\\"b",le="5"} 3' in lines
+    assert 'h_bucket{k="a\\"b",le="+Inf"} 4' in lines
+    assert 'h_sum{k="a\\"b"} 15.5' in lines
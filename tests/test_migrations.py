@@ -0,0 +1,167 @@
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, inspect
+from werkzeug.security import generate_password_hash
+
+from psycare import create_app, migrations
+from psycare.extensions import db
+
+HOT_TABLES = ("journal_entries", "mood_entries", "alerts", "resources", "patient_therapists")
+
+
+# The schema create_all produced before versioned migrations existed.
+BASELINE_DDL = """
+CREATE TABLE users (
+    id INTEGER NOT NULL, email VARCHAR(255) NOT NULL, password_hash VARCHAR(255) NOT NULL,
+    role VARCHAR(32) NOT NULL, display_name VARCHAR(120) NOT NULL, created_at DATETIME NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE patient_therapists (
+    id INTEGER NOT NULL, patient_id INTEGER NOT NULL, therapist_id INTEGER NOT NULL, created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT uq_patient_therapist UNIQUE (patient_id, therapist_id),
+    FOREIGN KEY(patient_id) REFERENCES users (id),
+    FOREIGN KEY(therapist_id) REFERENCES users (id)
+);
+CREATE INDEX ix_patient_therapists_therapist_id ON patient_therapists (therapist_id);
+CREATE INDEX ix_patient_therapists_patient_id ON patient_therapists (patient_id);
+CREATE TABLE journal_entries (
+    id INTEGER NOT NULL, patient_id INTEGER NOT NULL, title VARCHAR(200) NOT NULL, body TEXT NOT NULL,
+    shared_with_therapist BOOLEAN NOT NULL, flagged_risk BOOLEAN NOT NULL,
+    created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(patient_id) REFERENCES users (id)
+);
+CREATE INDEX ix_journal_entries_patient_id ON journal_entries (patient_id);
+CREATE TABLE mood_entries (
+    id INTEGER NOT NULL, patient_id INTEGER NOT NULL, rating INTEGER NOT NULL, note VARCHAR(500) NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(patient_id) REFERENCES users (id)
+);
+CREATE INDEX ix_mood_entries_patient_id ON mood_entries (patient_id);
+CREATE TABLE alerts (
+    id INTEGER NOT NULL, patient_id INTEGER NOT NULL, therapist_id INTEGER, kind VARCHAR(50) NOT NULL,
+    message VARCHAR(500) NOT NULL, resolved BOOLEAN NOT NULL, created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(patient_id) REFERENCES users (id),
+    FOREIGN KEY(therapist_id) REFERENCES users (id)
+);
+CREATE INDEX ix_alerts_patient_id ON alerts (patient_id);
+CREATE INDEX ix_alerts_therapist_id ON alerts (therapist_id);
+CREATE TABLE resources (
+    id INTEGER NOT NULL, therapist_id INTEGER NOT NULL, title VARCHAR(200) NOT NULL, url VARCHAR(500) NOT NULL,
+    description VARCHAR(500) NOT NULL, created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(therapist_id) REFERENCES users (id)
+);
+CREATE INDEX ix_resources_therapist_id ON resources (therapist_id);
+"""
+
+
+def test_upgrade_from_the_baseline_schema(tmp_path):
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_DDL)
+        now = datetime(2024, 5, 1, 9, 30).isoformat(" ")
+        password = generate_password_hash("Password123!")
+        conn.executemany(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)",
+            [(1, "t@example.com", password, "therapist", "Therapist", now),
+             (2, "p@example.com", password, "patient", "Patient", now)],
+        )
+        conn.execute("INSERT INTO patient_therapists VALUES (1, 2, 1, ?)", (now,))
+        conn.execute("INSERT INTO journal_entries VALUES (1, 2, 'Old entry', 'walked to the park', 1, 0, ?, ?)",
+                     (now, now))
+        conn.executemany("INSERT INTO mood_entries VALUES (?, 2, ?, '', ?)", [(1, 4, now), (2, 8, now)])
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    assert migrations.upgrade(engine) == [1, 2, 3, 4, 5, 6, 7, 8, 9]
+    assert migrations.upgrade(engine) == []
+
+    names = {i["name"] for i in inspect(engine).get_indexes("journal_entries")}
+    assert "ix_journal_entries_patient_created" in names
+    assert "ix_journal_entries_patient_shared_created" in names
+    assert "ix_journal_entries_patient_id" not in names
+    engine.dispose()
+
+    app = create_app({"TESTING": True, "WTF_CSRF_ENABLED": False, "SECRET_KEY": "test",
+                      "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    client = app.test_client()
+    client.post("/auth/login", data={"email": "p@example.com", "password": "Password123!"})
+    assert "Old entry" in client.get("/patient/journal").get_data(as_text=True)
+    assert "Old entry" in client.get("/patient/journal/search?q=park").get_data(as_text=True)
+    assert client.get("/patient/mood/stats").get_json()["count"] == 2
+    client.post("/auth/logout")
+    client.post("/auth/login", data={"email": "t@example.com", "password": "Password123!"})
+    assert "Patient" in client.get("/therapist/dashboard").get_data(as_text=True)
+    assert "Old entry" in client.get("/therapist/patients/2/journal").get_data(as_text=True)
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_create_app_leaves_schema_to_the_cli(tmp_path):
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}"})
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+
+    result = app.test_cli_runner().invoke(args=["db", "upgrade"])
+    assert result.exit_code == 0
+    with app.app_context():
+        assert "journal_entries" in inspect(db.engine).get_table_names()
+        assert migrations.upgrade() == []
+
+
+def test_worker_boot_does_not_import_numpy(tmp_path):
+    probe = (
+        "import sys; from psycare import create_app; "
+        f"app = create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite:///{tmp_path / 'app.db'}'}}); "
+        "assert app.test_client().get('/auth/login').status_code == 200; "
+        "assert 'numpy' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", probe], check=True, cwd=Path(__file__).resolve().parent.parent)
+
+
+def test_route_queries_use_indexes(app, client, login, ids):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", capture)
+
+    login("t@example.com")
+    for url in (
+        "/therapist/dashboard",
+        "/therapist/resources",
+        f"/therapist/patients/{ids['patient']}/journal",
+        f"/therapist/patients/{ids['patient']}/mood",
+    ):
+        assert client.get(url).status_code == 200
+    client.post("/auth/logout")
+    login("p@example.com")
+    for url in ("/patient/dashboard", "/patient/journal", "/patient/mood", "/patient/resources", "/patient/crisis"):
+        assert client.get(url).status_code == 200
+
+    with app.app_context():
+        conn = db.session.connection()
+        checked = 0
+        for statement, parameters in statements:
+            tables = [t for t in HOT_TABLES if f"FROM {t}" in statement]
+            if not tables:
+                continue
+            plan = [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+            assert any(f"SEARCH {tables[0]} USING" in step for step in plan), (statement, plan)
+            assert not any(step.startswith("SCAN") for step in plan), (statement, plan)
+            if " IN (" not in statement:
+                assert not any("TEMP B-TREE" in step for step in plan), (statement, plan)
+            checked += 1
+    assert checked >= 8
@@ -0,0 +1,79 @@
+import threading
+from datetime import timedelta
+
+from sqlalchemy import text
+
+from psycare import mood_stats
+from psycare.extensions import db
+from psycare.models import MoodEntry, utc_now
+
+
+def test_checkins_update_stats_incrementally(app, client, login, ids):
+    login("p@example.com")
+    for rating in (2, 4, 9):
+        client.post("/patient/mood", data={"rating": rating})
+
+    stats = client.get("/patient/mood/stats").get_json()
+    assert stats["count"] == 3
+    assert stats["mean"] == 5.0
+    assert stats["stddev"] == 2.94
+    assert stats["mean_7d"] == 5.0
+    assert stats["recent"] == [2, 4, 9]
+    assert stats["last_rating"] == 9
+
+    client.post("/auth/logout")
+    login("t@example.com")
+    assert client.get(f"/therapist/patients/{ids['patient']}/mood/stats").get_json() == stats
+
+
+def test_rebuild_matches_history_and_rolling_windows(app, ids):
+    now = utc_now()
+    with app.app_context():
+        db.session.add_all(
+            [
+                MoodEntry(patient_id=ids["patient"], rating=8, created_at=now - timedelta(days=1)),
+                MoodEntry(patient_id=ids["patient"], rating=6, created_at=now - timedelta(days=2)),
+                MoodEntry(patient_id=ids["patient"], rating=1, created_at=now - timedelta(days=20)),
+                MoodEntry(patient_id=ids["patient"], rating=3, created_at=now - timedelta(days=90)),
+            ]
+        )
+        db.session.commit()
+        with db.engine.begin() as conn:
+            mood_stats.rebuild(conn)
+
+        stats = mood_stats.stats_for(ids["patient"], today=now.date())
+        assert stats["count"] == 4
+        assert stats["mean_7d"] == 7.0
+        assert stats["mean_30d"] == 5.0
+        assert stats["recent"] == [3, 1, 6, 8]
+
+        # Migration 3 rebuilds before migration 7 has created the weekly rollups.
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE mood_weekly"))
+            mood_stats.rebuild(conn)
+        assert mood_stats.stats_for(ids["patient"], today=now.date())["count"] == 4
+
+
+def test_concurrent_first_checkins_all_count(make_app, login_as):
+    app = make_app()
+    clients = [login_as(app, "p@example.com") for _ in range(6)]
+    barrier = threading.Barrier(len(clients))
+    statuses = []
+
+    def check_in(client, rating):
+        barrier.wait()
+        statuses.append(client.post("/patient/mood", data={"rating": rating}).status_code)
+
+    threads = [threading.Thread(target=check_in, args=(c, r)) for r, c in enumerate(clients, start=1)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert statuses == [302] * len(clients)
+    with app.app_context():
+        stats = mood_stats.stats_for(db.session.scalar(text("SELECT id FROM users WHERE email = 'p@example.com'")))
+        daily = db.session.execute(text("SELECT count, total, min_rating, max_rating FROM mood_daily")).one()
+    assert (stats["count"], stats["mean"]) == (6, 3.5)
+    assert sorted(stats["recent"]) == [1, 2, 3, 4, 5, 6]
+    assert tuple(daily) == (6, 21, 1, 6)
@@ -0,0 +1,82 @@
+import io
+
+import pytest
+from sqlalchemy import event
+
+from psycare import onboarding
+from psycare.extensions import db
+from psycare.models import PatientSummary, User
+
+
+def _add_users(app, *users):
+    with app.app_context():
+        for email, role in users:
+            db.session.add(User(email=email, display_name=email.split("@")[0], role=role, password_hash="x"))
+        db.session.commit()
+
+
+def test_parse_emails_accepts_text_and_csv():
+    assert onboarding.parse_emails("a@x.io, b@x.io\nc@x.io;d@x.io") == ["a@x.io", "b@x.io", "c@x.io", "d@x.io"]
+    assert onboarding.parse_emails("name,Email\nAnn,a@x.io\nBob,b@x.io\n") == ["a@x.io", "b@x.io"]
+
+
+def test_bulk_assign_reports_each_row_in_few_statements(app, client, login, ids):
+    _add_users(app, ("new1@example.com", "patient"), ("new2@example.com", "patient"), ("t2@example.com", "therapist"))
+    login("t@example.com")
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    csv_body = b"email\nNEW2@example.com\nnobody@example.com\n"
+    page = client.post(
+        "/therapist/patients/bulk",
+        data={
+            "emails": "new1@example.com\np@example.com\nt2@example.com\nnot-an-email\nnew1@example.com",
+            "csv_file": (io.BytesIO(csv_body), "patients.csv"),
+        },
+        content_type="multipart/form-data",
+    )
+    assert page.status_code == 200
+    # user loader, email lookup, link insert, summary insert + refresh, two version bumps
+    assert len(statements) <= 7
+
+    with app.app_context():
+        results = onboarding.bulk_assign(ids["therapist"], ["new1@example.com", "x"])
+        db.session.rollback()
+        linked = {s.email for s in PatientSummary.query.filter_by(therapist_id=ids["therapist"])}
+    assert [r.status for r in results] == [onboarding.ALREADY_LINKED, onboarding.INVALID]
+    assert linked == {"p@example.com", "new1@example.com", "new2@example.com"}
+
+    body = page.data.decode()
+    for status in ("linked", "already linked", "not a patient", "invalid email", "duplicate", "not found"):
+        assert f">{status}<" in body
+
+
+def test_oversized_upload_is_refused_before_parsing(app, client, login, monkeypatch):
+    login("t@example.com")
+    monkeypatch.setattr(onboarding, "parse_emails", lambda text: pytest.fail("parsed an oversized upload"))
+    csv_body = b"email\n" + b"someone@example.com\n" * (onboarding.MAX_UPLOAD_BYTES // 20 + 1)
+    page = client.post(
+        "/therapist/patients/bulk",
+        data={"csv_file": (io.BytesIO(csv_body), "patients.csv")},
+        content_type="multipart/form-data",
+    )
+    assert page.status_code == 413
+
+    app.config["MAX_CONTENT_LENGTH"] = 1024
+    page = client.post(
+        "/therapist/patients/bulk",
+        data={"csv_file": (io.BytesIO(b"x" * 2048), "patients.csv")},
+        content_type="multipart/form-data",
+    )
+    assert page.status_code == 413
+
+
+def test_assign_patients_cli(app, ids):
+    _add_users(app, ("new1@example.com", "patient"))
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["assign-patients", "t@example.com"], input="new1@example.com\np@example.com\n")
+    assert result.exit_code == 0
+    assert result.output.splitlines()[1:] == ["1,new1@example.com,linked", "2,p@example.com,already linked"]
+
+    assert runner.invoke(args=["assign-patients", "p@example.com"], input="").exit_code != 0
@@ -0,0 +1,78 @@
+import base64
+import json
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from psycare.extensions import db
+from psycare.models import JournalEntry
+from psycare.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture()
+def journal(app, ids):
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    with app.app_context():
+        # Pairs of entries share a timestamp so the id tie-breaker is exercised.
+        db.session.add_all(
+            JournalEntry(
+                patient_id=ids["patient"],
+                title=f"Entry {i:02d}",
+                body="text",
+                created_at=base + timedelta(minutes=i // 2),
+            )
+            for i in range(25)
+        )
+        db.session.commit()
+
+
+def _titles(data: bytes) -> list[str]:
+    return re.findall(r"Entry \d\d", data.decode())
+
+
+def _link(data: bytes, label: str) -> str | None:
+    m = re.search(r'href="([^"#]+)">' + re.escape(label), data.decode())
+    return m.group(1).replace("&amp;", "&") if m else None
+
+
+def test_cursor_roundtrip():
+    ts = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_cursor(encode_cursor(ts, 42, "next")) == ("next", ts, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.parametrize("payload", [["next", 1, 2], ["next", "garbage", 1], ["prev", "2024-01-01", "3"],
+                                     ["next", None, 1], ["next", "2024-01-01", True], {"a": 1}, [1, 2]])
+def test_well_encoded_cursor_with_wrong_types_is_rejected(client, login, journal, payload):
+    token = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+    with pytest.raises(ValueError, match="invalid cursor"):
+        decode_cursor(token)
+    login("p@example.com")
+    assert client.get(f"/patient/journal?cursor={token}").status_code == 400
+
+
+def test_journal_list_walks_pages_both_ways(client, login, journal):
+    login("p@example.com")
+
+    r = client.get("/patient/journal?per_page=10")
+    first = _titles(r.data)
+    assert first == [f"Entry {i:02d}" for i in range(24, 14, -1)]
+    assert _link(r.data, "&laquo; Newer") is None
+
+    seen = list(first)
+    url = _link(r.data, "Older &raquo;")
+    while url:
+        r = client.get(url)
+        seen += _titles(r.data)
+        url = _link(r.data, "Older &raquo;")
+    assert seen == [f"Entry {i:02d}" for i in range(24, -1, -1)]
+
+    back = client.get(_link(r.data, "&laquo; Newer"))
+    assert _titles(back.data) == [f"Entry {i:02d}" for i in range(14, 4, -1)]
+
+
+def test_invalid_cursor_is_rejected(client, login, journal):
+    login("p@example.com")
+    assert client.get("/patient/journal?cursor=garbage").status_code == 400
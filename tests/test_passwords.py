@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from psycare import passwords
+from psycare.extensions import db
+from psycare.models import User
+from psycare.passwords import HashPool, HashPoolBusy, HashPoolTimeout
+from psycare.ratelimit import TokenBucketLimiter
+
+
+@pytest.fixture()
+def app(make_app):
+    app = make_app(PASSWORD_HASH_METHOD="pbkdf2:sha256:1000", LOGIN_RATE_LIMIT_EMAIL="3/60")
+    with app.app_context():
+        user = User(email="old@example.com", display_name="Old", role="patient")
+        user.password_hash = generate_password_hash("Password123!", method="pbkdf2:sha256:500")
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+@pytest.mark.parametrize("path", ["form", "token"])
+def test_login_rehashes_with_configured_parameters(app, client, login, path):
+    if path == "form":
+        assert login("old@example.com").status_code in (302, 303)
+    else:
+        resp = client.post("/api/v1/tokens", json={"email": "old@example.com", "password": "Password123!"})
+        assert resp.status_code == 201
+    with app.app_context():
+        user = User.query.filter_by(email="old@example.com").one()
+        assert user.password_hash.startswith("pbkdf2:sha256:1000$")
+        assert not user.password_needs_rehash()
+
+
+def test_login_is_rate_limited_per_email_before_hashing(login):
+    assert [login("old@example.com", "wrong-password").status_code for _ in range(3)] == [401, 401, 401]
+    assert login("old@example.com").status_code == 429
+
+
+def test_hash_pool_sheds_beyond_queue_depth():
+    pool = HashPool(workers=1, queue_depth=0, timeout=5)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return "done"
+
+    worker = threading.Thread(target=pool.run, args=(slow,))
+    worker.start()
+    started.wait()
+    with pytest.raises(HashPoolBusy):
+        pool.run(lambda: None)
+    release.set()
+    worker.join()
+    assert pool.run(lambda: "free again") == "free again"
+    pool.shutdown()
+
+
+def test_hash_timeout_is_reported_as_busy(app, client, login, monkeypatch):
+    release = threading.Event()
+    pool = HashPool(workers=1, queue_depth=1, timeout=0.05)
+
+    def occupy():
+        with pytest.raises(HashPoolTimeout):
+            pool.run(release.wait)
+
+    blocker = threading.Thread(target=occupy)
+    blocker.start()
+    # The only thread is busy, so this job times out in the queue and hands its slot back.
+    with pytest.raises(HashPoolTimeout):
+        pool.run(lambda: None)
+    release.set()
+    blocker.join()
+    assert pool.run(lambda: "ok") == "ok"
+    pool.shutdown()
+
+    def slowly(fn):
+        return lambda *args: time.sleep(0.1) or fn(*args)
+
+    monkeypatch.setattr(passwords, "check_password_hash", slowly(passwords.check_password_hash))
+    monkeypatch.setattr(passwords, "generate_password_hash", slowly(passwords.generate_password_hash))
+    app.extensions["password_pool"] = HashPool(workers=4, queue_depth=0, timeout=0.01)
+    assert login("old@example.com").status_code == 503
+    resp = client.post("/api/v1/tokens", json={"email": "old@example.com", "password": "Password123!"})
+    assert resp.status_code == 503
+    resp = client.post("/auth/register", data={"email": "n@example.com", "display_name": "New",
+                                               "password": "Password123!", "confirm_password": "Password123!"})
+    assert resp.status_code == 503
+    app.extensions["password_pool"].shutdown()
+
+
+def test_token_bucket_refills():
+    now = [0.0]
+    limiter = TokenBucketLimiter(capacity=2, refill_per_second=1, clock=lambda: now[0])
+    assert limiter.allow("k") and limiter.allow("k")
+    assert not limiter.allow("k")
+    now[0] = 1.0
+    assert limiter.allow("k")
+
+
+def test_ip_bucket_keys_on_forwarded_client_behind_trusted_proxy(make_app):
+    app = make_app("proxied.db", LOGIN_RATE_LIMIT_IP="2/60", LOGIN_RATE_LIMIT_EMAIL="", TRUSTED_PROXIES=1)
+    client = app.test_client()
+
+    def attempt(ip):
+        return client.post("/auth/login", data={"email": "t@example.com", "password": "wrong-password"},
+                           headers={"X-Forwarded-For": ip}).status_code
+
+    assert [attempt("203.0.113.1") for _ in range(3)] == [401, 401, 429]
+    assert attempt("203.0.113.2") == 401
@@ -0,0 +1,109 @@
+import json
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func, select
+
+from psycare import mood_stats, retention, versions
+from psycare.extensions import db
+from psycare.freshness import user_key
+from psycare.models import JournalArchive, JournalEntry, MoodDaily, MoodEntry, MoodWeekly, utc_now
+
+TODAY = utc_now().date()
+
+
+def _at(days_ago: int) -> datetime:
+    return datetime.combine(TODAY - timedelta(days=days_ago), time(12))
+
+
+def _history(app, ids):
+    app.config.update(
+        RETENTION_MOOD_DAYS=30,
+        RETENTION_MOOD_DAILY_DAYS=60,
+        RETENTION_JOURNAL_DAYS=30,
+        RETENTION_KEEP_RECENT=2,
+        RETENTION_BATCH_SIZE=2,
+    )
+    patient = ids["patient"]
+    with app.app_context():
+        for days_ago, rating in ((1, 8), (2, 6), (40, 3), (41, 5), (100, 2), (101, 4), (200, 9)):
+            db.session.add(MoodEntry(patient_id=patient, rating=rating, created_at=_at(days_ago)))
+        for days_ago, title, shared in ((1, "Fresh", True), (2, "Recent", False), (50, "Old shared", True),
+                                        (60, "Old private", False)):
+            db.session.add(JournalEntry(patient_id=patient, title=title, body=f"{title} zebra " * 50,
+                                        shared_with_therapist=shared, created_at=_at(days_ago),
+                                        updated_at=_at(days_ago)))
+        db.session.commit()
+        with db.engine.begin() as conn:
+            mood_stats.rebuild(conn)
+
+
+def test_retention_rolls_up_moods_without_changing_stats(app, ids):
+    _history(app, ids)
+    patient = ids["patient"]
+    with app.app_context():
+        before = mood_stats.stats_for(patient)
+        result = retention.run(TODAY)
+        assert (result.moods_deleted, result.days_compacted, result.journals_archived) == (5, 3, 2)
+        assert retention.run(TODAY) == retention.RetentionResult()
+
+        assert db.session.scalars(select(MoodEntry.rating).order_by(MoodEntry.created_at)).all() == [6, 8]
+        assert db.session.scalar(select(func.sum(MoodWeekly.count))) == 3
+        assert db.session.scalar(select(func.count()).select_from(MoodDaily)) == 4
+        assert mood_stats.stats_for(patient) == before
+
+        points = mood_stats.history(patient, mood_stats.history_since(365))
+        assert sum(p.count for p in points) == 7
+        assert [p.resolution for p in points][-4:] == ["day", "day", "entry", "entry"]
+        assert {p.resolution for p in points[:-4]} == {"week"}
+        assert [p.count for p in mood_stats.history(patient, mood_stats.history_since(30))] == [1, 1]
+
+        # A rebuild from what is left of mood_entries keeps the retired history; only the
+        # recent ring is limited to the kept check-ins (RETENTION_KEEP_RECENT defaults to its size).
+        with db.engine.begin() as conn:
+            mood_stats.rebuild(conn)
+        assert mood_stats.stats_for(patient) == {**before, "recent": [6, 8]}
+
+
+def test_archived_journal_entries_stay_readable(app, client, login, ids):
+    _history(app, ids)
+    with app.app_context():
+        retention.run(TODAY)
+        archived = db.session.scalars(select(JournalArchive).order_by(JournalArchive.created_at)).all()
+        assert [e.title for e in archived] == ["Old private", "Old shared"]
+        assert archived[1].body == "Old shared zebra " * 50
+        assert len(archived[1].body_z) < len(archived[1].body) / 5
+        assert db.session.scalar(select(func.count()).select_from(JournalEntry)) == 2
+
+    login("p@example.com")
+    page = client.get("/patient/journal/archive").get_data(as_text=True)
+    assert "Old private" in page and "Old shared zebra" in page
+    hits = client.get("/patient/journal/search?q=zebra").get_data(as_text=True)
+    assert "Fresh" in hits and "Old shared" not in hits
+    records = [json.loads(line) for line in client.get("/patient/export").get_data(as_text=True).splitlines()]
+    bodies = [r["body"] for r in records if r["record"] == "journal"]
+    assert len(bodies) == 4 and "Old shared zebra " * 50 in bodies
+    assert {r["record"] for r in records} >= {"mood_day", "mood_week"}
+
+    client.post("/auth/logout")
+    login("t@example.com")
+    page = client.get(f"/therapist/patients/{ids['patient']}/journal/archive").get_data(as_text=True)
+    assert "Old shared" in page and "Old private" not in page
+    page = client.get(f"/therapist/patients/{ids['patient']}/mood").get_data(as_text=True)
+    assert "Earlier (summarised)" in page and "week of" in page
+
+    history = client.get(f"/therapist/patients/{ids['patient']}/mood/history?days=365").get_json()["points"]
+    assert sum(p["count"] for p in history) == 7
+
+
+def test_retention_bumps_the_versions_the_write_routes_do(app, ids):
+    _history(app, ids)
+    keys = [user_key(ids["patient"]), user_key(ids["therapist"])]
+    with app.app_context():
+        before = [versions.get(key) for key in keys]
+        retention.run(TODAY)
+        after = [versions.get(key) for key in keys]
+        # One bump per batch that moved rows, in batches of 2: 5 check-ins, 3 daily buckets, 2 journal entries.
+        assert [a - b for a, b in zip(after, before)] == [3 + 2 + 1] * 2
+
+        retention.run(TODAY)
+        assert [versions.get(key) for key in keys] == after
@@ -0,0 +1,35 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+from psycare import migrations
+
+_SPEC = importlib.util.spec_from_file_location(
+    "bench_routes", Path(__file__).resolve().parent.parent / "benchmarks" / "bench_routes.py"
+)
+bench_routes = sys.modules["bench_routes"] = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(bench_routes)
+
+
+@pytest.fixture()
+def bench_app(tmp_path):
+    app = bench_routes.make_app(f"sqlite:///{tmp_path / 'bench.db'}")
+    with app.app_context():
+        migrations.ensure_schema()
+        data = bench_routes.prepare(bench_routes.SCALES["tiny"])
+    return app, data
+
+
+def test_every_route_has_a_budget(bench_app):
+    app, _ = bench_app
+    assert bench_routes.uncovered(app) == []
+
+
+def test_routes_stay_within_statement_budgets(bench_app):
+    # Budgets are scale independent, so the tiny dataset catches N+1 regressions;
+    # latency baselines need the full benchmark.
+    app, data = bench_app
+    results = bench_routes.run_cases(app, data, repeat=1)
+    assert bench_routes.check(results, baseline=None, tolerance=0, min_delta_ms=0) == []
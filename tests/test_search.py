@@ -0,0 +1,60 @@
+from psycare.extensions import db
+from psycare.models import JournalEntry
+
+
+def _write(client, title, body, shared=False):
+    data = {"title": title, "body": body}
+    if shared:
+        data["shared_with_therapist"] = "y"
+    client.post("/patient/journal/new", data=data)
+
+
+def test_patient_search_ranks_and_highlights(client, login):
+    login("p@example.com")
+    _write(client, "Groceries", "Bought bread and a little anxiety about prices")
+    _write(client, "Anxiety spike", "Anxiety <b>again</b> before the exam")
+    _write(client, "Walk", "Nothing to report")
+
+    page = client.get("/patient/journal/search?q=anxiety")
+    assert page.status_code == 200
+    body = page.data.decode()
+    assert body.index("Anxiety spike") < body.index("Groceries")
+    assert "Walk" not in body
+    assert "<mark>Anxiety</mark>" in body
+    assert "&lt;b&gt;again" in body
+
+    assert b"No entries match" in client.get("/patient/journal/search?q=zebra").data
+
+
+def test_therapist_search_sees_only_shared_entries(app, client, login, ids):
+    login("p@example.com")
+    _write(client, "Shared sleep notes", "Could not sleep", shared=True)
+    _write(client, "Private sleep notes", "Could not sleep either")
+    client.post("/auth/logout")
+
+    login("t@example.com")
+    url = f"/therapist/patients/{ids['patient']}/journal/search?q=sleep"
+    page = client.get(url)
+    assert b"Shared sleep notes" in page.data
+    assert b"Private sleep notes" not in page.data
+
+    with app.app_context():
+        entry = JournalEntry.query.filter_by(title="Shared sleep notes").one()
+        entry.shared_with_therapist = False
+        db.session.commit()
+    assert b"Shared sleep notes" not in client.get(url).data
+
+
+def test_like_fallback_without_fts(app, client, login):
+    with app.app_context():
+        db.session.execute(db.text("DROP TABLE journal_fts"))
+        for trigger in ("journal_fts_ai", "journal_fts_ad", "journal_fts_au"):
+            db.session.execute(db.text(f"DROP TRIGGER {trigger}"))
+        db.session.commit()
+    app.extensions["journal_fts"] = None
+
+    login("p@example.com")
+    _write(client, "Evening", "A calm evening by the lake")
+    page = client.get("/patient/journal/search?q=lake")
+    assert b"Evening" in page.data
+    assert b"<mark>lake</mark>" in page.data
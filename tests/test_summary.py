@@ -0,0 +1,42 @@
+from sqlalchemy import event
+
+from psycare import summary
+from psycare.extensions import db
+from psycare.models import PatientSummary
+
+
+def _row(app, ids):
+    with app.app_context():
+        row = db.session.get(PatientSummary, (ids["therapist"], ids["patient"]))
+        return {c: getattr(row, c) for c in ("last_mood_rating", "last_journal_title", "unresolved_alert_count")}
+
+
+def test_patient_writes_keep_summary_in_sync(app, client, login, ids):
+    login("p@example.com")
+    client.post("/patient/mood", data={"rating": 7})
+    client.post("/patient/journal/new", data={"title": "Shared one", "body": "Some text", "shared_with_therapist": "y"})
+    client.post("/patient/journal/new", data={"title": "Private one", "body": "Some text"})
+    client.post("/patient/crisis")
+    assert _row(app, ids) == {"last_mood_rating": 7, "last_journal_title": "Shared one", "unresolved_alert_count": 1}
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            summary.rebuild(conn)
+    assert _row(app, ids)["last_journal_title"] == "Shared one"
+
+    client.post("/auth/logout")
+    login("t@example.com")
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    page = client.get("/therapist/dashboard")
+    assert b"Patient ID" not in page.data
+    assert b"Shared one" in page.data
+    # user loader, data version, summary read and the open-alerts list
+    assert len(statements) == 4
+
+    with app.app_context():
+        alert_id = db.session.execute(db.text("SELECT id FROM alerts")).scalar_one()
+    client.post(f"/therapist/alerts/{alert_id}/resolve")
+    client.post(f"/therapist/alerts/{alert_id}/resolve")
+    assert _row(app, ids)["unresolved_alert_count"] == 0
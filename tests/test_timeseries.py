@@ -0,0 +1,107 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import event, insert
+
+from psycare import mood_stats, timeseries
+from psycare.extensions import db
+from psycare.models import MoodEntry, PatientTherapist, User, utc_now
+
+
+def _reference_lttb(x, y, n):
+    # Straight from the paper: one bucket at a time, plain Python.
+    size = len(x)
+    every = (size - 2) / (n - 2)
+    keep, a = [0], 0
+    for i in range(n - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, size)
+        if i == n - 3:
+            nlo, nhi = size - 1, size
+        avg_x, avg_y = sum(x[nlo:nhi]) / (nhi - nlo), sum(y[nlo:nhi]) / (nhi - nlo)
+        areas = [abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) for j in range(lo, hi)]
+        a = lo + areas.index(max(areas))
+        keep.append(a)
+    return keep + [size - 1]
+
+
+def test_lttb_matches_reference_and_keeps_spikes():
+    rng = np.random.default_rng(7)
+    x = np.cumsum(rng.uniform(1, 100, 5000))
+    y = rng.integers(4, 7, 5000).astype(float)
+    y[1234] = 10
+    keep = timeseries.lttb(x, y, 100)
+    assert len(keep) == 100 and keep[0] == 0 and keep[-1] == 4999
+    assert 1234 in keep
+    assert keep.tolist() == _reference_lttb(x.tolist(), y.tolist(), 100)
+    assert timeseries.lttb(x[:50], y[:50], 100).tolist() == list(range(50))
+
+
+def test_bucket_weights_rollups_by_count():
+    series = {
+        "t": np.array([0.0, 10.0, 50.0, 60.0]),
+        "mean": np.array([4.0, 8.0, 2.0, 3.0]),
+        "min": np.array([2.0, 8.0, 2.0, 3.0]),
+        "max": np.array([6.0, 8.0, 2.0, 3.0]),
+        "count": np.array([3.0, 1.0, 1.0, 1.0]),
+    }
+    out = timeseries.bucket(series, 4, 0.0, 100.0)
+    assert out["t"].tolist() == [0.0, 50.0]
+    assert out["mean"].tolist() == [5.0, 2.5]
+    assert out["min"].tolist() == [2.0, 2.0] and out["max"].tolist() == [8.0, 3.0]
+    assert out["count"].tolist() == [4.0, 2.0]
+
+
+def test_series_endpoint_batches_patients_with_bounded_payload(app, client, login, ids):
+    today = utc_now().date()
+    with app.app_context():
+        other = User(email="p2@example.com", display_name="Other", role="patient", password_hash="x")
+        stranger = User(email="p3@example.com", display_name="Stranger", role="patient", password_hash="x")
+        db.session.add_all([other, stranger])
+        db.session.flush()
+        db.session.add(PatientTherapist(patient_id=other.id, therapist_id=ids["therapist"]))
+        start = datetime.combine(today - timedelta(days=729), time.min)
+        db.session.execute(insert(MoodEntry), [
+            {"patient_id": ids["patient"], "rating": 1 + i % 10, "note": "", "created_at": start + timedelta(hours=8 * i)}
+            for i in range(2190)
+        ])
+        db.session.commit()
+        with db.engine.begin() as conn:
+            mood_stats.rebuild(conn)
+        other_id, stranger_id = other.id, stranger.id
+
+    login("t@example.com")
+    url = f"/therapist/mood/series?patient_id={ids['patient']}&patient_id={other_id}&points=100"
+    data = client.get(url + f"&start={start.date()}").get_json()
+    series = data["series"][str(ids["patient"])]
+    assert data["mode"] == "lttb" and data["end"] == today.isoformat()
+    assert len(series["t"]) == 100 and series["checkins"] == 2190
+    assert series["t"] == sorted(series["t"])
+    assert data["series"][str(other_id)] == {"t": [], "mean": [], "min": [], "max": [], "count": [], "checkins": 0}
+
+    week = client.get(url + f"&start={today - timedelta(days=6)}").get_json()["series"][str(ids["patient"])]
+    assert len(week["t"]) == week["checkins"] <= 21
+
+    buckets = client.get(url + f"&start={start.date()}&mode=bucket").get_json()["series"][str(ids["patient"])]
+    assert len(buckets["t"]) <= 100 and sum(buckets["count"]) == 2190
+    assert min(buckets["min"]) == 1 and max(buckets["max"]) == 10
+
+    # Wide ranges come from the daily rollups; no raw check-in is loaded.
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    wide = client.get(url + "&start=0001-01-01&end=9999-12-31&mode=bucket").get_json()
+    assert wide["end"] == "9999-12-30" and wide["series"][str(ids["patient"])]["checkins"] == 2190
+    assert not [s for s in statements if "mood_entries" in s]
+    assert client.get(url + "&end=9999-12-31").status_code == 200
+
+    assert client.get(f"/therapist/mood/series?patient_id={stranger_id}").status_code == 403
+    assert client.get(url + "&mode=spline").status_code == 400
+    assert client.get(url + "&start=2030-01-01&end=2029-01-01").status_code == 400
+    many = "&".join(f"patient_id={i}" for i in range(1, timeseries.MAX_PATIENTS + 2))
+    assert client.get(f"/therapist/mood/series?{many}").status_code == 400
+
+    client.post("/auth/logout")
+    login("p@example.com")
+    own = client.get(f"/patient/mood/series?start={start.date()}&points=50").get_json()
+    assert list(own["series"]) == [str(ids["patient"])] and len(own["series"][str(ids["patient"])]["t"]) == 50
@@ -1,3 +1,5 @@
+# Apply schema changes once per deploy, before starting workers:
+#     flask --app wsgi db upgrade
 from psycare import create_app
 
 app = create_app()